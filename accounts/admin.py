@@ -1,19 +1,38 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import connection
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 
-from .models import User, Doctor, Patient, Manager
+from core.erasure import request_erasure
+
+from .models import AccountImport, User, Doctor, Patient, Manager
 from .forms import CustomUserCreationForm
 
 
+class LargeTableAdminMixin:
+    """
+    Changelists that stay fast with many users: no unfiltered COUNT(*) per
+    page, and searches the indexes of migration 0005 can serve, substring
+    (trigram GIN) on PostgreSQL and prefix (NOCASE) elsewhere.
+    """
+    show_full_result_count = False
+
+    def get_search_fields(self, request):
+        fields = super().get_search_fields(request)
+        if connection.vendor == 'postgresql':
+            return fields
+        return tuple(field if field[0] in '^=@' else f'^{field}' for field in fields)
+
+
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
     add_form = CustomUserCreationForm
     list_display = ('email', 'first_name', 'last_name', 'role', 'is_active', 'is_staff')
     list_filter = ('role', 'is_active', 'is_staff')
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+    actions = ('queue_deletion', 'queue_anonymization')
 
     add_fieldsets = (
         (None, {
@@ -37,11 +56,41 @@ class UserAdmin(BaseUserAdmin):
         else:
             super().save_model(request, obj, form, change)
 
+    # --- Erasure: queued for manage.py erase_accounts (see core.erasure) ---
+    def has_delete_permission(self, request, obj=None):
+        # The stock delete walks every related row in the request; use the actions
+        return False
+
+    def _queue_erasure(self, request, queryset, mode):
+        ids = set(queryset.values_list('pk', flat=True))
+        if request.user.pk in ids:
+            ids.discard(request.user.pk)
+            self.message_user(request, _("Your own account was left out."), messages.WARNING)
+        queued = request_erasure(ids, mode, requested_by=request.user)
+        self.message_user(
+            request,
+            _("%(count)d account(s) disabled and queued, they are erased in the background.") % {'count': queued},
+            messages.SUCCESS,
+        )
+
+    @admin.action(description=_("Delete selected accounts (in the background)"), permissions=['change'])
+    def queue_deletion(self, request, queryset):
+        self._queue_erasure(request, queryset, 'delete')
+
+    @admin.action(description=_("Anonymize selected accounts (in the background)"), permissions=['change'])
+    def queue_anonymization(self, request, queryset):
+        self._queue_erasure(request, queryset, 'anonymize')
+
 
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
+class DoctorAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'specialty', 'years_of_experience')
     search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    list_select_related = ('user',)
+
+    def has_delete_permission(self, request, obj=None):
+        # Deleted with the account, from the user changelist actions
+        return False
 
     def save_model(self, request, obj, form, change):
         if not change:
@@ -54,9 +103,10 @@ class DoctorAdmin(admin.ModelAdmin):
 
 
 @admin.register(Manager)
-class ManagerAdmin(admin.ModelAdmin):
+class ManagerAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user',)
     search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    list_select_related = ('user',)
 
     def save_model(self, request, obj, form, change):
         if not change:
@@ -70,9 +120,14 @@ class ManagerAdmin(admin.ModelAdmin):
 
 
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'date_of_birth')
     search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    list_select_related = ('user',)
+
+    def has_delete_permission(self, request, obj=None):
+        # Deleted with the account, from the user changelist actions
+        return False
 
     def save_model(self, request, obj, form, change):
         if not change:
@@ -81,3 +136,15 @@ class PatientAdmin(admin.ModelAdmin):
             user.role = User.Role.PATIENT
             user.save()
         super().save_model(request, obj, form, change)
+
+
+@admin.register(AccountImport)
+class AccountImportAdmin(admin.ModelAdmin):
+    list_display = ('role', 'requested_by', 'requested_at', 'finished_at')
+    list_filter = ('role', ('finished_at', admin.EmptyFieldListFilter))
+    list_select_related = ('requested_by',)
+    readonly_fields = ('file', 'role', 'requested_by', 'requested_at', 'finished_at', 'report')
+
+    def has_add_permission(self, request):
+        # Uploaded from the import page
+        return False
@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, SetPasswordForm
+from django.utils.translation import gettext_lazy as _
 from accounts.models import User, Patient, Doctor, Manager
 from django.contrib.auth import get_user_model
+from accounts.images import validate_profile_image
 
 User = get_user_model()
 
@@ -35,6 +37,11 @@ class PatientRegistrationForm(UserCreationForm):
         choices=[("Male", "Male"), ("Female", "Female")],
         widget=forms.Select(attrs={'class': 'form-select'})
     )
+    profile_image = forms.ImageField(
+        required=False,
+        validators=[validate_profile_image],
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control'})
+    )
     password1 = forms.CharField(
         label="Password",
         widget=forms.PasswordInput(attrs={'class': 'form-control', 'placeholder': 'Password'})
@@ -54,6 +61,7 @@ class PatientRegistrationForm(UserCreationForm):
             'address',
             'date_of_birth',
             'email',
+            'profile_image',
             'password1',
             'password2',
         )
@@ -90,7 +98,7 @@ class DoctorRegistrationForm(forms.ModelForm):
 class DoctorProfileForm(forms.ModelForm):
     phone = forms.CharField(required=False)
     address = forms.CharField(required=False)
-    profile_image = forms.ImageField(required=False)
+    profile_image = forms.ImageField(required=False, validators=[validate_profile_image])
 
     class Meta:
         model = Doctor
@@ -135,7 +143,7 @@ class ManagerCreationForm(forms.ModelForm):
 class ManagerProfileForm(forms.ModelForm):
     phone = forms.CharField(required=False)
     address = forms.CharField(required=False)
-    profile_image = forms.ImageField(required=False)
+    profile_image = forms.ImageField(required=False, validators=[validate_profile_image])
 
     class Meta:
         model = Manager
@@ -179,4 +187,16 @@ class CustomUserCreationForm(forms.ModelForm):
 
     class Meta:
         model = User
-        fields = ('email', 'first_name', 'last_name','role')
\ No newline at end of file
+        fields = ('email', 'first_name', 'last_name','role')
+
+
+class AccountImportForm(forms.Form):
+    """CSV upload for accounts.importing (manager and admin)."""
+    role = forms.ChoiceField(
+        choices=[('doctor', _('Doctors')), ('patient', _('Patients'))],
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    csv_file = forms.FileField(
+        label=_('CSV file'),
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'})
+    )
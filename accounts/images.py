@@ -0,0 +1,117 @@
+"""
+Profile image validation and renditions.
+
+Uploads are validated synchronously. Renditions (square WebP and JPEG
+crops for every size in ``PROFILE_IMAGE_RENDITIONS``) are generated by the
+``manage.py process_profile_images --loop`` worker, never in a web
+process: it picks up every user whose renditions are missing or were made
+from another image (new uploads, images from before renditions existed).
+Until then pages show the original.
+
+Renditions are stored under names derived from the source content, so
+they can be cached forever. Django serves media only in DEBUG (with that
+header, see medbook/urls.py); in production the proxy serving
+``MEDIA_URL`` must set it, e.g. with nginx::
+
+    location /media/profiles/renditions/ {
+        alias /srv/medbook/media/profiles/renditions/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.db.models.fields.json import KT
+from django.utils.translation import gettext_lazy as _
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+RENDITION_DIR = 'profiles/renditions'
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def validate_profile_image(upload):
+    """Reject oversized, undecodable or decompression-bomb uploads."""
+    if upload.size > settings.PROFILE_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            _("Image files must be smaller than %(size)d MB."),
+            params={'size': settings.PROFILE_IMAGE_MAX_BYTES // (1024 * 1024)},
+        )
+    position = upload.tell() if hasattr(upload, 'tell') else 0
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError(_("Upload a valid JPEG, PNG or WebP image."))
+    finally:
+        upload.seek(position)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError(_("Upload a valid JPEG, PNG or WebP image."))
+    if width * height > settings.PROFILE_IMAGE_MAX_PIXELS:
+        raise ValidationError(_("This image has too many pixels."))
+
+
+def needs_renditions(user):
+    return bool(user.profile_image) and user.profile_image_renditions.get('source') != user.profile_image.name
+
+
+def generate_renditions(user):
+    """Create the renditions of ``user.profile_image`` and record them on the user."""
+    source_name = user.profile_image.name
+    try:
+        with default_storage.open(source_name, 'rb') as source:
+            content = source.read()
+    except FileNotFoundError:
+        logger.warning("Profile image %s of user %s is missing", source_name, user.pk)
+        return None
+
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    with Image.open(BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        renditions = {'source': source_name}
+        for name, size in settings.PROFILE_IMAGE_RENDITIONS.items():
+            resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            renditions[name] = {}
+            for extension, (image_format, options) in RENDITION_FORMATS.items():
+                path = f'{RENDITION_DIR}/{digest}-{name}.{extension}'
+                if not default_storage.exists(path):
+                    buffer = BytesIO()
+                    resized.save(buffer, image_format, **options)
+                    path = default_storage.save(path, ContentFile(buffer.getvalue()))
+                renditions[name][extension] = path
+
+    # Only record them if the user has not uploaded another image meanwhile.
+    type(user).objects.filter(pk=user.pk, profile_image=source_name).update(
+        profile_image_renditions=renditions
+    )
+    user.profile_image_renditions = renditions
+    return renditions
+
+
+def process_pending_renditions():
+    """Generate the renditions every user is missing; returns the number of users done."""
+    from .models import User
+
+    users = (
+        User.objects.exclude(profile_image='').exclude(profile_image__isnull=True)
+        .alias(source=KT('profile_image_renditions__source'))
+        .exclude(source=F('profile_image'), source__isnull=False)
+        .only('id', 'profile_image', 'profile_image_renditions')
+    )
+    processed = 0
+    for user in users.iterator(chunk_size=500):
+        if needs_renditions(user) and generate_renditions(user):
+            processed += 1
+    return processed
@@ -0,0 +1,209 @@
+"""
+Bulk onboarding of doctors and patients from CSV.
+
+    email,first_name,last_name,phone,gender,date_of_birth,specialty,years_of_experience,password
+
+Only email, first_name and last_name are required. The file is read as a
+stream, ``chunk_size`` rows at a time: each row is validated by a small
+form, emails are checked against the file so far and, with one query per
+chunk, against the database. Passwords given in the file are hashed in a
+process pool (hashing is deliberately slow, and the pool spreads it over
+every core). Rows without a password get an unusable one, so the first
+login goes through account setup, like ``register_doctor``. Each chunk's
+users and profiles are then inserted with ``bulk_create`` in one
+transaction.
+
+The import page never runs this in the request (hashing thousands of
+passwords would hold a web worker for minutes): ``queue_import`` stores
+the upload as an ``AccountImport`` and ``manage.py process_imports``
+imports it, records the report and removes the file, which may hold
+passwords. Web and worker must share the default storage.
+"""
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from django import forms
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import AccountImport, Doctor, Patient, User
+
+CHUNK_SIZE = 1000
+HASH_CHUNK_SIZE = 32  # passwords per task sent to a pool worker
+REQUIRED_COLUMNS = {'email', 'first_name', 'last_name'}
+ROLES = {
+    'doctor': (User.Role.DOCTOR, Doctor),
+    'patient': (User.Role.PATIENT, Patient),
+}
+
+
+class ImportRowForm(forms.Form):
+    email = forms.EmailField(max_length=254)
+    first_name = forms.CharField(max_length=150)
+    last_name = forms.CharField(max_length=150)
+    phone = forms.CharField(max_length=20, required=False)
+    gender = forms.ChoiceField(choices=[('', ''), ('Male', 'Male'), ('Female', 'Female')], required=False)
+    date_of_birth = forms.DateField(required=False)
+    specialty = forms.CharField(max_length=100, required=False)
+    years_of_experience = forms.IntegerField(min_value=0, required=False)
+    password = forms.CharField(required=False, strip=False)
+
+    def clean_email(self):
+        return User.objects.normalize_email(self.cleaned_data['email'])
+
+
+@dataclass
+class ImportReport:
+    role: str
+    rows: int = 0
+    created: int = 0
+    errors: list = field(default_factory=list)  # (line number, message)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+
+def clean_row(row):
+    """Strip the cells, except passwords; cells missing from short rows are None."""
+    return {key: (value or '') if key == 'password' else (value or '').strip() for key, value in row.items() if key}
+
+
+def row_error(form):
+    return '; '.join(f"{name}: {' '.join(messages)}" for name, messages in form.errors.items())
+
+
+def hash_passwords(passwords, pool):
+    """Hashes for ``passwords``, unusable ones for blanks; in ``pool`` when given."""
+    given = [password for password in passwords if password]
+    if pool and len(given) > 1:
+        hashes = iter(pool.map(make_password, given, chunksize=HASH_CHUNK_SIZE))
+    else:
+        hashes = iter(map(make_password, given))
+    return [next(hashes) if password else make_password(None) for password in passwords]
+
+
+def import_chunk(rows, role, report, seen, pool):
+    """Validate and insert one chunk of ``(line, row)`` pairs."""
+    user_role, profile_model = ROLES[role]
+    valid = []
+    for line, row in rows:
+        form = ImportRowForm(row)
+        if not form.is_valid():
+            report.errors.append((line, row_error(form)))
+        elif form.cleaned_data['email'].lower() in seen:
+            report.errors.append((line, f"email: {form.cleaned_data['email']} appears earlier in the file."))
+        else:
+            seen.add(form.cleaned_data['email'].lower())
+            valid.append((line, form.cleaned_data))
+
+    if not valid:
+        return
+    existing = set(User.objects.filter(email__in=[data['email'] for _, data in valid]).values_list('email', flat=True))
+    for line, data in valid:
+        if data['email'] in existing:
+            report.errors.append((line, f"email: {data['email']} already has an account."))
+    valid = [(line, data) for line, data in valid if data['email'] not in existing]
+    if not valid:
+        return
+
+    passwords = hash_passwords([data['password'] for _, data in valid], pool)
+    try:
+        report.created += insert_accounts(valid, passwords, user_role, profile_model)
+    except IntegrityError:
+        # An account created since the check above (a signup, another
+        # import): retry row by row so only the conflicting rows fail.
+        for row, password in zip(valid, passwords):
+            try:
+                report.created += insert_accounts([row], [password], user_role, profile_model)
+            except IntegrityError as error:
+                taken = User.objects.filter(email=row[1]['email']).exists()
+                report.errors.append((row[0], f"email: {row[1]['email']} already has an account." if taken else str(error)))
+
+
+def insert_accounts(valid, passwords, user_role, profile_model):
+    """Insert users and profiles for ``(line, data)`` pairs in one transaction; returns the count."""
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                email=data['email'], first_name=data['first_name'], last_name=data['last_name'],
+                phone=data['phone'], gender=data['gender'], role=user_role, password=password,
+            )
+            for (_, data), password in zip(valid, passwords)
+        ])
+        if profile_model is Doctor:
+            profiles = [
+                Doctor(user_id=user.pk, specialty=data['specialty'], years_of_experience=data['years_of_experience'] or 0)
+                for user, (_, data) in zip(users, valid)
+            ]
+        else:
+            profiles = [Patient(user_id=user.pk, date_of_birth=data['date_of_birth']) for user, (_, data) in zip(users, valid)]
+        profile_model.objects.bulk_create(profiles)
+    return len(users)
+
+
+def import_accounts(stream, role, chunk_size=CHUNK_SIZE, workers=None):
+    """Import ``role`` accounts from the CSV text ``stream``; returns an ImportReport."""
+    if role not in ROLES:
+        raise ValueError(f"Unknown role {role!r}, expected one of {', '.join(ROLES)}.")
+    started = time.perf_counter()
+    report = ImportReport(role=role)
+    reader = csv.DictReader(stream)
+    missing = REQUIRED_COLUMNS - set(reader.fieldnames or ())
+    if missing:
+        report.errors.append((1, f"Missing column(s): {', '.join(sorted(missing))}."))
+        return report
+
+    workers = workers or os.cpu_count() or 1
+    # Without a password column every row gets an unusable password: nothing to hash
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and 'password' in reader.fieldnames else None
+    seen, chunk = set(), []
+    try:
+        for row in reader:
+            report.rows += 1
+            # line_num is where the row ends, right even with quoted newlines
+            chunk.append((reader.line_num, clean_row(row)))
+            if len(chunk) >= chunk_size:
+                import_chunk(chunk, role, report, seen, pool)
+                chunk = []
+        import_chunk(chunk, role, report, seen, pool)
+    finally:
+        if pool:
+            pool.shutdown()
+    report.errors.sort(key=lambda error: error[0])
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def queue_import(uploaded, role, requested_by=None):
+    """Store the ``UploadedFile`` for ``process_imports``; returns the AccountImport."""
+    if role not in ROLES:
+        raise ValueError(f"Unknown role {role!r}, expected one of {', '.join(ROLES)}.")
+    return AccountImport.objects.create(file=uploaded, role=role, requested_by=requested_by)
+
+
+def import_pending(limit=None, workers=None):
+    """Carry out queued imports, oldest first (at most ``limit``). Returns the number done."""
+    pending = AccountImport.objects.filter(finished_at__isnull=True).order_by('requested_at', 'pk')
+    done = 0
+    for account_import in pending[:limit] if limit else pending:
+        try:
+            with account_import.file.open('rb') as uploaded:
+                report = import_accounts(
+                    io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline=''), account_import.role, workers=workers,
+                )
+        except (OSError, UnicodeDecodeError, csv.Error) as error:
+            # Rows before the error were imported; retrying would only report them as duplicates
+            report = ImportReport(role=account_import.role, errors=[(0, f"Unreadable file: {error}")])
+        AccountImport.objects.filter(pk=account_import.pk).update(
+            file='', finished_at=timezone.now(), report={**asdict(report), 'rows_per_second': report.rows_per_second},
+        )
+        account_import.file.storage.delete(account_import.file.name)
+        done += 1
+    return done
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importing import CHUNK_SIZE, ROLES, import_accounts
+
+
+class Command(BaseCommand):
+    help = "Create doctor or patient accounts in bulk from a CSV file (see accounts.importing for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, UTF-8 with a header row.")
+        parser.add_argument('--role', choices=sorted(ROLES), required=True)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows inserted per transaction.")
+        parser.add_argument('--workers', type=int, default=None, help="Password hashing processes (default: CPUs).")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = import_accounts(
+                    stream, options['role'], chunk_size=options['chunk_size'], workers=options['workers'],
+                )
+        except OSError as error:
+            raise CommandError(error)
+        for line, message in report.errors:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(
+            f"Created {report.created} {report.role}(s) from {report.rows} row(s), {len(report.errors)} error(s), "
+            f"in {report.seconds:.2f}s ({report.rows_per_second} rows/s)."
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.importing import import_pending
+
+
+class Command(BaseCommand):
+    help = "Import the account CSV files uploaded from the import page (cron or worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Password hashing processes (default: CPUs).")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            done = import_pending(workers=options['workers'])
+            if done or not options['loop']:
+                self.stdout.write(f"Imported {done} file(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
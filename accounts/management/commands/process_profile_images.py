@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.images import process_pending_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate missing or stale profile image renditions (the worker behind every upload)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running, rescanning every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=10)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_renditions()
+            self.stdout.write(f"Generated renditions for {processed} user(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
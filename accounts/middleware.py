@@ -0,0 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils import translation
+
+
+class PreferredLanguageMiddleware:
+    """
+    Activate the logged-in user's ``preferred_language``.
+
+    Runs after ``LocaleMiddleware`` and ``AuthenticationMiddleware``:
+    anonymous visitors keep the cookie/Accept-Language choice, logged-in
+    users get their stored preference without anything being written to
+    the session.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.activate(request, request.user)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.activate(request, await request.auser())
+        return await self.get_response(request)
+
+    def activate(self, request, user):
+        language = getattr(user, 'preferred_language', None)
+        if user.is_authenticated and language and language != request.LANGUAGE_CODE:
+            translation.activate(language)
+            request.LANGUAGE_CODE = translation.get_language()
@@ -0,0 +1,52 @@
+"""
+Indexes behind the admin's user search (accounts.admin.LargeTableAdminMixin).
+
+On PostgreSQL the admin keeps substring search, which Django compiles to
+``UPPER(col::text) LIKE UPPER('%term%')``; trigram GIN indexes on exactly
+those expressions serve it. They are built CONCURRENTLY, hence the
+non-atomic migration. Other databases fall back to prefix search, which
+SQLite answers from ``COLLATE NOCASE`` indexes.
+"""
+from django.db import migrations
+
+COLUMNS = ('email', 'first_name', 'last_name')
+
+
+def index_name(column, suffix):
+    return f'accounts_user_{column}_{suffix}'
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(column, "trgm")} '
+                f'ON accounts_user USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+            )
+    elif vendor == 'sqlite':
+        for column in COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {index_name(column, "nocase")} ON accounts_user ({column} COLLATE NOCASE)'
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    suffix = {'postgresql': 'trgm', 'sqlite': 'nocase'}.get(vendor)
+    if suffix:
+        for column in COLUMNS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {index_name(column, suffix)}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
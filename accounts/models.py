@@ -56,12 +56,16 @@ class User(AbstractUser):
         choices=[('en', 'English'), ('fr', 'French')],
         default='en'
     )
+    # Uploads are validated by the forms (validate_profile_image), not here:
+    # the default image is no upload.
     profile_image = models.ImageField(
         upload_to='profiles/',
         blank=True,
         null=True,
-        default='profiles/default_user.png'
+        default='profiles/default_user.png',
     )
+    # Rendition paths by size and format, filled in by accounts.images
+    profile_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     objects = CustomUserManager()
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []  # email and password only
@@ -98,3 +102,31 @@ class Manager(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
     def __str__(self):
         return f"Manager: {self.user.get_full_name() or self.user.email}"
+
+
+class AccountImport(models.Model):
+    """
+    A CSV of doctors or patients uploaded from the import page, carried out
+    by ``manage.py process_imports`` (see accounts.importing).
+    """
+    ROLE_CHOICES = [
+        ('doctor', 'Doctors'),
+        ('patient', 'Patients'),
+    ]
+
+    # Removed once imported: it may hold passwords in clear
+    file = models.FileField(upload_to='imports/', blank=True)
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # rows, created, errors ([line, message]), seconds, rows_per_second
+    report = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['requested_at'], condition=models.Q(finished_at__isnull=True), name='import_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import of {self.get_role_display().lower()} ({'done' if self.finished_at else 'pending'})"
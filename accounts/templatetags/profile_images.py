@@ -0,0 +1,35 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+FALLBACK_IMAGE = 'images/logomed.jpg'
+
+
+@register.simple_tag
+def profile_image_url(user, size='small', image_format='jpeg'):
+    """
+    URL of a profile image rendition, e.g. ``{% profile_image_url user "thumb" "webp" %}``.
+    Falls back to the original upload while renditions are being generated.
+    """
+    rendition = user.profile_image_renditions.get(size, {}).get(image_format)
+    if rendition and user.profile_image_renditions.get('source') == user.profile_image.name:
+        return default_storage.url(rendition)
+    if user.profile_image:
+        return user.profile_image.url
+    return static(FALLBACK_IMAGE)
+
+
+@register.simple_tag
+def profile_picture(user, size='small', css_class='rounded-circle'):
+    """``<picture>`` serving WebP with a JPEG fallback, e.g. ``{% profile_picture user "thumb" %}``."""
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        profile_image_url(user, size, 'webp'),
+        profile_image_url(user, size, 'jpeg'),
+        user.get_full_name(),
+        css_class,
+    )
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from . import importing
+from .images import generate_renditions, needs_renditions, process_pending_renditions, validate_profile_image
+from .importing import import_accounts, import_pending
+from .models import AccountImport, Doctor, Manager, Patient, User
+
+PLAIN_STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class AdminChangelistQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@medbook.test', 'x')
+
+    def add_users(self, count):
+        start = User.objects.count()
+        for index in range(start, start + count):
+            role = ('doctor', 'patient', 'manager')[index % 3]
+            user = User.objects.create(email=f'{role}{index}@medbook.test', first_name='Ann', last_name=f'{index}')
+            {'doctor': Doctor, 'patient': Patient, 'manager': Manager}[role].objects.create(user=user)
+
+    def queries(self, url, **params):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_changelists_run_constant_queries(self):
+        self.client.force_login(self.admin)
+        urls = [reverse(f'admin:accounts_{model}_changelist') for model in ('user', 'doctor', 'patient', 'manager')]
+        self.add_users(6)
+        before = [(self.queries(url), self.queries(url, q='ann')) for url in urls]
+        self.add_users(30)
+        after = [(self.queries(url), self.queries(url, q='ann')) for url in urls]
+        self.assertEqual(after, before)
+
+    def test_search_uses_prefix_match_off_postgresql(self):
+        self.client.force_login(self.admin)
+        self.add_users(3)
+        url = reverse('admin:accounts_user_changelist')
+        self.assertEqual(self.client.get(url, {'q': 'doc'}).context['cl'].result_count, 1)
+        if connection.vendor != 'postgresql':
+            self.assertEqual(self.client.get(url, {'q': 'octor'}).context['cl'].result_count, 0)
+
+
+class AccountImportTests(TestCase):
+    CSV = (
+        "email,first_name,last_name,specialty,years_of_experience,password\n"
+        "a@clinic.test,Ada,One,Cardiology,12,\n"
+        "b@clinic.test,Ben,Two,,,s3cret-Pass\n"
+        "not-an-email,Cy,Three,,,\n"
+        "a@clinic.test,Ada,Again,,,\n"
+        "taken@clinic.test,Dee,Four,,,\n"
+        "c@clinic.test,Cal,Five,,-1,\n"
+    )
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        User.objects.create(email='taken@clinic.test')
+        report = import_accounts(io.StringIO(self.CSV), 'doctor', chunk_size=2, workers=1)
+        self.assertEqual((report.rows, report.created), (6, 2))
+        self.assertEqual([line for line, _ in report.errors], [4, 5, 6, 7])
+        ada = Doctor.objects.select_related('user').get(user__email='a@clinic.test')
+        self.assertEqual((ada.specialty, ada.years_of_experience, ada.user.role), ('Cardiology', 12, User.Role.DOCTOR))
+        self.assertFalse(ada.user.has_usable_password())
+        self.assertTrue(User.objects.get(email='b@clinic.test').check_password('s3cret-Pass'))
+
+    def test_hashes_passwords_in_a_process_pool(self):
+        rows = ''.join(f"p{index}@clinic.test,Pat,{index},pw-{index}\n" for index in range(4))
+        report = import_accounts(io.StringIO("email,first_name,last_name,password\n" + rows), 'patient', workers=2)
+        self.assertEqual((report.created, report.errors), (4, []))
+        self.assertEqual(Patient.objects.count(), 4)
+        self.assertTrue(User.objects.get(email='p3@clinic.test').check_password('pw-3'))
+
+    def test_missing_columns_are_reported(self):
+        report = import_accounts(io.StringIO("email,name\nx@clinic.test,X\n"), 'patient')
+        self.assertEqual(report.created, 0)
+        self.assertIn('first_name', report.errors[0][1])
+
+    def test_account_created_during_the_import_is_reported(self):
+        def hash_then_race(passwords, pool):
+            # Someone signs up with a file's email after the duplicate check
+            User.objects.create(email='b@clinic.test')
+            return real_hash_passwords(passwords, pool)
+
+        real_hash_passwords = importing.hash_passwords
+        with mock.patch.object(importing, 'hash_passwords', hash_then_race):
+            report = import_accounts(io.StringIO(self.CSV), 'doctor', workers=1)
+        self.assertEqual(report.created, 2)
+        self.assertIn((3, "email: b@clinic.test already has an account."), report.errors)
+        self.assertTrue(Doctor.objects.filter(user__email='a@clinic.test').exists())
+
+    def test_upload_is_queued_and_imported_by_the_worker(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        manager = User.objects.create(email='manager@medbook.test', role=User.Role.MANAGER)
+        self.client.force_login(manager)
+        upload = SimpleUploadedFile('doctors.csv', self.CSV.encode(), content_type='text/csv')
+        with self.settings(MEDIA_ROOT=media_root, STORAGES=PLAIN_STATIC_STORAGES):
+            response = self.client.post(reverse('accounts:import_accounts'), {'role': 'doctor', 'csv_file': upload})
+            self.assertRedirects(response, reverse('accounts:import_accounts'), fetch_redirect_response=False)
+            self.assertFalse(User.objects.filter(email='a@clinic.test').exists())
+            path = AccountImport.objects.get().file.path
+
+            self.assertEqual(import_pending(workers=1), 1)
+            account_import = AccountImport.objects.get()
+            self.assertEqual((account_import.report['created'], len(account_import.report['errors'])), (3, 3))
+            self.assertEqual(account_import.file.name, '')
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(import_pending(), 0)
+            self.assertContains(self.client.get(reverse('accounts:import_accounts')), 'Created 3 account(s)')
+
+
+def image_upload(size=(40, 20), image_format='PNG', name='photo.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, STORAGES=PLAIN_STATIC_STORAGES)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_validator_accepts_images_and_rewinds(self):
+        upload = image_upload()
+        validate_profile_image(upload)
+        self.assertEqual(upload.tell(), 0)
+
+    def test_validator_rejects_bad_uploads(self):
+        with self.assertRaises(ValidationError):
+            validate_profile_image(SimpleUploadedFile('photo.png', b'not an image'))
+        with self.assertRaises(ValidationError):
+            validate_profile_image(image_upload(image_format='GIF', name='photo.gif'))
+        with self.settings(PROFILE_IMAGE_MAX_PIXELS=100), self.assertRaises(ValidationError):
+            validate_profile_image(image_upload())
+        with self.settings(PROFILE_IMAGE_MAX_BYTES=10), self.assertRaises(ValidationError):
+            validate_profile_image(image_upload())
+
+    def test_registration_without_photo_keeps_the_default(self):
+        response = self.client.post(reverse('accounts:register_patient'), {
+            'first_name': 'Pat', 'last_name': 'Ient', 'email': 'pat@medbook.test', 'phone': '0600000000',
+            'password1': 'a-long-pass-phrase', 'password2': 'a-long-pass-phrase',
+        })
+        self.assertRedirects(response, reverse('core:patient_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(User.objects.get(email='pat@medbook.test').profile_image.name, 'profiles/default_user.png')
+
+    def test_renditions_cover_every_size_and_format(self):
+        user = User.objects.create(email='pic@medbook.test', profile_image=image_upload())
+        self.assertTrue(needs_renditions(user))
+        with self.settings(PROFILE_IMAGE_RENDITIONS={'thumb': 8, 'small': 16}):
+            renditions = generate_renditions(user)
+        self.assertEqual(renditions['source'], user.profile_image.name)
+        self.assertEqual(set(renditions) - {'source'}, {'thumb', 'small'})
+        with Image.open(user.profile_image.storage.path(renditions['small']['webp'])) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (16, 16)))
+        user.refresh_from_db()
+        self.assertEqual(user.profile_image_renditions, renditions)
+        self.assertFalse(needs_renditions(user))
+
+    def test_uploads_are_left_to_the_rendition_worker(self):
+        response = self.client.post(reverse('accounts:register_patient'), {
+            'first_name': 'Pat', 'last_name': 'Ient', 'email': 'pat@medbook.test', 'phone': '0600000000',
+            'password1': 'a-long-pass-phrase', 'password2': 'a-long-pass-phrase', 'profile_image': image_upload(),
+        })
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(email='pat@medbook.test')
+        self.assertEqual(user.profile_image_renditions, {})
+        with self.settings(PROFILE_IMAGE_RENDITIONS={'thumb': 8}):
+            self.assertEqual(process_pending_renditions(), 1)
+            self.assertEqual(process_pending_renditions(), 0)
+        user.refresh_from_db()
+        self.assertEqual(user.profile_image_renditions['source'], user.profile_image.name)
+
+    def test_renditions_of_a_missing_file_are_skipped(self):
+        user = User.objects.create(email='gone@medbook.test')  # default image, not on disk
+        with self.assertLogs('accounts.images', 'WARNING'):
+            self.assertIsNone(generate_renditions(user))
+        user.refresh_from_db()
+        self.assertEqual(user.profile_image_renditions, {})
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class PreferredLanguageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='ann@medbook.test', preferred_language='fr')
+
+    def test_logged_in_user_gets_their_stored_language(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('core:home'), HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response.wsgi_request.LANGUAGE_CODE, 'fr')
+        self.assertEqual(response['Content-Language'], 'fr')
+
+    def test_anonymous_visitor_keeps_accept_language(self):
+        response = self.client.get(reverse('core:home'), HTTP_ACCEPT_LANGUAGE='fr')
+        self.assertEqual(response.wsgi_request.LANGUAGE_CODE, 'fr')
+        response = self.client.get(reverse('core:home'), HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response.wsgi_request.LANGUAGE_CODE, 'en')
+
+    def test_switch_language_stores_preference_and_sets_cookie(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('accounts:switch_language'), {'lang': 'en'}, HTTP_REFERER='/appointments/')
+        self.assertRedirects(response, '/appointments/', fetch_redirect_response=False)
+        self.assertEqual(response.cookies[settings.LANGUAGE_COOKIE_NAME].value, 'en')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.preferred_language, 'en')
+
+    def test_switch_language_rejects_unknown_language_and_foreign_referer(self):
+        response = self.client.get(reverse('accounts:switch_language'), {'lang': 'xx'}, HTTP_REFERER='https://evil.test/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(response.cookies[settings.LANGUAGE_COOKIE_NAME].value, settings.LANGUAGE_CODE)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.preferred_language, 'fr')
@@ -14,6 +14,9 @@ urlpatterns = [
     # Doctor registration (by admin or manager)
     path('register/doctor/', views.register_doctor, name='register_doctor'),
 
+    # Bulk doctor/patient import from CSV (by admin or manager)
+    path('import/', views.import_accounts, name='import_accounts'),
+
     # Manager registration (admin only)
     path('register/manager/', views.register_manager, name='register_manager'),
 
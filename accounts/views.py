@@ -3,10 +3,11 @@ from django.contrib.auth import login, authenticate, logout, update_session_auth
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.utils import translation
 from django.urls import reverse
+from django.conf import settings
+from django.utils.http import url_has_allowed_host_and_scheme
 
-from .models import User, Doctor, Patient, Manager
+from .models import AccountImport, User, Doctor, Patient, Manager
 from .forms import (
     PatientRegistrationForm,
     DoctorRegistrationForm,
@@ -15,14 +16,29 @@ from .forms import (
     ManagerProfileForm,
     EmailOnlyLoginForm,
     DefinePasswordForm,
+    AccountImportForm,
 )
+from .importing import queue_import
 
 # --- Language switching ---
 def switch_language(request):
     lang = request.GET.get('lang', 'en')
-    translation.activate(lang)
-    request.session[translation.LANGUAGE_SESSION_KEY] = lang
-    return redirect(request.META.get('HTTP_REFERER', '/'))
+    if lang not in dict(settings.LANGUAGES):
+        lang = settings.LANGUAGE_CODE
+    # Logged-in users keep it on their profile (applied by
+    # PreferredLanguageMiddleware), everyone gets the language cookie.
+    if request.user.is_authenticated:
+        User.objects.filter(pk=request.user.pk).update(preferred_language=lang)
+    next_url = request.META.get('HTTP_REFERER', '/')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        next_url = '/'
+    response = redirect(next_url)
+    response.set_cookie(
+        settings.LANGUAGE_COOKIE_NAME, lang,
+        max_age=settings.LANGUAGE_COOKIE_AGE,
+        samesite=settings.LANGUAGE_COOKIE_SAMESITE,
+    )
+    return response
 
 
 # --- Patient registration ---
@@ -105,6 +121,27 @@ def register_doctor(request):
         form = DoctorRegistrationForm()
     return render(request, 'accounts/register_doctor.html', {'form': form})
 
+# --- Bulk doctor/patient import (by admin or manager) ---
+IMPORT_HISTORY_SIZE = 10
+
+@login_required
+def import_accounts(request):
+    if not request.user.is_staff and request.user.role != User.Role.MANAGER:
+        messages.error(request, _("You are not authorized to access this page."))
+        return redirect('core:home')
+
+    if request.method == 'POST':
+        form = AccountImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Hashing the passwords takes minutes for large files: a worker does it
+            queue_import(form.cleaned_data['csv_file'], form.cleaned_data['role'], requested_by=request.user)
+            messages.success(request, _("The file is queued for import. Reload this page to see the report."))
+            return redirect('accounts:import_accounts')
+    else:
+        form = AccountImportForm()
+    imports = AccountImport.objects.filter(requested_by=request.user).order_by('-requested_at')[:IMPORT_HISTORY_SIZE]
+    return render(request, 'accounts/import_accounts.html', {'form': form, 'imports': imports})
+
 # --- Manager registration by admin ---
 @login_required
 def register_manager(request):
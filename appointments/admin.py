@@ -1,3 +1,34 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
 
-# Register your models here.
+from .models import WeeklyTemplate, WeeklyTemplateInterval
+
+
+class WeeklyTemplateIntervalFormSet(BaseInlineFormSet):
+    def clean(self):
+        # Interval.clean() only sees saved rows; check the submitted ones together
+        super().clean()
+        seen = {}
+        for form in self.forms:
+            data = getattr(form, 'cleaned_data', None)
+            if not data or data.get('DELETE') or not data.get('start_time') or not data.get('end_time'):
+                continue
+            key = (data.get('weekday'), data.get('kind'))
+            for start, end in seen.get(key, []):
+                if data['start_time'] < end and data['end_time'] > start:
+                    raise ValidationError('Two intervals of the same kind overlap on the same day.')
+            seen.setdefault(key, []).append((data['start_time'], data['end_time']))
+
+
+class WeeklyTemplateIntervalInline(admin.TabularInline):
+    model = WeeklyTemplateInterval
+    formset = WeeklyTemplateIntervalFormSet
+    extra = 1
+
+
+@admin.register(WeeklyTemplate)
+class WeeklyTemplateAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'slot_duration', 'updated_at')
+    list_select_related = ('doctor__user',)
+    inlines = [WeeklyTemplateIntervalInline]
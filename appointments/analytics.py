@@ -0,0 +1,310 @@
+"""
+Slot utilization and demand analytics for managers.
+
+Past free slots are pruned, so utilization can't be read back from
+``TimeSlot``. ``finalize_usage``, called by ``prune_past_free_slots``
+before it deletes anything, rolls every finished day up into
+``SlotUsage``: slots, booked and blocked per doctor, day and hour,
+counted with one GROUP BY over the hot table and one over the archive.
+``record_open_usage`` (the ``materialize_slots`` worker) keeps the rows of
+today and the days ahead current. Cancelling deletes the appointment, so
+cancellations are kept in ``Cancellation`` as they happen.
+
+``period_report`` aggregates in the database. Utilization per doctor and
+per specialty comes from one query of window sums over the rollup rows.
+The weekday by hour heatmap, lead times and cancellations are one GROUP
+BY each. A report is cached per period and filter:
+``ANALYTICS_CACHE_SECONDS`` while the period is open, a day once it is
+over.
+"""
+import calendar
+from datetime import date, timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum, Window
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .models import (
+    Appointment, ArchivedAppointment, ArchivedTimeSlot, Cancellation, SlotUsage, TimeSlot,
+)
+
+BATCH_SIZE = 5000
+FINALIZE_DAYS = 31  # days rolled up per transaction
+CLOSED_PERIOD_CACHE_SECONDS = 86400
+WEEKDAYS = (_('Mon'), _('Tue'), _('Wed'), _('Thu'), _('Fri'), _('Sat'), _('Sun'))
+# (upper bound in days, label): a booking made 3 days ahead falls in '3-7 days'
+LEAD_BUCKETS = ((1, 'same_day'), (3, 'days_1_2'), (8, 'days_3_7'), (31, 'days_8_30'), (None, 'days_31_plus'))
+
+
+# --- Rollup ---
+def count_slots(start, end):
+    """``(doctor_id, date, hour) -> [slots, booked, blocked]`` between ``start`` and ``end``, hot and archived."""
+    aggregates = {
+        'slots': Count('id'),
+        'booked': Count('id', filter=Q(status='reserved')),
+        'blocked': Count('id', filter=Q(status='blocked')),
+    }
+    counts = {}
+    for queryset, doctor in (
+        (TimeSlot.objects.all(), 'planning__doctor_id'),
+        (ArchivedTimeSlot.objects.all(), 'doctor_id'),
+    ):
+        rows = (
+            queryset.filter(date__range=(start, end))
+            .values(doctor, 'date', slot_hour=ExtractHour('start_time'))
+            .annotate(**aggregates)
+            .order_by()
+        )
+        for row in rows:
+            total = counts.setdefault((row[doctor], row['date'], row['slot_hour']), [0, 0, 0])
+            total[0] += row['slots']
+            total[1] += row['booked']
+            total[2] += row['blocked']
+    return counts
+
+
+def record_usage(start, end, final):
+    """Replace the ``SlotUsage`` rows between ``start`` and ``end``. Returns the rows written."""
+    rows = [
+        SlotUsage(doctor_id=doctor_id, date=day, hour=hour, slots=slots, booked=booked, blocked=blocked, final=final)
+        for (doctor_id, day, hour), (slots, booked, blocked) in count_slots(start, end).items()
+    ]
+    with transaction.atomic():
+        SlotUsage.objects.filter(date__range=(start, end)).delete()
+        SlotUsage.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def finalize_usage(today=None):
+    """
+    Roll up the days before ``today`` not final yet, ``FINALIZE_DAYS`` per
+    transaction; the first run goes back to the oldest slot. Returns the rows written.
+    """
+    today = today or timezone.localdate()
+    last = SlotUsage.objects.filter(final=True).aggregate(last=Max('date'))['last']
+    if last:
+        start = last + timedelta(days=1)
+    else:
+        firsts = [
+            queryset.aggregate(first=Min('date'))['first']
+            for queryset in (TimeSlot.objects.all(), ArchivedTimeSlot.objects.all())
+        ]
+        start = min(filter(None, firsts), default=today)
+    written = 0
+    while start < today:
+        end = min(start + timedelta(days=FINALIZE_DAYS - 1), today - timedelta(days=1))
+        written += record_usage(start, end, final=True)
+        start = end + timedelta(days=1)
+    return written
+
+
+def record_open_usage(today=None):
+    """Recount today and every later day with slots. Returns the rows written."""
+    today = today or timezone.localdate()
+    last = TimeSlot.objects.filter(date__gte=today).aggregate(last=Max('date'))['last']
+    return record_usage(today, last, final=False) if last else 0
+
+
+def record_cancellations(appointments):
+    """Keep a ``Cancellation`` per appointment (with ``time_slot`` loaded) about to be deleted."""
+    Cancellation.objects.bulk_create([
+        Cancellation(
+            doctor_id=appointment.doctor_id, slot_date=appointment.time_slot.date,
+            start_time=appointment.time_slot.start_time, booked_at=appointment.created_at,
+        )
+        for appointment in appointments
+    ])
+
+
+# --- Reports ---
+def period_bounds(period):
+    """First and last day of a 'YYYY' or 'YYYY-MM' period; ValueError for anything else."""
+    year, _, month = period.partition('-')
+    if not (year.isdigit() and len(year) == 4 and (not month or month.isdigit())):
+        raise ValueError(f"Invalid period {period!r}, expected YYYY or YYYY-MM.")
+    if not month:
+        return date(int(year), 1, 1), date(int(year), 12, 31)
+    year, month = int(year), int(month)
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def _filters(specialty, doctor_id):
+    filters = {}
+    if specialty:
+        filters['doctor__specialty'] = specialty
+    if doctor_id:
+        filters['doctor_id'] = doctor_id
+    return filters
+
+
+def utilization(start, end, specialty=None, doctor_id=None):
+    """
+    Utilization per doctor and per specialty: booked over bookable (not
+    blocked) slots. One scan of the rollup; window sums partitioned by
+    doctor and by specialty, one DISTINCT row per doctor.
+    """
+    totals = {}
+    for field in ('slots', 'booked', 'blocked'):
+        totals[f'doctor_{field}'] = Window(Sum(field), partition_by=F('doctor_id'))
+        totals[f'specialty_{field}'] = Window(Sum(field), partition_by=F('doctor__specialty'))
+    rows = (
+        SlotUsage.objects.filter(date__range=(start, end), **_filters(specialty, doctor_id))
+        .annotate(**totals)
+        .values('doctor_id', 'doctor__specialty', 'doctor__user__first_name', 'doctor__user__last_name', *totals)
+        .distinct()
+        .order_by('doctor__specialty', 'doctor_id')
+    )
+    doctors, specialties = [], {}
+    for row in rows:
+        name = row['doctor__specialty']
+        doctors.append({
+            'doctor_id': row['doctor_id'],
+            'name': f"{row['doctor__user__first_name']} {row['doctor__user__last_name']}".strip(),
+            'specialty': name,
+            'slots': row['doctor_slots'],
+            'booked': row['doctor_booked'],
+            'blocked': row['doctor_blocked'],
+            'utilization': _ratio(row['doctor_booked'], row['doctor_slots'] - row['doctor_blocked']),
+        })
+        specialties[name] = {
+            'specialty': name,
+            'doctors': specialties.get(name, {}).get('doctors', 0) + 1,
+            'slots': row['specialty_slots'],
+            'booked': row['specialty_booked'],
+            'blocked': row['specialty_blocked'],
+            'utilization': _ratio(row['specialty_booked'], row['specialty_slots'] - row['specialty_blocked']),
+        }
+    # Rank within the specialty, busiest first
+    for name in specialties:
+        peers = sorted((d for d in doctors if d['specialty'] == name), key=lambda d: -(d['utilization'] or 0))
+        for rank, doctor in enumerate(peers, 1):
+            doctor['rank'] = rank
+    return doctors, list(specialties.values())
+
+
+def demand_heatmap(start, end, specialty=None, doctor_id=None):
+    """Booked and bookable slots by ISO weekday and hour: ``{'hours': [...], 'rows': [...]}``."""
+    cells = {
+        (row['weekday'], row['hour']): row
+        for row in SlotUsage.objects.filter(date__range=(start, end), **_filters(specialty, doctor_id))
+        .values('hour', weekday=ExtractIsoWeekDay('date'))
+        .annotate(slots=Sum('slots'), booked=Sum('booked'), blocked=Sum('blocked'))
+        .order_by()
+    }
+    hours = sorted({hour for _, hour in cells})
+    peak = max((cell['booked'] for cell in cells.values()), default=0)
+    rows = []
+    for weekday, label in enumerate(WEEKDAYS, 1):
+        row = []
+        for hour in hours:
+            cell = cells.get((weekday, hour), {'slots': 0, 'booked': 0, 'blocked': 0})
+            row.append({
+                'hour': hour,
+                'booked': cell['booked'],
+                'utilization': _ratio(cell['booked'], cell['slots'] - cell['blocked']),
+                'intensity': _ratio(cell['booked'], peak),
+            })
+        rows.append({'weekday': label, 'cells': row})
+    return {'hours': hours, 'rows': rows}
+
+
+def lead_times(start, end, specialty=None, doctor_id=None):
+    """
+    Per doctor: bookings of slots in the period (hot and archived), their
+    average lead time in days (slot date minus booking date) and the
+    count in each ``LEAD_BUCKETS`` bucket.
+    """
+    lead = ExpressionWrapper(F('time_slot__date') - TruncDate('created_at'), output_field=DurationField())
+    buckets, lower = {}, None
+    for upper, label in LEAD_BUCKETS:
+        bounds = Q()
+        if lower is not None:
+            bounds &= Q(lead__gte=timedelta(days=lower))
+        if upper is not None:
+            bounds &= Q(lead__lt=timedelta(days=upper))
+        buckets[label] = Count('id', filter=bounds)
+        lower = upper
+
+    by_doctor = {}
+    for model in (Appointment, ArchivedAppointment):
+        rows = (
+            model.objects.filter(time_slot__date__range=(start, end), **_filters(specialty, doctor_id))
+            .annotate(lead=lead)
+            .values('doctor_id')
+            .annotate(bookings=Count('id'), average=Avg('lead'), **buckets)
+            .order_by()
+        )
+        for row in rows:
+            total = by_doctor.setdefault(row['doctor_id'], {'bookings': 0, 'lead_days': 0.0, **dict.fromkeys(buckets, 0)})
+            total['bookings'] += row['bookings']
+            # Weighted by bookings so the hot and archived halves average correctly
+            total['lead_days'] += (row['average'] or timedelta()).total_seconds() / 86400 * row['bookings']
+            for label in buckets:
+                total[label] += row[label]
+    for total in by_doctor.values():
+        total['lead_days'] = round(total['lead_days'] / total['bookings'], 1) if total['bookings'] else None
+    return by_doctor
+
+
+def cancellations(start, end, specialty=None, doctor_id=None):
+    """Cancelled bookings of slots in the period, per doctor."""
+    return dict(
+        Cancellation.objects.filter(slot_date__range=(start, end), **_filters(specialty, doctor_id))
+        .values_list('doctor_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+
+def build_report(start, end, specialty=None, doctor_id=None):
+    doctors, specialties = utilization(start, end, specialty, doctor_id)
+    leads = lead_times(start, end, specialty, doctor_id)
+    cancelled = cancellations(start, end, specialty, doctor_id)
+    by_specialty = {row['specialty']: row for row in specialties}
+    for row in specialties:
+        row.update(bookings=0, cancelled=0, lead_total=0.0)
+    for doctor in doctors:
+        lead = leads.get(doctor['doctor_id'], {})
+        bookings = lead.get('bookings', 0)
+        doctor.update(
+            bookings=bookings, lead_days=lead.get('lead_days'), lead_buckets={label: lead.get(label, 0) for _, label in LEAD_BUCKETS},
+            cancelled=cancelled.get(doctor['doctor_id'], 0),
+        )
+        # Cancelled bookings no longer have an appointment: count them back in
+        doctor['cancellation_rate'] = _ratio(doctor['cancelled'], bookings + doctor['cancelled'])
+        group = by_specialty[doctor['specialty']]
+        group['bookings'] += bookings
+        group['cancelled'] += doctor['cancelled']
+        group['lead_total'] += (doctor['lead_days'] or 0) * bookings
+    for row in specialties:
+        row['lead_days'] = round(row.pop('lead_total') / row['bookings'], 1) if row['bookings'] else None
+        row['cancellation_rate'] = _ratio(row['cancelled'], row['bookings'] + row['cancelled'])
+    return {
+        'start': start,
+        'end': end,
+        'doctors': doctors,
+        'specialties': specialties,
+        'heatmap': demand_heatmap(start, end, specialty, doctor_id),
+        'generated_at': timezone.now(),
+    }
+
+
+def period_report(start, end, specialty=None, doctor_id=None):
+    """``build_report`` cached per period and filter; closed periods are kept longer."""
+    key = f"analytics:{start}:{end}:{quote(specialty or '')}:{doctor_id or ''}"
+    report = cache.get(key)
+    if report is None:
+        report = build_report(start, end, specialty, doctor_id)
+        # Over and rolled up for good: nothing in it changes any more
+        closed = end < timezone.localdate() and SlotUsage.objects.filter(final=True, date__gte=end).exists()
+        cache.set(key, report, CLOSED_PERIOD_CACHE_SECONDS if closed else settings.ANALYTICS_CACHE_SECONDS)
+    return report
@@ -0,0 +1,125 @@
+"""
+Archival of past slots and appointments.
+
+``archive_history`` (run it from cron) moves every appointment whose slot
+is in the past, whatever its status (one nobody marked completed is just
+as past), together with its slot, into
+``ArchivedAppointment``/``ArchivedTimeSlot``, and moves past slots no
+appointment uses. Past free slots carry no history and are deleted.
+Every batch is copied and deleted in its own short transaction, keeping
+the ids, so the hot tables only hold current data and lock briefly. The
+dashboards add archived counts back, so their totals do not change, but
+the versions behind their ETags (patients' appointments, doctors'
+calendars) are bumped for every batch.
+
+History read paths go through ``appointment_history``, a single UNION
+ALL over the hot and archive tables, and ``archived_status_counts``.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Value
+
+from .models import Appointment, ArchivedAppointment, ArchivedTimeSlot, TimeSlot
+from .schedules import prune_past_free_slots
+from .versions import bump_calendar_version, bump_patient_appointments_version
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+def _archived_slot(slot, doctor_id):
+    return ArchivedTimeSlot(
+        id=slot.id, doctor_id=doctor_id, date=slot.date, start_time=slot.start_time,
+        end_time=slot.end_time, status=slot.status,
+    )
+
+
+def archive_appointments(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move appointments with a slot before ``before``, in any status, and their slots."""
+    past = Appointment.objects.filter(time_slot__date__lt=before).select_related('time_slot').order_by('pk')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(past[:batch_size])
+            if not batch:
+                return moved
+            ArchivedTimeSlot.objects.bulk_create(
+                [_archived_slot(appointment.time_slot, appointment.doctor_id) for appointment in batch],
+                ignore_conflicts=True,
+            )
+            ArchivedAppointment.objects.bulk_create(
+                [
+                    ArchivedAppointment(
+                        id=appointment.id, patient_id=appointment.patient_id, doctor_id=appointment.doctor_id,
+                        time_slot_id=appointment.time_slot_id, beneficiary_id=appointment.beneficiary_id,
+                        status=appointment.status, reason=appointment.reason, created_at=appointment.created_at,
+                    )
+                    for appointment in batch
+                ],
+                ignore_conflicts=True,
+            )
+            Appointment.objects.filter(pk__in=[appointment.pk for appointment in batch]).delete()
+            TimeSlot.objects.filter(pk__in=[appointment.time_slot_id for appointment in batch]).delete()
+            for patient_id in {appointment.patient_id for appointment in batch}:
+                bump_patient_appointments_version(patient_id)
+            for doctor_id in {appointment.doctor_id for appointment in batch}:
+                bump_calendar_version(doctor_id)
+        moved += len(batch)
+
+
+def archive_slots(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move booked or blocked slots before ``before`` that no appointment uses any more."""
+    unused = (
+        TimeSlot.objects.filter(date__lt=before, appointment__isnull=True).exclude(status='free')
+        .select_related('planning').order_by('pk')
+    )
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(unused[:batch_size])
+            if not batch:
+                return moved
+            ArchivedTimeSlot.objects.bulk_create(
+                [_archived_slot(slot, slot.planning.doctor_id) for slot in batch], ignore_conflicts=True,
+            )
+            TimeSlot.objects.filter(pk__in=[slot.pk for slot in batch]).delete()
+        moved += len(batch)
+
+
+def archive_history(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive everything before ``before``; returns ``(appointments, slots, pruned free slots)``."""
+    appointments = archive_appointments(before, batch_size)
+    slots = archive_slots(before, batch_size)
+    pruned = prune_past_free_slots(batch_size=batch_size, today=before)
+    return appointments, slots, pruned
+
+
+# --- Read paths over hot and archived rows ---
+def _history_values(queryset, archived):
+    return queryset.values(
+        'id', 'status', 'reason', 'created_at', 'patient_id', 'doctor_id',
+        date=F('time_slot__date'),
+        start_time=F('time_slot__start_time'),
+        end_time=F('time_slot__end_time'),
+        doctor_last_name=F('doctor__user__last_name'),
+        patient_first_name=F('patient__user__first_name'),
+        patient_last_name=F('patient__user__last_name'),
+        beneficiary_first_name=F('beneficiary__first_name'),
+        beneficiary_last_name=F('beneficiary__last_name'),
+        archived=Value(archived),
+    )
+
+
+def appointment_history(**filters):
+    """Appointments matching ``filters`` from both tables, most recent first, as dicts."""
+    return _history_values(Appointment.objects.filter(**filters), False).union(
+        _history_values(ArchivedAppointment.objects.filter(**filters), True), all=True,
+    ).order_by('-date', '-start_time')
+
+
+def archived_status_counts(**filters):
+    """``{status: count}`` of the archived appointments matching ``filters``."""
+    return dict(ArchivedAppointment.objects.filter(**filters).values_list('status').annotate(count=Count('id')))
+
+
+async def aarchived_status_counts(**filters):
+    rows = ArchivedAppointment.objects.filter(**filters).values_list('status').annotate(count=Count('id'))
+    return {status: count async for status, count in rows}
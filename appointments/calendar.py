@@ -0,0 +1,93 @@
+"""
+Doctor calendar grid.
+
+``calendar_rows`` fetches every slot of a doctor in a date range in one
+statement: slots LEFT JOIN appointments and beneficiaries, the covering
+unavailability as a correlated subquery, UNION ALL the same over the
+archive tables. ``columnar`` serializes the rows column by column, with
+days as offsets from the range start, which is far smaller than a list
+of objects repeating every key.
+"""
+import calendar as calendar_module
+from datetime import date, timedelta
+
+from django.db.models import F, OuterRef, Subquery
+
+from .models import ArchivedTimeSlot, DoctorUnavailability, TimeSlot
+
+COLUMNS = (
+    'slot', 'day', 'start', 'end', 'status', 'appointment', 'appointment_status',
+    'patient', 'beneficiary', 'unavailability', 'reason',
+)
+
+
+def calendar_range(view, start):
+    """``(first, last)`` day of the week (Monday first) or month containing ``start``."""
+    if view == 'month':
+        first = start.replace(day=1)
+        return first, first.replace(day=calendar_module.monthrange(first.year, first.month)[1])
+    first = start - timedelta(days=start.weekday())
+    return first, first + timedelta(days=6)
+
+
+def _covering_unavailability(doctor_ref, field):
+    return Subquery(
+        DoctorUnavailability.objects.filter(
+            doctor_id=OuterRef(doctor_ref), start_date__lte=OuterRef('date'), end_date__gte=OuterRef('date'),
+        ).order_by('start_date').values(field)[:1]
+    )
+
+
+def _calendar_values(queryset, doctor_ref):
+    return queryset.values(
+        slot=F('id'),
+        slot_date=F('date'),
+        start=F('start_time'),
+        end=F('end_time'),
+        slot_status=F('status'),
+        appointment_id=F('appointment__id'),
+        appointment_status=F('appointment__status'),
+        patient_first_name=F('appointment__patient__user__first_name'),
+        patient_last_name=F('appointment__patient__user__last_name'),
+        beneficiary_first_name=F('appointment__beneficiary__first_name'),
+        beneficiary_last_name=F('appointment__beneficiary__last_name'),
+        unavailability=_covering_unavailability(doctor_ref, 'id'),
+        reason=_covering_unavailability(doctor_ref, 'reason'),
+    )
+
+
+def calendar_rows(doctor_id, first, last):
+    live = TimeSlot.objects.filter(planning__doctor_id=doctor_id, date__range=(first, last))
+    archived = ArchivedTimeSlot.objects.filter(doctor_id=doctor_id, date__range=(first, last))
+    return _calendar_values(live, 'planning__doctor_id').union(
+        _calendar_values(archived, 'doctor_id'), all=True,
+    ).order_by('slot_date', 'start')
+
+
+def _full_name(first_name, last_name):
+    return f"{first_name} {last_name}".strip() if first_name or last_name else None
+
+
+def columnar(rows, first):
+    """``{column: [values...]}`` for the rows of ``calendar_rows``."""
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        columns['slot'].append(row['slot'])
+        columns['day'].append((row['slot_date'] - first).days)
+        columns['start'].append(row['start'].strftime('%H:%M'))
+        columns['end'].append(row['end'].strftime('%H:%M'))
+        columns['status'].append(row['slot_status'])
+        columns['appointment'].append(row['appointment_id'])
+        columns['appointment_status'].append(row['appointment_status'])
+        columns['patient'].append(_full_name(row['patient_first_name'], row['patient_last_name']))
+        columns['beneficiary'].append(_full_name(row['beneficiary_first_name'], row['beneficiary_last_name']))
+        columns['unavailability'].append(row['unavailability'])
+        columns['reason'].append(row['reason'])
+    return columns
+
+
+def parse_start(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
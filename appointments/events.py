@@ -0,0 +1,130 @@
+"""
+Slot status change notifications.
+
+Booking, cancellation and blocking call ``publish_slot_change`` inside
+their transaction. Once it commits, the event is handed to every
+server-sent events stream subscribed to that doctor in this process.
+With ``SLOT_EVENTS_PG_NOTIFY`` enabled the event goes through PostgreSQL
+``NOTIFY`` instead and a listener thread in each ASGI worker fans it out
+locally, so a booking served by one worker reaches clients of all others.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'medbook_slot_events'
+# Keeps NOTIFY payloads well below PostgreSQL's 8000 byte limit.
+SLOTS_PER_EVENT = 50
+QUEUE_SIZE = 100
+
+
+class SlotEventBroker:
+    """Per-process registry of subscriber queues, keyed by doctor id."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, doctor_id):
+        if settings.SLOT_EVENTS_PG_NOTIFY:
+            self._start_listener()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[doctor_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, doctor_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(doctor_id, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(doctor_id, None)
+
+    def publish_local(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event['doctor'], ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, event)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen_forever, name='slot-events-listener', daemon=True,
+                )
+                self._listener.start()
+
+    def _listen_forever(self):
+        import psycopg
+        from psycopg.conninfo import make_conninfo
+
+        db = settings.DATABASES['default']
+        conninfo = make_conninfo(
+            dbname=db['NAME'], user=db.get('USER') or None, password=db.get('PASSWORD') or None,
+            host=db.get('HOST') or None, port=db.get('PORT') or None,
+        )
+        while True:
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f'LISTEN {CHANNEL}')
+                    for notify in conn.notifies():
+                        self.publish_local(json.loads(notify.payload))
+            except psycopg.Error:
+                logger.exception("Slot event listener lost its connection, reconnecting")
+                time.sleep(1)
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # A stalled client only loses events; it resyncs on reconnect.
+        pass
+
+
+broker = SlotEventBroker()
+
+
+def serialize_slots(slots):
+    """Event payload for TimeSlot instances or ``values()`` dicts."""
+    rows = []
+    for slot in slots:
+        if not isinstance(slot, dict):
+            slot = {'id': slot.id, 'date': slot.date, 'start_time': slot.start_time, 'end_time': slot.end_time}
+        rows.append({
+            'id': slot['id'],
+            'date': slot['date'].isoformat(),
+            'start_time': slot['start_time'].strftime('%H:%M'),
+            'end_time': slot['end_time'].strftime('%H:%M'),
+        })
+    return rows
+
+
+def publish_slot_change(doctor_id, slots, status):
+    """Announce that ``slots`` of a doctor now have ``status`` once the transaction commits."""
+    rows = serialize_slots(slots)
+    events = [
+        {'doctor': doctor_id, 'status': status, 'slots': rows[start:start + SLOTS_PER_EVENT]}
+        for start in range(0, len(rows), SLOTS_PER_EVENT)
+    ]
+    if events:
+        transaction.on_commit(lambda: _dispatch(events))
+
+
+def _dispatch(events):
+    if settings.SLOT_EVENTS_PG_NOTIFY:
+        with connection.cursor() as cursor:
+            for event in events:
+                cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(event)])
+    else:
+        for event in events:
+            broker.publish_local(event)
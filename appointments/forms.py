@@ -1,5 +1,9 @@
 from django import forms
-from .models import Beneficiary, DoctorUnavailability
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from .models import Beneficiary, DoctorUnavailability, WaitlistEntry
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from datetime import date
 from accounts.models import Doctor
@@ -39,6 +43,12 @@ class GlobalPlanningForm(forms.Form):
         label="Slot Duration (minutes)",
         widget=forms.NumberInput(attrs={'class': 'form-control'})
     )
+    use_weekly_templates = forms.BooleanField(
+        required=False,
+        initial=True,
+        label="Use the doctor's weekly template when one is defined",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
 class DoctorUnavailabilityForm(forms.ModelForm):
     class Meta:
@@ -69,6 +79,30 @@ class DoctorUnavailabilityForm(forms.ModelForm):
             raise forms.ValidationError("End date cannot be before start date.")
         return cleaned_data
 
+class WaitlistForm(forms.ModelForm):
+    class Meta:
+        model = WaitlistEntry
+        fields = ["start_date", "end_date"]
+        labels = {
+            "start_date": _("From"),
+            "end_date": _("To"),
+        }
+        widgets = {
+            "start_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "end_date": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start_date")
+        end = cleaned_data.get("end_date")
+
+        if start and end and start > end:
+            raise forms.ValidationError("End date cannot be before start date.")
+        if end and end < timezone.localdate():
+            raise forms.ValidationError("The dates must not be in the past.")
+        return cleaned_data
+
 class BeneficiaryForm(forms.ModelForm):
     class Meta:
         model = Beneficiary
@@ -96,3 +130,42 @@ class BeneficiaryForm(forms.ModelForm):
             }),
         }
 
+    def clean_first_name(self):
+        return " ".join(self.cleaned_data["first_name"].split())
+
+    def clean_last_name(self):
+        return " ".join(self.cleaned_data["last_name"].split())
+
+    def save_for(self, patient):
+        """The patient's beneficiary with this name (updated), or a new one."""
+        data = self.cleaned_data
+        details = {"gender": data["gender"], "age": data["age"]}
+        existing = find_beneficiary(patient, data["first_name"], data["last_name"])
+        if existing:
+            Beneficiary.objects.filter(pk=existing.pk).update(**details)
+            return existing
+        try:
+            with transaction.atomic():
+                return Beneficiary.objects.create(
+                    patient=patient, first_name=data["first_name"], last_name=data["last_name"], **details
+                )
+        except IntegrityError:
+            # Created by a concurrent booking of the same patient
+            existing = find_beneficiary(patient, data["first_name"], data["last_name"])
+            if existing is None:
+                raise
+            return existing
+
+
+def find_beneficiary(patient, first_name, last_name):
+    """
+    Case-insensitive lookup served by the unique_beneficiary_name index.
+    The names are lowered by the database too, so the lookup folds exactly
+    what the index folds (SQLite's LOWER only folds ASCII).
+    """
+    return (
+        Beneficiary.objects.alias(first=Lower("first_name"), last=Lower("last_name"))
+        .filter(patient=patient, first=Lower(Value(first_name)), last=Lower(Value(last_name)))
+        .first()
+    )
+
@@ -0,0 +1,115 @@
+"""
+Temporary slot holds.
+
+Opening the booking form moves the slot from 'free' to 'pending' for
+``SLOT_HOLD_MINUTES``, held by that patient, so nobody else can take it
+while the form is filled in. Submitting the form turns the hold into
+'reserved'. Every transition is a single conditional UPDATE, so two
+patients can never both get the slot and no row lock is held between
+requests.
+
+An expired hold counts as free for new holds and bookings right away;
+``release_expired_holds`` (the ``release_holds`` command) puts expired
+holds back to 'free' in batches so they reappear in the slot listings.
+A patient may hold at most ``SLOT_HOLD_LIMIT`` slots at a time, so one
+account cannot take a doctor's whole day off the listing by opening
+booking forms.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .events import publish_slot_change
+from .models import TimeSlot
+from .versions import bump_availability_version
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def _available_to(patient, now):
+    """Slots ``patient`` may hold or book: free, held by them, or held past expiry."""
+    return (
+        Q(status='free')
+        | Q(status='pending', held_by=patient)
+        | Q(status='pending', hold_expires_at__lt=now)
+    )
+
+
+def place_hold(slot, patient, minutes=None, limit=None):
+    """
+    Hold ``slot`` for ``patient`` (``SLOT_HOLD_MINUTES`` by default); False if
+    another patient has it. Raises ValidationError when the patient already
+    holds ``limit`` other slots (``SLOT_HOLD_LIMIT`` by default, 0 for none).
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=minutes or settings.SLOT_HOLD_MINUTES)
+    if slot.status == 'pending' and slot.held_by_id == patient.pk and slot.hold_expires_at >= expires_at:
+        return True  # already held for longer, e.g. a waitlist offer
+    limit = settings.SLOT_HOLD_LIMIT if limit is None else limit
+    if limit and TimeSlot.objects.filter(
+        status='pending', held_by=patient, hold_expires_at__gte=now,
+    ).exclude(pk=slot.pk).count() >= limit:
+        raise ValidationError("You are already holding %(limit)d slots. Book or let them expire first.",
+                              code='hold_limit', params={'limit': limit})
+    held = TimeSlot.objects.filter(_available_to(patient, now), pk=slot.pk).update(
+        status='pending', held_by=patient, hold_expires_at=expires_at,
+    )
+    if held:
+        if slot.status != 'pending':
+            publish_slot_change(slot.planning.doctor_id, [slot], 'pending')
+            bump_availability_version(slot.planning.doctor_id)
+        slot.status, slot.held_by, slot.hold_expires_at = 'pending', patient, expires_at
+    return bool(held)
+
+
+def confirm_hold(slot, patient):
+    """
+    Reserve ``slot`` for ``patient``. Succeeds from their own hold, and also
+    when the slot is still free or an expired hold was not taken over.
+    """
+    reserved = TimeSlot.objects.filter(_available_to(patient, timezone.now()), pk=slot.pk).update(
+        status='reserved', held_by=None, hold_expires_at=None,
+    )
+    if reserved:
+        slot.status, slot.held_by, slot.hold_expires_at = 'reserved', None, None
+        publish_slot_change(slot.planning.doctor_id, [slot], 'reserved')
+        bump_availability_version(slot.planning.doctor_id)
+    return bool(reserved)
+
+
+def release_expired_holds(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Put expired holds back to 'free', one UPDATE per batch, and pass the
+    slots on to the waitlist. Returns the number released.
+    """
+    from .waitlist import offer_freed_slots, requeue_stale_offers
+
+    # Offers whose expired hold was booked by someone else never come back here
+    requeue_stale_offers()
+    released = 0
+    while True:
+        with transaction.atomic():
+            # Locking the batch keeps a concurrent confirm_hold from slipping
+            # between the SELECT and the UPDATE (and skews nothing on SQLite).
+            batch = list(
+                TimeSlot.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', hold_expires_at__lt=timezone.now())
+                .order_by('pk')
+                .values('id', 'date', 'start_time', 'end_time', 'planning__doctor_id')[:batch_size]
+            )
+            if not batch:
+                return released
+            released += TimeSlot.objects.filter(pk__in=[slot['id'] for slot in batch]).update(
+                status='free', held_by=None, hold_expires_at=None,
+            )
+            by_doctor = {}
+            for slot in batch:
+                by_doctor.setdefault(slot['planning__doctor_id'], []).append(slot)
+            for doctor_id, slots in by_doctor.items():
+                publish_slot_change(doctor_id, slots, 'free')
+                bump_availability_version(doctor_id)
+            offer_freed_slots([slot['id'] for slot in batch])
@@ -0,0 +1,30 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appointments.archive import ARCHIVE_BATCH_SIZE, archive_history
+
+
+class Command(BaseCommand):
+    help = "Move past slots and appointments into the archive tables in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat, default=None,
+                            help="Archive slots dated before this day (YYYY-MM-DD), default today.")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help="Rows moved per transaction.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=24 * 3600)
+
+    def handle(self, *args, **options):
+        while True:
+            before = options['before'] or timezone.localdate()
+            appointments, slots, pruned = archive_history(before, batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Archived {appointments} appointment(s) and {slots} other slot(s), "
+                f"deleted {pruned} free slot(s) before {before}."
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
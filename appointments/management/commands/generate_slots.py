@@ -0,0 +1,29 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.schedules import generate_slots
+
+
+class Command(BaseCommand):
+    help = "Expand doctors' weekly templates into time slots for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD), default today.")
+        parser.add_argument('--end', type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD).")
+        parser.add_argument('--days', type=int, default=365, help="Number of days when --end is not given.")
+        parser.add_argument('--doctor', type=int, action='append', dest='doctors', help="Only this doctor (repeatable).")
+        parser.add_argument('--replace', action='store_true', help="Delete free slots in the range first.")
+
+    def handle(self, *args, **options):
+        start = options['start'] or date.today()
+        end = options['end'] or start + timedelta(days=options['days'] - 1)
+        if end < start:
+            raise CommandError("--end must not be before --start.")
+
+        started = time.perf_counter()
+        created = generate_slots(start, end, doctor_ids=options['doctors'], replace=options['replace'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} slot(s) from {start} to {end} in {time.perf_counter() - started:.2f}s."
+        ))
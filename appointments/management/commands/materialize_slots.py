@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from appointments.analytics import record_open_usage
+from appointments.schedules import SLOT_BATCH_SIZE, materialize_horizon, prune_past_free_slots
+
+
+class Command(BaseCommand):
+    help = "Keep a rolling horizon of future slots from weekly templates, prune past free slots and roll up slot usage (cron or worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=None, help="Horizon in weeks (default SLOT_HORIZON_WEEKS).")
+        parser.add_argument('--batch-size', type=int, default=SLOT_BATCH_SIZE, help="Past slots deleted per transaction.")
+        parser.add_argument('--no-prune', action='store_true', help="Only materialize, keep past free slots.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=3600)
+
+    def handle(self, *args, **options):
+        weeks = options['weeks'] or settings.SLOT_HORIZON_WEEKS
+        while True:
+            created = materialize_horizon(weeks)
+            self.stdout.write(f"Materialized {created} slot(s) over the next {weeks} week(s).")
+            if not options['no_prune']:
+                deleted = prune_past_free_slots(batch_size=options['batch_size'])
+                self.stdout.write(f"Pruned {deleted} past free slot(s).")
+            # After pruning, which also rolls up the days that just ended
+            record_open_usage()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appointments.holds import SWEEP_BATCH_SIZE, release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Put slots whose booking hold expired back to 'free' (cron or worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help="Slots released per UPDATE.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_holds(batch_size=options['batch_size'])
+            self.stdout.write(f"Released {released} expired hold(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appointments.reminders import BATCH_SIZE, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Queue the emails of due appointment reminders (cron or worker; several may run in parallel)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Reminders claimed per transaction.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            queued = send_due_reminders(batch_size=options['batch_size'])
+            if queued or not options['loop']:
+                self.stdout.write(f"Queued {queued} reminder(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
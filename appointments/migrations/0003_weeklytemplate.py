@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+        ('appointments', '0002_doctorunavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_duration', models.PositiveIntegerField(default=60)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_template', to='accounts.doctor')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeeklyTemplateInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('kind', models.CharField(choices=[('work', 'Working hours'), ('break', 'Break')], default='work', max_length=10)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intervals', to='appointments.weeklytemplate')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+    ]
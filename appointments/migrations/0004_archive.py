@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+        ('appointments', '0003_weeklytemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTimeSlot',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('status', models.CharField(choices=[('free', 'Free'), ('reserved', 'Reserved'), ('pending', 'Pending'), ('blocked', 'Blocked')], max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_slots', to='accounts.doctor')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmed'), ('modified', 'Modified'), ('cancelled', 'Cancelled'), ('completed', 'Completed')], max_length=20)),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('beneficiary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='appointments.beneficiary')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='accounts.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='accounts.patient')),
+                ('time_slot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='appointment', to='appointments.archivedtimeslot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimeslot',
+            index=models.Index(fields=['doctor', 'date'], name='appointment_doctor__404114_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+        ('appointments', '0004_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslot',
+            name='held_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_slots', to='accounts.patient'),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['status', 'hold_expires_at'], name='appointment_status_6b30fb_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+        ('appointments', '0005_timeslot_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='accounts.doctor')),
+                ('offered_slot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_offers', to='appointments.timeslot')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='accounts.patient')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('offered_slot__isnull', True)), fields=['doctor', 'start_date', 'end_date', 'created_at'], name='waitlist_waiting_idx')],
+            },
+        ),
+    ]
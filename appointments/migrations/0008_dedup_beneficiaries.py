@@ -0,0 +1,49 @@
+"""
+Merge beneficiaries that repeat a name for the same patient (ignoring
+case and surrounding spaces) before 0009 makes that unique: the oldest
+row is kept and appointments pointing at the others are repointed to it
+in bulk.
+"""
+from django.db import migrations
+from django.db.models import Case, Value, When
+from django.db.models.functions import Lower, Trim
+
+BATCH_SIZE = 500
+
+
+def merge_duplicates(apps, schema_editor):
+    Beneficiary = apps.get_model('appointments', 'Beneficiary')
+    Appointment = apps.get_model('appointments', 'Appointment')
+    ArchivedAppointment = apps.get_model('appointments', 'ArchivedAppointment')
+
+    # Trim the stored names so the constraint's LOWER() sees what the form will
+    Beneficiary.objects.update(first_name=Trim('first_name'), last_name=Trim('last_name'))
+    rows = (
+        Beneficiary.objects.annotate(first=Lower('first_name'), last=Lower('last_name'))
+        .order_by('pk')
+        .values_list('pk', 'patient_id', 'first', 'last')
+    )
+    first_seen, keeper_of = {}, {}
+    for pk, *key in rows.iterator(chunk_size=BATCH_SIZE * 4):
+        keep = first_seen.setdefault(tuple(key), pk)
+        if keep != pk:
+            keeper_of[pk] = keep
+
+    duplicate_ids = list(keeper_of)
+    for start in range(0, len(duplicate_ids), BATCH_SIZE):
+        batch = duplicate_ids[start:start + BATCH_SIZE]
+        keeper = Case(*[When(beneficiary_id=pk, then=Value(keeper_of[pk])) for pk in batch])
+        for model in (Appointment, ArchivedAppointment):
+            model.objects.filter(beneficiary_id__in=batch).update(beneficiary_id=keeper)
+        Beneficiary.objects.filter(pk__in=batch).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_reminders'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
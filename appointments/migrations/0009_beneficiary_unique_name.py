@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:25
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_image_renditions'),
+        ('appointments', '0008_dedup_beneficiaries'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='beneficiary',
+            constraint=models.UniqueConstraint(models.F('patient'), django.db.models.functions.text.Lower('first_name'), django.db.models.functions.text.Lower('last_name'), name='unique_beneficiary_name'),
+        ),
+    ]
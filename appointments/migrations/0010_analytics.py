@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_search_indexes'),
+        ('appointments', '0009_beneficiary_unique_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cancellation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('booked_at', models.DateTimeField()),
+                ('cancelled_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cancellations', to='accounts.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['slot_date', 'doctor'], name='appointment_slot_da_e23dad_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlotUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('slots', models.PositiveIntegerField()),
+                ('booked', models.PositiveIntegerField()),
+                ('blocked', models.PositiveIntegerField()),
+                ('final', models.BooleanField(default=False)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_usage', to='accounts.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='appointment_date_1fb780_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'date', 'hour'), name='unique_slot_usage')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def drop_inverted_intervals(apps, schema_editor):
+    # They never produced a slot; the constraint below would refuse them
+    WeeklyTemplateInterval = apps.get_model('appointments', 'WeeklyTemplateInterval')
+    WeeklyTemplateInterval.objects.filter(start_time__gte=F('end_time')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_analytics'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_inverted_intervals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='weeklytemplateinterval',
+            constraint=models.CheckConstraint(condition=models.Q(('start_time__lt', models.F('end_time'))), name='interval_start_before_end'),
+        ),
+    ]
@@ -1,7 +1,13 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Lower
 from accounts.models import User, Patient, Doctor
 from django.utils import timezone
 
+from .events import publish_slot_change
+from .versions import bump_availability_version
+
 class Planning(models.Model):
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='plannings')
     month = models.PositiveIntegerField()  # 1-12
@@ -17,23 +23,28 @@ class Planning(models.Model):
         import calendar
         from datetime import datetime, timedelta, time
 
+        from .schedules import bulk_create_slots
+
         # Clear existing slots for this month
         self.slots.all().delete()
 
         num_days = calendar.monthrange(self.year, self.month)[1]
 
+        slots = []
         for day in range(1, num_days + 1):
             date_obj = timezone.datetime(self.year, self.month, day).date()
             for hour in range(start_hour, end_hour):
                 start_time = datetime.combine(date_obj, time(hour, 0))
                 end_time = start_time + timedelta(minutes=slot_duration)
-                TimeSlot.objects.create(
+                slots.append(TimeSlot(
                     planning=self,
                     date=date_obj,
                     start_time=start_time.time(),
                     end_time=end_time.time(),
                     status='free'
-                )
+                ))
+        bulk_create_slots(slots)
+        bump_availability_version(self.doctor_id)
 
 
 class TimeSlot(models.Model):
@@ -49,11 +60,88 @@ class TimeSlot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='free')
+    # Set while 'pending': the patient filling in the booking form (see appointments.holds)
+    held_by = models.ForeignKey(Patient, on_delete=models.SET_NULL, blank=True, null=True, related_name='held_slots')
+    hold_expires_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'hold_expires_at'])]
 
     def __str__(self):
         return f"{self.planning.doctor} | {self.date} {self.start_time}-{self.end_time} ({self.status})"
 
 
+class WeeklyTemplate(models.Model):
+    """
+    A doctor's recurring week: working intervals and breaks per weekday,
+    cut into slots of ``slot_duration`` minutes by ``appointments.schedules``.
+    """
+    doctor = models.OneToOneField(Doctor, on_delete=models.CASCADE, related_name='weekly_template')
+    slot_duration = models.PositiveIntegerField(default=60)  # minutes
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.doctor} - {self.slot_duration} min slots"
+
+
+class WeeklyTemplateInterval(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    KIND_CHOICES = [
+        ('work', 'Working hours'),
+        ('break', 'Break'),
+    ]
+
+    template = models.ForeignKey(WeeklyTemplate, on_delete=models.CASCADE, related_name='intervals')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='work')
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        constraints = [
+            models.CheckConstraint(condition=Q(start_time__lt=F('end_time')), name='interval_start_before_end'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time}-{self.end_time} ({self.kind})"
+
+    def clean(self):
+        if self.start_time is None or self.end_time is None:
+            return
+        if self.start_time >= self.end_time:
+            raise ValidationError({'end_time': 'End time must be after start time.'})
+        # Breaks are meant to sit inside working hours; only intervals of
+        # the same kind may not overlap.
+        overlapping = WeeklyTemplateInterval.objects.filter(
+            template_id=self.template_id, weekday=self.weekday, kind=self.kind,
+            start_time__lt=self.end_time, end_time__gt=self.start_time,
+        ).exclude(pk=self.pk)
+        if self.template_id is not None and overlapping.exists():
+            raise ValidationError('This interval overlaps another one of the same day.')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._touch_template()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._touch_template()
+        return result
+
+    def _touch_template(self):
+        # updated_at is part of the compiled template cache key
+        WeeklyTemplate.objects.filter(pk=self.template_id).update(updated_at=timezone.now())
+
+
 class Beneficiary(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='beneficiaries')
     first_name = models.CharField(max_length=100)
@@ -61,6 +149,15 @@ class Beneficiary(models.Model):
     gender = models.CharField(max_length=10, choices=[("Male", "Male"), ("Female", "Female"), ("Other", "Other")])
     age = models.PositiveIntegerField()
 
+    class Meta:
+        # One row per person and patient, names compared case-insensitively;
+        # also the index behind BeneficiaryForm.save_for's lookup.
+        constraints = [
+            models.UniqueConstraint(
+                'patient', Lower('first_name'), Lower('last_name'), name='unique_beneficiary_name',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -84,6 +181,30 @@ class Appointment(models.Model):
         target = f"{self.beneficiary.first_name} {self.beneficiary.last_name}" if self.beneficiary else self.patient.user.get_full_name()
         return f"{target} -> Dr. {self.doctor.user.last_name} | {self.time_slot.date} {self.time_slot.start_time}"
 
+class Reminder(models.Model):
+    """
+    A reminder email due before an appointment, precomputed by
+    ``appointments.reminders`` so the scheduler only scans due rows.
+    """
+    KIND_CHOICES = [
+        ('24h', '24 hours before'),
+        ('1h', '1 hour before'),
+    ]
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    due_at = models.DateTimeField()
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['appointment', 'kind'], name='unique_reminder_kind')]
+        indexes = [
+            models.Index(fields=['due_at'], condition=models.Q(sent_at__isnull=True), name='reminder_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder for appointment {self.appointment_id} at {self.due_at}"
+
 class DoctorUnavailability(models.Model):
     doctor = models.ForeignKey('accounts.Doctor', on_delete=models.CASCADE, related_name='unavailabilities')
     start_date = models.DateField()
@@ -101,4 +222,127 @@ class DoctorUnavailability(models.Model):
             planning__doctor=self.doctor,
             date__range=(self.start_date, self.end_date)
         )
+        changed = list(slots.exclude(status='blocked').values('id', 'date', 'start_time', 'end_time'))
         slots.update(status='blocked')
+        publish_slot_change(self.doctor_id, changed, 'blocked')
+        bump_availability_version(self.doctor_id)
+
+    def release_slots(self):
+        """
+        Undo ``block_slots`` for days no other unavailability of the doctor
+        covers, and offer the freed slots to the waitlist.
+        """
+        from .waitlist import offer_freed_slots
+
+        others = DoctorUnavailability.objects.filter(
+            doctor_id=self.doctor_id, start_date__lte=models.OuterRef('date'), end_date__gte=models.OuterRef('date'),
+        ).exclude(pk=self.pk)
+        slots = TimeSlot.objects.filter(
+            planning__doctor=self.doctor, date__range=(self.start_date, self.end_date), status='blocked',
+        ).exclude(models.Exists(others))
+        slots.filter(appointment__isnull=False).update(status='reserved')
+        freed = list(slots.filter(appointment__isnull=True).values('id', 'date', 'start_time', 'end_time'))
+        TimeSlot.objects.filter(pk__in=[slot['id'] for slot in freed]).update(status='free')
+        publish_slot_change(self.doctor_id, freed, 'free')
+        bump_availability_version(self.doctor_id)
+        offer_freed_slots([slot['id'] for slot in freed])
+
+    def delete(self, *args, **kwargs):
+        self.release_slots()
+        return super().delete(*args, **kwargs)
+
+
+class WaitlistEntry(models.Model):
+    """
+    A patient waiting for any slot of a doctor between two dates. When a
+    slot in the range is freed, the oldest waiting entry gets it on hold
+    (``appointments.waitlist``) and ``offered_slot`` points at it.
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='waitlist_entries')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    offered_slot = models.ForeignKey(TimeSlot, on_delete=models.SET_NULL, blank=True, null=True, related_name='waitlist_offers')
+
+    class Meta:
+        indexes = [
+            # Only waiting entries are searched when a slot is freed
+            models.Index(
+                fields=['doctor', 'start_date', 'end_date', 'created_at'],
+                condition=models.Q(offered_slot__isnull=True), name='waitlist_waiting_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.patient} waiting for {self.doctor} {self.start_date} to {self.end_date}"
+
+
+# --- Archive tables (filled by appointments.archive, never written by views) ---
+class ArchivedTimeSlot(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # id the slot had in TimeSlot
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_slots')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    status = models.CharField(max_length=20, choices=TimeSlot.STATUS_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['doctor', 'date'])]
+
+    def __str__(self):
+        return f"{self.doctor} | {self.date} {self.start_time}-{self.end_time} ({self.status}, archived)"
+
+
+class ArchivedAppointment(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # id the appointment had in Appointment
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='archived_appointments')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_appointments')
+    time_slot = models.OneToOneField(ArchivedTimeSlot, on_delete=models.CASCADE, related_name='appointment')
+    beneficiary = models.ForeignKey(Beneficiary, on_delete=models.SET_NULL, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    reason = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived appointment {self.pk} -> Dr. {self.doctor.user.last_name} | {self.time_slot.date}"
+
+
+# --- Analytics (read by appointments.analytics) ---
+class SlotUsage(models.Model):
+    """
+    Slots per doctor, day and hour, rolled up by ``appointments.analytics``
+    before past free slots are pruned. Rows of past days are ``final``;
+    upcoming days are recounted by the ``materialize_slots`` worker.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='slot_usage')
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    slots = models.PositiveIntegerField()  # all slots, blocked ones included
+    booked = models.PositiveIntegerField()
+    blocked = models.PositiveIntegerField()
+    final = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['doctor', 'date', 'hour'], name='unique_slot_usage')]
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f"{self.doctor_id} {self.date} {self.hour}h: {self.booked}/{self.slots}"
+
+
+class Cancellation(models.Model):
+    """A cancelled appointment; cancelling deletes the appointment and frees its slot."""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='cancellations')
+    slot_date = models.DateField()
+    start_time = models.TimeField()
+    booked_at = models.DateTimeField()
+    cancelled_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['slot_date', 'doctor'])]
+
+    def __str__(self):
+        return f"Cancellation for {self.doctor_id} on {self.slot_date} {self.start_time}"
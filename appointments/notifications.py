@@ -0,0 +1,42 @@
+"""Appointment emails, queued in the caller's transaction through core.outbox."""
+from django.utils.translation import gettext_lazy as _
+
+from core.outbox import enqueue
+
+SUBJECTS = {
+    'booked': _("Your appointment is booked"),
+    'cancelled': _("Your appointment was cancelled"),
+    'completed': _("Thank you for your visit"),
+    'reminder': _("Reminder: your appointment is coming up"),
+}
+OFFER_SUBJECT = _("A slot you were waiting for is held for you")
+
+
+def notify_patient(appointment, event, key=''):
+    """
+    Queue the ``event`` email ('booked', 'cancelled', 'completed',
+    'reminder') for ``appointment``'s patient. ``key`` tells apart several
+    emails of one event, such as the 24h and 1h reminders.
+    """
+    user = appointment.patient.user
+    enqueue(
+        f'appointment-{event}:{appointment.pk}:{key}' if key else f'appointment-{event}:{appointment.pk}',
+        user.email,
+        SUBJECTS[event],
+        f'emails/appointment_{event}.txt',
+        {'appointment': appointment, 'slot': appointment.time_slot, 'user': user, 'doctor': appointment.doctor.user},
+        language=user.preferred_language,
+    )
+
+
+def notify_waitlist_offer(entry, slot):
+    """Queue the email telling ``entry``'s patient that ``slot`` is on hold for them."""
+    user = entry.patient.user
+    enqueue(
+        f'waitlist-offer:{entry.pk}:{slot.pk}',
+        user.email,
+        OFFER_SUBJECT,
+        'emails/waitlist_offer.txt',
+        {'slot': slot, 'user': user, 'doctor': slot.planning.doctor.user},
+        language=user.preferred_language,
+    )
@@ -0,0 +1,71 @@
+"""
+Appointment reminders.
+
+``schedule_reminders`` turns an appointment into one ``Reminder`` row per
+offset (24h and 1h before) whenever it is booked or rescheduled; a
+cancellation deletes them with the appointment. ``send_due_reminders``
+(the ``send_reminders`` command) then only reads the partial
+``reminder_due_idx`` index: each batch is claimed with
+``select_for_update(skip_locked=True)``, so parallel workers split the
+due rows instead of sending them twice, and the emails go through the
+outbox in the same transaction that marks the reminders sent.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Reminder
+from .notifications import notify_patient
+
+OFFSETS = {
+    '24h': timedelta(hours=24),
+    '1h': timedelta(hours=1),
+}
+BATCH_SIZE = 500
+UPCOMING_STATUSES = ('confirmed', 'modified')
+
+
+def appointment_start(slot):
+    return timezone.make_aware(datetime.combine(slot.date, slot.start_time))
+
+
+def schedule_reminders(appointment, new=False):
+    """(Re)compute the reminders of ``appointment`` from its current slot; ``new`` has none yet."""
+    now = timezone.now()
+    start = appointment_start(appointment.time_slot)
+    if not new:
+        # After a reschedule even a reminder already sent is due again for the new time
+        Reminder.objects.filter(appointment=appointment).delete()
+    # A reminder whose time has passed (booked at the last minute) is skipped
+    Reminder.objects.bulk_create(
+        Reminder(appointment=appointment, kind=kind, due_at=start - offset)
+        for kind, offset in OFFSETS.items()
+        if start - offset > now
+    )
+
+
+def send_due_reminders(batch_size=BATCH_SIZE):
+    """Queue the emails of all due reminders, batch by batch. Returns the number queued."""
+    queued = 0
+    while True:
+        with transaction.atomic():
+            reminders = list(
+                Reminder.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('appointment__patient__user', 'appointment__doctor__user', 'appointment__time_slot')
+                .filter(sent_at__isnull=True, due_at__lte=timezone.now())
+                .order_by('due_at')[:batch_size]
+            )
+            if not reminders:
+                return queued
+            now = timezone.now()
+            for reminder in reminders:
+                appointment = reminder.appointment
+                # Done (or past) appointments need no reminder any more
+                if appointment.status in UPCOMING_STATUSES and appointment_start(appointment.time_slot) > now:
+                    notify_patient(appointment, 'reminder', key=f'{reminder.kind}:{reminder.due_at:%Y%m%d%H%M}')
+                    queued += 1
+                reminder.sent_at = now
+            Reminder.objects.bulk_update(reminders, ['sent_at'])
+        if len(reminders) < batch_size:
+            return queued
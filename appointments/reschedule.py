@@ -0,0 +1,62 @@
+"""
+Moving an appointment to another slot of the same doctor in one step.
+
+``reschedule`` locks the appointment, then both slots in primary key
+order, so two reschedules that cross the same pair of slots wait for
+each other instead of deadlocking. Inside that one transaction the new
+slot is reserved (with the same conditional UPDATE as a booking, so a
+hold by another patient still wins), the old one is freed, the
+appointment points at the new slot with status 'modified' and its
+reminders are recomputed. Nobody can take the old time before the new
+one is secured, and a failure leaves everything as it was.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish_slot_change
+from .holds import confirm_hold
+from .models import Appointment, TimeSlot
+from .reminders import appointment_start, schedule_reminders
+from .versions import bump_patient_appointments_version
+from .waitlist import offer_freed_slots
+
+MOVABLE_STATUSES = ('confirmed', 'modified')
+
+
+def reschedule(appointment_id, slot_id):
+    """Move appointment ``appointment_id`` to slot ``slot_id``; ValidationError if it can't."""
+    with transaction.atomic():
+        appointment = Appointment.objects.select_for_update().get(pk=appointment_id)
+        if appointment.status not in MOVABLE_STATUSES:
+            raise ValidationError("Only upcoming appointments can be rescheduled.")
+        if appointment.time_slot_id == slot_id:
+            raise ValidationError("The appointment is already in this slot.")
+
+        slots = {
+            slot.pk: slot
+            for slot in TimeSlot.objects.select_for_update(of=('self',))
+            .select_related('planning')
+            .filter(pk__in=(appointment.time_slot_id, slot_id))
+            .order_by('pk')
+        }
+        old, new = slots[appointment.time_slot_id], slots.get(slot_id)
+        if new is None or new.planning.doctor_id != appointment.doctor_id:
+            raise ValidationError("Pick another slot of the same doctor.")
+        # Covers earlier days and the hours already gone today
+        if appointment_start(new) <= timezone.now():
+            raise ValidationError("This slot is in the past.")
+        if not confirm_hold(new, appointment.patient_id):
+            raise ValidationError("This slot is no longer available.")
+
+        TimeSlot.objects.filter(pk=old.pk).update(status='free', held_by=None, hold_expires_at=None)
+        old.status = 'free'
+        publish_slot_change(appointment.doctor_id, [old], 'free')
+        appointment.time_slot = new
+        appointment.status = 'modified'
+        appointment.save(update_fields=['time_slot', 'status'])
+        schedule_reminders(appointment)
+        offer_freed_slots([old.pk])
+        # confirm_hold already bumped availability for the new slot's doctor
+        bump_patient_appointments_version(appointment.patient_id)
+    return appointment
@@ -0,0 +1,212 @@
+"""
+Slot generation from weekly templates.
+
+A ``WeeklyTemplate`` is compiled once into the slot times of each weekday
+(working intervals minus breaks, cut into ``slot_duration`` pieces).
+Compiled templates are cached in-process and keyed on the template's
+``updated_at``, so expanding a whole year for every doctor only walks
+dates. Every slot, template-based or not, is inserted through
+``bulk_create_slots``.
+
+``materialize_horizon`` and ``prune_past_free_slots`` back the
+``materialize_slots`` command, which keeps a rolling window of future
+slots for doctors with a template and drops unused past ones so ``TimeSlot`` stays bounded (their days
+are rolled up into ``SlotUsage`` first, see appointments.analytics).
+"""
+from datetime import time, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .analytics import finalize_usage
+from .models import Planning, TimeSlot, WeeklyTemplate
+from .versions import bump_availability_version
+
+SLOT_BATCH_SIZE = 1000
+
+# template pk -> (updated_at, compiled week)
+_compiled = {}
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def _subtract(intervals, breaks):
+    """Parts of the ``(start, end)`` minute intervals not covered by ``breaks``."""
+    pieces = []
+    for start, end in intervals:
+        for break_start, break_end in breaks:
+            if break_end <= start or break_start >= end:
+                continue
+            if break_start > start:
+                pieces.append((start, break_start))
+            start = max(start, break_end)
+        if start < end:
+            pieces.append((start, end))
+    return pieces
+
+
+def compile_template(template):
+    """
+    Slot ``(start_time, end_time)`` tuples for each weekday (Monday first).
+    Prefetch ``intervals`` when compiling many templates.
+    """
+    cached = _compiled.get(template.pk)
+    if cached is not None and cached[0] == template.updated_at:
+        return cached[1]
+
+    work = [[] for _ in range(7)]
+    breaks = [[] for _ in range(7)]
+    for interval in template.intervals.all():
+        target = breaks if interval.kind == 'break' else work
+        target[interval.weekday].append((_minutes(interval.start_time), _minutes(interval.end_time)))
+
+    duration = template.slot_duration
+    week = []
+    for weekday in range(7):
+        slots = []
+        for start, end in _subtract(sorted(work[weekday]), sorted(breaks[weekday])):
+            while start + duration <= end:
+                slots.append((_time(start), _time(start + duration)))
+                start += duration
+        week.append(tuple(slots))
+    week = tuple(week)
+    _compiled[template.pk] = (template.updated_at, week)
+    return week
+
+
+def expand(week, start_date, end_date):
+    """Yield ``(date, start_time, end_time)`` for every slot of a compiled week in the range."""
+    day = start_date
+    while day <= end_date:
+        for start_time, end_time in week[day.weekday()]:
+            yield day, start_time, end_time
+        day += timedelta(days=1)
+
+
+def months_between(start_date, end_date):
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def ensure_plannings(doctor_ids, start_date, end_date):
+    """Create missing plannings for the range; returns ``{(doctor_id, year, month): planning_id}``."""
+    months = set(months_between(start_date, end_date))
+    existing = Planning.objects.filter(
+        doctor_id__in=doctor_ids, year__range=(start_date.year, end_date.year),
+    ).values_list('doctor_id', 'year', 'month', 'id')
+    plannings = {(doctor_id, year, month): pk for doctor_id, year, month, pk in existing if (year, month) in months}
+
+    missing = [
+        Planning(doctor_id=doctor_id, year=year, month=month)
+        for doctor_id in doctor_ids for year, month in months
+        if (doctor_id, year, month) not in plannings
+    ]
+    if missing:
+        Planning.objects.bulk_create(missing, ignore_conflicts=True)
+        return ensure_plannings(doctor_ids, start_date, end_date)
+    return plannings
+
+
+def bulk_create_slots(slots):
+    return TimeSlot.objects.bulk_create(slots, batch_size=SLOT_BATCH_SIZE)
+
+
+def generate_slots(start_date, end_date, doctor_ids=None, replace=False):
+    """
+    Materialize template slots from ``start_date`` to ``end_date``
+    (inclusive) for every doctor with a weekly template.
+
+    Slots that already exist at the same date and start time are kept, so
+    a range can be generated again safely. With ``replace`` the free slots
+    of the range are deleted first, so template changes take effect;
+    booked, pending and blocked slots are never touched.
+    Returns the number of slots created.
+    """
+    templates = WeeklyTemplate.objects.prefetch_related('intervals')
+    if doctor_ids is not None:
+        templates = templates.filter(doctor_id__in=doctor_ids)
+    templates = list(templates)
+    if not templates:
+        return 0
+
+    plannings = ensure_plannings([template.doctor_id for template in templates], start_date, end_date)
+    created = 0
+    for template in templates:
+        doctor_id = template.doctor_id
+        with transaction.atomic():
+            in_range = TimeSlot.objects.filter(planning__doctor_id=doctor_id, date__range=(start_date, end_date))
+            if replace:
+                in_range.filter(status='free').delete()
+            existing = set(in_range.values_list('date', 'start_time'))
+            slots = [
+                TimeSlot(
+                    planning_id=plannings[doctor_id, day.year, day.month],
+                    date=day, start_time=start_time, end_time=end_time, status='free',
+                )
+                for day, start_time, end_time in expand(compile_template(template), start_date, end_date)
+                if (day, start_time) not in existing
+            ]
+            bulk_create_slots(slots)
+            if slots or replace:
+                bump_availability_version(doctor_id)
+        created += len(slots)
+    return created
+
+
+def materialize_horizon(weeks, today=None):
+    """
+    Make sure every templated doctor has slots up to ``weeks`` weeks ahead.
+
+    Only doctors with a ``WeeklyTemplate`` are covered: the others keep
+    planning month by month (``Planning.generate_monthly_slots``) and get
+    no slots from here.
+    Generation resumes the day after each doctor's last future slot, so a
+    daily run only appends the day that entered the window.
+    Returns the number of slots created.
+    """
+    today = today or timezone.localdate()
+    end = today + timedelta(weeks=weeks, days=-1)
+    doctor_ids = list(WeeklyTemplate.objects.values_list('doctor_id', flat=True))
+    last_dates = dict(
+        TimeSlot.objects.filter(planning__doctor_id__in=doctor_ids, date__range=(today, end))
+        .values_list('planning__doctor_id').annotate(last=Max('date'))
+    )
+
+    by_start = {}
+    for doctor_id in doctor_ids:
+        last = last_dates.get(doctor_id)
+        start = last + timedelta(days=1) if last else today
+        if start <= end:
+            by_start.setdefault(start, []).append(doctor_id)
+    return sum(
+        generate_slots(start, end, doctor_ids=ids)
+        for start, ids in sorted(by_start.items())
+    )
+
+
+def prune_past_free_slots(batch_size=SLOT_BATCH_SIZE, today=None):
+    """
+    Delete free slots before today in batches of ``batch_size``, each in its
+    own short transaction. Slots still referenced by an appointment (e.g.
+    cancelled ones) are kept. Returns the number of slots deleted.
+    """
+    today = today or timezone.localdate()
+    # Utilization of those days can't be counted once their free slots are gone
+    finalize_usage(today)
+    past_free = TimeSlot.objects.filter(date__lt=today, status='free', appointment__isnull=True)
+    deleted = 0
+    while True:
+        ids = list(past_free.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += TimeSlot.objects.filter(pk__in=ids, status='free').delete()[1].get('appointments.TimeSlot', 0)
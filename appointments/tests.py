@@ -1,3 +1,770 @@
-from django.test import TestCase
+import asyncio
+import random
+import threading
+from datetime import time, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Doctor, Patient, User
+from core.models import OutboxEmail
+from core.outbox import deliver_pending
+from .analytics import build_report, period_bounds, record_open_usage
+from .archive import appointment_history, archive_appointments
+from .events import SLOTS_PER_EVENT, broker, publish_slot_change
+from .forms import BeneficiaryForm, find_beneficiary
+from .holds import confirm_hold, place_hold, release_expired_holds
+from .models import (
+    Appointment, ArchivedAppointment, ArchivedTimeSlot, Beneficiary, Cancellation, DoctorUnavailability, Planning,
+    Reminder, SlotUsage, TimeSlot, WaitlistEntry, WeeklyTemplate, WeeklyTemplateInterval,
+)
+from .reminders import send_due_reminders
+from .reschedule import reschedule
+from .schedules import compile_template, generate_slots, materialize_horizon, prune_past_free_slots
+from .views import slot_table_cache_key
+from .versions import (
+    availability_version, bump_availability_version, calendar_version, patient_appointments_version,
+)
+from .waitlist import offer_freed_slots
+
+PLAIN_STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class SlotsTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        doctor_user = User.objects.create(
+            email='doctor@medbook.test', first_name='Doc', last_name='Tor', role=User.Role.DOCTOR,
+        )
+        cls.doctor = Doctor.objects.create(user=doctor_user, specialty='General')
+        cls.patient_user = User.objects.create(
+            email='patient@medbook.test', first_name='Pat', last_name='Ient', role=User.Role.PATIENT,
+        )
+        cls.patient = Patient.objects.create(user=cls.patient_user)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        planning = Planning.objects.create(doctor=cls.doctor, month=tomorrow.month, year=tomorrow.year)
+        cls.slot = TimeSlot.objects.create(
+            planning=planning, date=tomorrow, start_time=time(9), end_time=time(10),
+        )
+
+    def book(self):
+        self.client.force_login(self.patient_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('appointment:book_appointment', args=[self.slot.pk]), {'for_self': '1'})
+        return Appointment.objects.get(time_slot=self.slot)
+
+
+class VersionBumpTests(SlotsTestMixin, TestCase):
+    def test_booking_bumps_availability_and_patient_versions(self):
+        availability = availability_version(self.doctor.pk)
+        appointments = patient_appointments_version(self.patient.pk)
+        self.book()
+        self.assertGreater(availability_version(self.doctor.pk), availability)
+        self.assertGreater(patient_appointments_version(self.patient.pk), appointments)
+
+    def test_cancelling_bumps_availability_and_patient_versions(self):
+        appointment = self.book()
+        availability = availability_version(self.doctor.pk)
+        appointments = patient_appointments_version(self.patient.pk)
+        self.client.force_login(self.doctor.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('appointment:cancel_appointment', args=[appointment.pk]))
+        self.assertGreater(availability_version(self.doctor.pk), availability)
+        self.assertGreater(patient_appointments_version(self.patient.pk), appointments)
+
+    def test_marking_done_bumps_calendar_and_patient_versions(self):
+        appointment = self.book()
+        calendar = calendar_version(self.doctor.pk)
+        appointments = patient_appointments_version(self.patient.pk)
+        self.client.force_login(self.doctor.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('appointment:mark_done', args=[appointment.pk]))
+        self.assertGreater(calendar_version(self.doctor.pk), calendar)
+        self.assertGreater(patient_appointments_version(self.patient.pk), appointments)
+
+    def test_booking_queues_confirmation_email(self):
+        appointment = self.book()
+        email = OutboxEmail.objects.get(dedup_key=f'appointment-booked:{appointment.pk}')
+        self.assertEqual(email.to_email, self.patient_user.email)
+
+    def test_bump_waits_for_commit(self):
+        availability = availability_version(self.doctor.pk)
+        self.client.force_login(self.patient_user)
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(reverse('appointment:book_appointment', args=[self.slot.pk]), {'for_self': '1'})
+        self.assertEqual(availability_version(self.doctor.pk), availability)
+
+
+class BeneficiaryReuseTests(SlotsTestMixin, TestCase):
+    def book_for(self, slot, data):
+        self.client.force_login(self.patient_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('appointment:book_appointment', args=[slot.pk]), data)
+        return Appointment.objects.get(time_slot=slot)
+
+    def test_same_name_reuses_beneficiary(self):
+        later = TimeSlot.objects.create(
+            planning=self.slot.planning, date=self.slot.date, start_time=time(10), end_time=time(11),
+        )
+        first = self.book_for(self.slot, {'first_name': 'Emma', 'last_name': 'Doe', 'gender': 'Female', 'age': 6})
+        second = self.book_for(later, {'first_name': ' emma ', 'last_name': 'DOE', 'gender': 'Female', 'age': 7})
+        self.assertEqual(first.beneficiary_id, second.beneficiary_id)
+        self.assertEqual(self.patient.beneficiaries.get().age, 7)
+
+    def test_accented_name_reuses_beneficiary(self):
+        data = {'first_name': 'Émilie', 'last_name': 'Ñuñez', 'gender': 'Female', 'age': 6}
+        first, second = BeneficiaryForm(data), BeneficiaryForm(data)
+        self.assertTrue(first.is_valid() and second.is_valid())
+        self.assertEqual(first.save_for(self.patient), second.save_for(self.patient))
+        self.assertEqual(find_beneficiary(self.patient, 'ÉMILIE', 'Ñuñez').first_name, 'Émilie')
+        self.assertEqual(self.patient.beneficiaries.count(), 1)
+
+    def test_known_beneficiary_can_be_picked(self):
+        beneficiary = Beneficiary.objects.create(
+            patient=self.patient, first_name='Emma', last_name='Doe', gender='Female', age=6,
+        )
+        appointment = self.book_for(self.slot, {'beneficiary_id': beneficiary.pk})
+        self.assertEqual(appointment.beneficiary, beneficiary)
+        self.assertEqual(self.patient.beneficiaries.count(), 1)
+
+
+class SlotHoldTests(SlotsTestMixin, TestCase):
+    def other_patient(self):
+        user = User.objects.create(email='other@medbook.test', role=User.Role.PATIENT)
+        return Patient.objects.create(user=user)
+
+    def test_hold_blocks_other_patients_until_it_expires(self):
+        other = self.other_patient()
+        self.assertTrue(place_hold(self.slot, self.patient))
+        self.assertFalse(place_hold(self.slot, other))
+        self.assertFalse(confirm_hold(self.slot, other))
+        TimeSlot.objects.filter(pk=self.slot.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(confirm_hold(self.slot, other))
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'reserved')
+
+    def test_booking_confirms_own_hold(self):
+        self.assertTrue(place_hold(self.slot, self.patient))
+        self.book()
+        slot = TimeSlot.objects.get(pk=self.slot.pk)
+        self.assertEqual((slot.status, slot.held_by, slot.hold_expires_at), ('reserved', None, None))
+
+    def test_sweeper_releases_only_expired_holds(self):
+        later = TimeSlot.objects.create(
+            planning=self.slot.planning, date=self.slot.date, start_time=time(10), end_time=time(11),
+        )
+        place_hold(self.slot, self.patient)
+        place_hold(later, self.patient)
+        TimeSlot.objects.filter(pk=self.slot.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_holds(), 1)
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'free')
+        self.assertEqual(TimeSlot.objects.get(pk=later.pk).status, 'pending')
+
+    @override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+    def test_booking_form_holds_the_slot(self):
+        self.client.force_login(self.patient_user)
+        response = self.client.get(reverse('appointment:book_appointment', args=[self.slot.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'appointments/book_appointment.html')
+        slot = TimeSlot.objects.get(pk=self.slot.pk)
+        self.assertEqual((slot.status, slot.held_by), ('pending', self.patient))
+        self.assertGreater(slot.hold_expires_at, timezone.now())
+
+    @override_settings(SLOT_HOLD_LIMIT=1)
+    def test_patient_cannot_hold_more_than_the_limit(self):
+        later = TimeSlot.objects.create(
+            planning=self.slot.planning, date=self.slot.date, start_time=time(10), end_time=time(11),
+        )
+        self.assertTrue(place_hold(self.slot, self.patient))
+        self.assertTrue(place_hold(self.slot, self.patient))  # renewing a hold is fine
+        with self.assertRaises(ValidationError):
+            place_hold(later, self.patient)
+        self.assertEqual(TimeSlot.objects.get(pk=later.pk).status, 'free')
+        # Expired holds do not count
+        TimeSlot.objects.filter(pk=self.slot.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(place_hold(later, self.patient))
+
+
+class RescheduleTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        self.appointment = self.book()
+        self.target = TimeSlot.objects.create(
+            planning=self.slot.planning, date=self.slot.date, start_time=time(11), end_time=time(12),
+        )
+
+    def test_moves_appointment_and_swaps_slot_statuses(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('appointment:reschedule_appointment', args=[self.appointment.pk]), {'slot_id': self.target.pk},
+            )
+        self.assertRedirects(response, reverse('core:patient_dashboard'), fetch_redirect_response=False)
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.time_slot_id, self.appointment.status), (self.target.pk, 'modified'))
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'free')
+        self.assertEqual(TimeSlot.objects.get(pk=self.target.pk).status, 'reserved')
+
+    def test_taken_slot_leaves_everything_unchanged(self):
+        TimeSlot.objects.filter(pk=self.target.pk).update(status='blocked')
+        with self.assertRaises(ValidationError):
+            reschedule(self.appointment.pk, self.target.pk)
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.time_slot_id, self.appointment.status), (self.slot.pk, 'confirmed'))
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'reserved')
+
+    def test_other_doctor_slot_is_refused(self):
+        user = User.objects.create(email='other@medbook.test', role=User.Role.DOCTOR)
+        planning = Planning.objects.create(
+            doctor=Doctor.objects.create(user=user), month=self.slot.date.month, year=self.slot.date.year,
+        )
+        other = TimeSlot.objects.create(planning=planning, date=self.slot.date, start_time=time(9), end_time=time(10))
+        with self.assertRaises(ValidationError):
+            reschedule(self.appointment.pk, other.pk)
+
+    def test_past_slot_is_refused(self):
+        earlier = timezone.localtime() - timedelta(minutes=1)
+        for day, start_time in ((earlier.date() - timedelta(days=1), time(9)), (earlier.date(), earlier.time())):
+            past = TimeSlot.objects.create(planning=self.slot.planning, date=day, start_time=start_time, end_time=start_time)
+            with self.assertRaises(ValidationError):
+                reschedule(self.appointment.pk, past.pk)
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'reserved')
+
+
+
+class ArchiveTests(SlotsTestMixin, TestCase):
+    def past_appointment(self, days_ago, status):
+        day = timezone.localdate() - timedelta(days=days_ago)
+        planning, _ = Planning.objects.get_or_create(doctor=self.doctor, month=day.month, year=day.year)
+        slot = TimeSlot.objects.create(planning=planning, date=day, start_time=time(9), end_time=time(10), status='reserved')
+        return Appointment.objects.create(patient=self.patient, doctor=self.doctor, time_slot=slot, status=status)
+
+    def test_every_past_appointment_is_archived_with_its_slot(self):
+        past = [self.past_appointment(days, status) for days, status in ((1, 'confirmed'), (2, 'completed'))]
+        upcoming = self.book()
+        self.assertEqual(archive_appointments(timezone.localdate(), batch_size=1), 2)
+        self.assertEqual(list(Appointment.objects.all()), [upcoming])
+        archived = ArchivedAppointment.objects.order_by('pk')
+        self.assertEqual([(a.pk, a.status) for a in archived], [(a.pk, a.status) for a in past])
+        self.assertEqual(
+            set(ArchivedTimeSlot.objects.values_list('pk', flat=True)), {a.time_slot_id for a in past},
+        )
+        self.assertFalse(TimeSlot.objects.filter(pk__in=[a.time_slot_id for a in past]).exists())
+
+    def test_history_unions_live_and_archived_rows(self):
+        past = self.past_appointment(1, 'completed')
+        archive_appointments(timezone.localdate())
+        upcoming = self.book()
+        rows = list(appointment_history(patient_id=self.patient.pk))
+        self.assertEqual([(row['id'], row['archived']) for row in rows], [(upcoming.pk, False), (past.pk, True)])
+        self.assertEqual(rows[1]['doctor_last_name'], 'Tor')
+        self.assertEqual(rows[1]['date'], timezone.localdate() - timedelta(days=1))
+
+    def test_archiving_keeps_dashboard_counts_and_bumps_versions(self):
+        for days, status in ((1, 'confirmed'), (2, 'modified'), (3, 'cancelled'), (4, 'completed')):
+            self.past_appointment(days, status)
+        self.client.force_login(self.patient_user)
+        stats = self.client.get(reverse('core:dashboard_stats')).json()['stats']
+        versions = patient_appointments_version(self.patient.pk), calendar_version(self.doctor.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_appointments(timezone.localdate())
+        self.assertEqual(self.client.get(reverse('core:dashboard_stats')).json()['stats'], stats)
+        self.assertEqual(stats, {'confirmed': 1, 'pending': 1, 'cancelled': 1, 'completed': 1})
+        self.assertGreater(patient_appointments_version(self.patient.pk), versions[0])
+        self.assertGreater(calendar_version(self.doctor.pk), versions[1])
+
+
+class WaitlistTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        self.appointment = self.book()
+        self.waiting = []
+        for index in range(2):
+            user = User.objects.create(email=f'waiting{index}@medbook.test', role=User.Role.PATIENT)
+            patient = Patient.objects.create(user=user)
+            WaitlistEntry.objects.create(
+                patient=patient, doctor=self.doctor, start_date=self.slot.date, end_date=self.slot.date,
+            )
+            self.waiting.append(patient)
+
+    def cancel(self):
+        self.client.force_login(self.doctor.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('appointment:cancel_appointment', args=[self.appointment.pk]))
+
+    def test_cancellation_holds_slot_for_oldest_waiting_patient(self):
+        self.cancel()
+        slot = TimeSlot.objects.get(pk=self.slot.pk)
+        self.assertEqual((slot.status, slot.held_by_id), ('pending', self.waiting[0].pk))
+        self.assertEqual(WaitlistEntry.objects.get(patient=self.waiting[0]).offered_slot_id, slot.pk)
+        self.assertIsNone(WaitlistEntry.objects.get(patient=self.waiting[1]).offered_slot_id)
+
+    def test_offer_is_emailed_with_the_hold(self):
+        self.cancel()
+        email = OutboxEmail.objects.get(to_email='waiting0@medbook.test')
+        self.assertIn('Dr. Doc Tor', email.body)
+        self.assertEqual(deliver_pending(), (3, 0))  # with the booking and cancellation emails
+        self.assertIn(['waiting0@medbook.test'], [message.to for message in mail.outbox])
+        self.assertFalse(OutboxEmail.objects.filter(to_email='waiting1@medbook.test').exists())
+
+    def test_lapsed_offer_moves_to_next_patient(self):
+        self.cancel()
+        TimeSlot.objects.filter(pk=self.slot.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired_holds()
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).held_by_id, self.waiting[1].pk)
+        self.assertFalse(WaitlistEntry.objects.filter(patient=self.waiting[0]).exists())
+
+    def test_offer_booked_by_someone_else_goes_back_in_the_queue(self):
+        self.cancel()
+        TimeSlot.objects.filter(pk=self.slot.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.client.force_login(self.waiting[1].user)
+        self.client.post(reverse('appointment:book_appointment', args=[self.slot.pk]), {'for_self': '1'})
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'reserved')
+        release_expired_holds()
+        entry = WaitlistEntry.objects.get(patient=self.waiting[0])
+        self.assertIsNone(entry.offered_slot_id)
+        # Next freed slot in range goes to them again
+        later = TimeSlot.objects.create(planning=self.slot.planning, date=self.slot.date, start_time=time(14), end_time=time(15))
+        offer_freed_slots([later.pk])
+        self.assertEqual(WaitlistEntry.objects.get(pk=entry.pk).offered_slot_id, later.pk)
+
+    def test_lifted_unavailability_offers_freed_slots(self):
+        self.appointment.delete()
+        TimeSlot.objects.filter(pk=self.slot.pk).update(status='free')
+        unavailability = DoctorUnavailability.objects.create(
+            doctor=self.doctor, start_date=self.slot.date, end_date=self.slot.date,
+        )
+        unavailability.block_slots()
+        unavailability.delete()
+        slot = TimeSlot.objects.get(pk=self.slot.pk)
+        self.assertEqual((slot.status, slot.held_by_id), ('pending', self.waiting[0].pk))
+
+
+class ReminderTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        # Far enough ahead for both reminders to be in the future
+        day = timezone.localdate() + timedelta(days=3)
+        TimeSlot.objects.filter(pk=self.slot.pk).update(date=day)
+        self.slot.refresh_from_db()
+        self.appointment = self.book()
+
+    def test_booking_schedules_both_reminders(self):
+        start = timezone.make_aware(timezone.datetime.combine(self.slot.date, self.slot.start_time))
+        self.assertEqual(
+            dict(self.appointment.reminders.values_list('kind', 'due_at')),
+            {'24h': start - timedelta(hours=24), '1h': start - timedelta(hours=1)},
+        )
+
+    def test_due_reminders_are_sent_once(self):
+        self.assertEqual(send_due_reminders(), 0)
+        self.appointment.reminders.filter(kind='24h').update(due_at=timezone.now())
+        self.assertEqual(send_due_reminders(), 1)
+        self.assertEqual(send_due_reminders(), 0)
+        self.assertEqual(OutboxEmail.objects.filter(dedup_key__startswith='appointment-reminder').count(), 1)
+
+    def test_reschedule_recomputes_reminders(self):
+        later = TimeSlot.objects.create(
+            planning=self.slot.planning, date=self.slot.date + timedelta(days=1), start_time=time(9), end_time=time(10),
+        )
+        self.appointment.reminders.update(sent_at=timezone.now())
+        reschedule(self.appointment.pk, later.pk)
+        reminders = Reminder.objects.filter(appointment=self.appointment)
+        self.assertEqual(reminders.filter(sent_at__isnull=True).count(), 2)
+        self.assertEqual(reminders.get(kind='1h').due_at.date(), later.date)
+
+
+class AnalyticsTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        # Last week: 9h booked three days ahead, 10h free, 11h blocked
+        self.day = timezone.localdate() - timedelta(days=7)
+        planning, _ = Planning.objects.get_or_create(doctor=self.doctor, month=self.day.month, year=self.day.year)
+        slots = [
+            TimeSlot.objects.create(planning=planning, date=self.day, start_time=time(hour), end_time=time(hour + 1), status=status)
+            for hour, status in ((9, 'reserved'), (10, 'free'), (11, 'blocked'))
+        ]
+        appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor, time_slot=slots[0], status='completed')
+        Appointment.objects.filter(pk=appointment.pk).update(created_at=timezone.now() - timedelta(days=10))
+
+    def test_prune_rolls_up_past_days_first(self):
+        prune_past_free_slots()
+        self.assertFalse(TimeSlot.objects.filter(date=self.day, status='free').exists())
+        usage = {row.hour: (row.slots, row.booked, row.blocked, row.final) for row in SlotUsage.objects.filter(date=self.day)}
+        self.assertEqual(usage, {9: (1, 1, 0, True), 10: (1, 0, 0, True), 11: (1, 0, 1, True)})
+
+        report = build_report(self.day, self.day)
+        doctor = report['doctors'][0]
+        self.assertEqual((doctor['slots'], doctor['booked'], doctor['utilization'], doctor['rank']), (3, 1, 0.5, 1))
+        self.assertEqual((doctor['bookings'], doctor['lead_days'], doctor['lead_buckets']['days_3_7']), (1, 3.0, 1))
+        self.assertEqual(report['specialties'][0]['specialty'], 'General')
+        row = report['heatmap']['rows'][self.day.isoweekday() - 1]
+        self.assertEqual([cell['booked'] for cell in row['cells']], [1, 0, 0])
+
+    def test_cancellations_count_against_bookings(self):
+        appointment = self.book()
+        self.client.force_login(self.doctor.user)
+        self.client.get(reverse('appointment:cancel_appointment', args=[appointment.pk]))
+        cancellation = Cancellation.objects.get()
+        self.assertEqual((cancellation.doctor_id, cancellation.slot_date), (self.doctor.pk, self.slot.date))
+
+        prune_past_free_slots()
+        record_open_usage()
+        doctor = build_report(self.day, self.slot.date)['doctors'][0]
+        self.assertEqual((doctor['bookings'], doctor['cancelled'], doctor['cancellation_rate']), (1, 1, 0.5))
+        self.assertEqual(doctor['slots'], 4)
+
+    def test_period_bounds(self):
+        self.assertEqual(period_bounds('2024-02'), (timezone.datetime(2024, 2, 1).date(), timezone.datetime(2024, 2, 29).date()))
+        self.assertEqual(period_bounds('2024')[1], timezone.datetime(2024, 12, 31).date())
+        for period in ('2024-13', 'last month', '24'):
+            with self.assertRaises(ValueError):
+                period_bounds(period)
+
+
+class WeeklyTemplateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email='doctor@medbook.test', role=User.Role.DOCTOR)
+        cls.doctor = Doctor.objects.create(user=user)
+        cls.template = WeeklyTemplate.objects.create(doctor=cls.doctor, slot_duration=45)
+        for start, end, kind in ((9, 12, 'work'), (13, 15, 'work'), (10.5, 11, 'break')):
+            WeeklyTemplateInterval.objects.create(
+                template=cls.template, weekday=0, kind=kind,
+                start_time=time(int(start), int(start % 1 * 60)), end_time=time(end),
+            )
+        today = timezone.localdate()
+        cls.monday = today + timedelta(days=7 - today.weekday())
+
+    def interval(self, start, end, kind='work', weekday=0):
+        return WeeklyTemplateInterval(template=self.template, weekday=weekday, kind=kind, start_time=start, end_time=end)
+
+    def test_compile_cuts_work_around_breaks(self):
+        week = compile_template(WeeklyTemplate.objects.get(pk=self.template.pk))
+        starts = [start.strftime('%H:%M') for start, _ in week[0]]
+        self.assertEqual(starts, ['09:00', '09:45', '11:00', '13:00', '13:45'])
+        self.assertEqual(week[1:], ((),) * 6)
+
+    def test_generate_is_idempotent_and_replace_keeps_booked_slots(self):
+        end = self.monday + timedelta(days=13)
+        self.assertEqual(generate_slots(self.monday, end), 10)
+        self.assertEqual(generate_slots(self.monday, end), 0)
+
+        booked = TimeSlot.objects.get(date=self.monday, start_time=time(13, 45))
+        TimeSlot.objects.filter(pk=booked.pk).update(status='reserved')
+        self.template.intervals.get(start_time=time(13)).delete()
+        self.assertEqual(generate_slots(self.monday, end, replace=True), 3 * 2)
+        self.assertEqual(TimeSlot.objects.filter(planning__doctor=self.doctor).count(), 7)
+        self.assertTrue(TimeSlot.objects.filter(pk=booked.pk, status='reserved').exists())
+
+    def test_interval_must_end_after_it_starts(self):
+        with self.assertRaises(ValidationError):
+            self.interval(time(18), time(17), weekday=1).full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.interval(time(18), time(17), weekday=1).save()
+
+    def test_intervals_of_the_same_kind_must_not_overlap(self):
+        with self.assertRaises(ValidationError):
+            self.interval(time(11), time(14)).full_clean()
+        self.interval(time(11), time(14), kind='break').full_clean()
+        self.interval(time(12), time(13)).full_clean()
+        self.interval(time(11), time(14), weekday=1).full_clean()
+
+    def test_horizon_only_appends_the_days_that_entered_it(self):
+        untemplated = Doctor.objects.create(user=User.objects.create(email='other@medbook.test', role=User.Role.DOCTOR))
+        self.assertEqual(materialize_horizon(2, today=self.monday), 10)
+        self.assertEqual(materialize_horizon(2, today=self.monday), 0)
+        self.assertEqual(materialize_horizon(2, today=self.monday + timedelta(days=1)), 5)
+        self.assertEqual(
+            TimeSlot.objects.filter(planning__doctor=self.doctor).latest('date').date, self.monday + timedelta(days=14),
+        )
+        self.assertFalse(TimeSlot.objects.filter(planning__doctor=untemplated).exists())
+
+    def test_prune_keeps_slots_in_use_and_future_ones(self):
+        generate_slots(self.monday, self.monday + timedelta(days=7))
+        patient = Patient.objects.create(user=User.objects.create(email='patient@medbook.test'))
+        monday_slots = TimeSlot.objects.filter(date=self.monday).order_by('start_time')
+        booked, cancelled = monday_slots[:2]
+        TimeSlot.objects.filter(pk=booked.pk).update(status='reserved')
+        Appointment.objects.create(patient=patient, doctor=self.doctor, time_slot=booked)
+        Appointment.objects.create(patient=patient, doctor=self.doctor, time_slot=cancelled, status='cancelled')
+
+        self.assertEqual(prune_past_free_slots(batch_size=2, today=self.monday + timedelta(days=1)), 3)
+        self.assertEqual(set(TimeSlot.objects.filter(date=self.monday)), {booked, cancelled})
+        self.assertEqual(TimeSlot.objects.filter(date=self.monday + timedelta(days=7)).count(), 5)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentRescheduleTests(TransactionTestCase):
+    APPOINTMENTS = 8
+    FREE_SLOTS = 4
+
+    def setUp(self):
+        doctor = Doctor.objects.create(user=User.objects.create(email='doctor@medbook.test', role=User.Role.DOCTOR))
+        day = timezone.localdate() + timedelta(days=1)
+        planning = Planning.objects.create(doctor=doctor, month=day.month, year=day.year)
+        slots = TimeSlot.objects.bulk_create(
+            TimeSlot(planning=planning, date=day, start_time=time(8 + hour), end_time=time(9 + hour))
+            for hour in range(self.APPOINTMENTS + self.FREE_SLOTS)
+        )
+        self.slot_ids = [slot.pk for slot in slots]
+        self.appointment_ids = []
+        for index, slot in enumerate(slots[:self.APPOINTMENTS]):
+            patient = Patient.objects.create(user=User.objects.create(email=f'p{index}@medbook.test'))
+            slot.status = 'reserved'
+            slot.save()
+            self.appointment_ids.append(
+                Appointment.objects.create(patient=patient, doctor=doctor, time_slot=slot).pk
+            )
+
+    def test_simultaneous_reschedules_keep_one_appointment_per_slot(self):
+        barrier = threading.Barrier(self.APPOINTMENTS)
+        errors = []
+
+        def worker(appointment_id, seed):
+            # Every slot is a target, including the ones other workers are
+            # leaving, so moves cross each other in both directions.
+            targets = self.slot_ids[:]
+            random.Random(seed).shuffle(targets)
+            try:
+                barrier.wait()
+                for slot_id in targets:
+                    try:
+                        reschedule(appointment_id, slot_id)
+                    except ValidationError:
+                        pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(appointment_id, index))
+            for index, appointment_id in enumerate(self.appointment_ids)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        booked = list(Appointment.objects.values_list('time_slot_id', flat=True))
+        self.assertEqual(len(booked), len(set(booked)))
+        self.assertCountEqual(TimeSlot.objects.filter(status='reserved').values_list('pk', flat=True), booked)
+        self.assertEqual(TimeSlot.objects.filter(status='free').count(), self.FREE_SLOTS)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class SlotTableCacheTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.patient_user)
+        self.url = reverse('appointment:view_doctor_slots', args=[self.doctor.pk])
+
+    def slot_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, sum('appointments_timeslot' in query['sql'] for query in queries)
+
+    def test_fragment_is_cached_under_the_current_version(self):
+        response, queries = self.slot_queries()
+        self.assertEqual(queries, 1)
+        key = slot_table_cache_key(self.doctor.pk, availability_version(self.doctor.pk), 'en')
+        self.assertIn('09:00', cache.get(key))
+        self.assertEqual(self.slot_queries()[1], 0)
+
+    def test_booking_invalidates_the_fragment(self):
+        self.slot_queries()
+        self.book()
+        response, queries = self.slot_queries()
+        self.assertEqual(queries, 1)
+        self.assertNotContains(response, '09:00')
+
+    def test_evicted_version_restarts_from_the_clock(self):
+        key = f'version:availability:{self.doctor.pk}'
+        cache.set(key, 1000)  # seeded long ago
+        cache.delete(key)
+        self.assertGreater(availability_version(self.doctor.pk), 1000)
+
+
+class DoctorCalendarTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(self.doctor.user)
+        self.url = reverse('appointment:doctor_calendar_json', args=[self.doctor.pk])
+        self.params = {'start': self.slot.date.isoformat()}
+
+    def test_week_grid_is_returned_column_by_column(self):
+        self.book()
+        DoctorUnavailability.objects.create(
+            doctor=self.doctor, start_date=self.slot.date, end_date=self.slot.date, reason='Conference',
+        )
+        self.client.force_login(self.doctor.user)
+        data = self.client.get(self.url, self.params).json()
+        monday = self.slot.date - timedelta(days=self.slot.date.weekday())
+        self.assertEqual((data['view'], data['start']), ('week', monday.isoformat()))
+        columns = data['columns']
+        self.assertEqual(columns['slot'], [self.slot.pk])
+        self.assertEqual(columns['day'], [self.slot.date.weekday()])
+        self.assertEqual((columns['start'], columns['status']), (['09:00'], ['reserved']))
+        self.assertEqual((columns['patient'], columns['reason']), (['Pat Ient'], ['Conference']))
+
+    def test_unchanged_grid_is_304_and_booking_changes_etag(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('appointments_timeslot', ' '.join(query['sql'] for query in queries))
+        self.assertNotEqual(self.client.get(self.url, {**self.params, 'view': 'month'})['ETag'], etag)
+
+        self.book()
+        self.client.force_login(self.doctor.user)
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_other_users_are_denied_without_etag(self):
+        self.client.force_login(self.patient_user)
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class AsyncSlotViewTests(SlotsTestMixin, TestCase):
+    client_class = AsyncClient
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_slot_page_renders_and_then_uses_the_cached_fragment(self):
+        await self.client.aforce_login(self.patient_user)
+        url = reverse('appointment:view_doctor_slots_async', args=[self.doctor.pk])
+        response = await self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '09:00')
+        # Without a version bump the slot table now comes from the cache
+        await TimeSlot.objects.filter(pk=self.slot.pk).aupdate(start_time=time(15), end_time=time(16))
+        self.assertContains(await self.client.get(url), '09:00')
+
+    async def test_slot_api_lists_free_slots(self):
+        await self.client.aforce_login(self.patient_user)
+        response = await self.client.get(reverse('appointment:doctor_slots_json', args=[self.doctor.pk]))
+        self.assertEqual(response.json(), {'doctor': self.doctor.pk, 'slots': [{
+            'id': self.slot.pk, 'date': self.slot.date.isoformat(), 'start_time': '09:00', 'end_time': '10:00',
+        }]})
+
+    async def test_anonymous_visitors_are_sent_to_login(self):
+        for name in ('view_doctor_slots_async', 'doctor_slots_json'):
+            response = await self.client.get(reverse(f'appointment:{name}', args=[self.doctor.pk]))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(settings.LOGIN_URL, response.url)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ConditionalSlotsPageTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(self.patient_user)
+        self.url = reverse('appointment:view_doctor_slots', args=[self.doctor.pk])
+
+    def test_sends_etag_and_private_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_repeat_visit_is_304_without_slot_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # Only the session and the user are loaded.
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('accounts_doctor', tables)
+        self.assertNotIn('appointments_timeslot', tables)
+
+    def test_availability_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_availability_version(self.doctor.pk)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pending_messages_disable_etag(self):
+        # The booking's success message is only consumed by a full render.
+        self.book()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_etag_varies_by_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.doctor.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, SLOT_EVENTS_PG_NOTIFY=False)
+class SlotEventTests(SlotsTestMixin, TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    async def _subscribe(self, doctor_id):
+        return broker.subscribe(doctor_id)
+
+    def subscribe(self, doctor_id):
+        queue = self.loop.run_until_complete(self._subscribe(doctor_id))
+        self.addCleanup(broker.unsubscribe, doctor_id, queue)
+        return queue
+
+    def drain(self, queue):
+        """Runs the loop so pending deliveries land, then empties the queue."""
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        return events
+
+    def test_broker_delivers_to_subscribers_of_that_doctor_only(self):
+        mine, other = self.subscribe(self.doctor.pk), self.subscribe(self.doctor.pk + 1)
+        broker.publish_local({'doctor': self.doctor.pk, 'status': 'reserved', 'slots': []})
+        self.assertEqual(len(self.drain(mine)), 1)
+        self.assertEqual(self.drain(other), [])
+
+    def test_unsubscribed_queue_gets_nothing(self):
+        queue = self.subscribe(self.doctor.pk)
+        broker.unsubscribe(self.doctor.pk, queue)
+        broker.publish_local({'doctor': self.doctor.pk, 'status': 'reserved', 'slots': []})
+        self.assertEqual(self.drain(queue), [])
+
+    def test_publish_waits_for_commit_and_chunks_slots(self):
+        queue = self.subscribe(self.doctor.pk)
+        slots = [self.slot] * (SLOTS_PER_EVENT + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_slot_change(self.doctor.pk, slots, 'blocked')
+            self.assertEqual(self.drain(queue), [])
+        events = self.drain(queue)
+        self.assertEqual([len(event['slots']) for event in events], [SLOTS_PER_EVENT, 1])
+        self.assertEqual(events[0]['status'], 'blocked')
+        self.assertEqual(events[0]['slots'][0], {
+            'id': self.slot.pk, 'date': self.slot.date.isoformat(), 'start_time': '09:00', 'end_time': '10:00',
+        })
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.client.force_login(self.patient_user)
+        response = self.client.get(reverse('appointment:doctor_slot_events', args=[self.doctor.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_slot_page_opens_stream_only_when_configured(self):
+        self.client.force_login(self.patient_user)
+        url = reverse('appointment:view_doctor_slots', args=[self.doctor.pk])
+        self.assertNotContains(self.client.get(url), 'EventSource')
+        with self.settings(SLOT_EVENTS_URL='https://live.medbook.test'):
+            self.assertContains(self.client.get(url), 'new EventSource("https://live.medbook.test/')
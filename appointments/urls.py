@@ -7,8 +7,17 @@ urlpatterns = [
     path('planning/create/', views.create_planning, name='create_planning'),
     path('doctor/unavailability/', views.mark_unavailability, name='mark_unavailability'),
     path('doctor/<int:doctor_id>/slots/', views.view_doctor_slots, name='view_doctor_slots'),
+    path('doctor/<int:doctor_id>/slots/async/', views.view_doctor_slots_async, name='view_doctor_slots_async'),
+    path('api/doctor/<int:doctor_id>/slots/', views.doctor_slots_json, name='doctor_slots_json'),
+    path('api/doctor/<int:doctor_id>/slots/events/', views.doctor_slot_events, name='doctor_slot_events'),
+    path('api/doctor/<int:doctor_id>/calendar/', views.doctor_calendar_json, name='doctor_calendar_json'),
+    path('doctor/<int:doctor_id>/waitlist/', views.join_waitlist, name='join_waitlist'),
+    path('waitlist/', views.my_waitlist, name='my_waitlist'),
+    path('waitlist/<int:entry_id>/leave/', views.leave_waitlist, name='leave_waitlist'),
     path('slot/<int:slot_id>/book/', views.book_appointment, name='book_appointment'),
     path('doctor/appointments/', views.manage_appointments, name='manage_appointments'),
     path('appointment/<int:appointment_id>/cancel/', views.cancel_appointment, name='cancel_appointment'),
+    path('appointment/<int:appointment_id>/reschedule/', views.reschedule_appointment, name='reschedule_appointment'),
     path('appointment/<int:appointment_id>/done/', views.mark_done, name='mark_done'),
+    path('history/', views.view_history, name='appointment_history'),
 ]
@@ -0,0 +1,99 @@
+"""
+Per-resource version counters kept in the cache.
+
+A version changes whenever the underlying rows change, so anything keyed
+on it (template fragments, ETags) is invalidated without tracking what
+was cached. Bumps happen after commit: bumping earlier would let a
+concurrent request cache pre-commit data under the new version.
+
+A missing counter starts from the current time in milliseconds, so an
+evicted or restarted cache never reuses an old version number.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_TIMEOUT = None  # never expire on their own
+
+
+def _key(namespace, pk):
+    return f'version:{namespace}:{pk}'
+
+
+def _seed():
+    return int(time.time() * 1000)
+
+
+def get_version(namespace, pk):
+    key = _key(namespace, pk)
+    version = cache.get(key)
+    if version is None:
+        version = _seed()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+async def aget_version(namespace, pk):
+    key = _key(namespace, pk)
+    version = await cache.aget(key)
+    if version is None:
+        version = _seed()
+        if not await cache.aadd(key, version, VERSION_TIMEOUT):
+            version = await cache.aget(key, version)
+    return version
+
+
+def _bump(namespace, pk):
+    key = _key(namespace, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed(), VERSION_TIMEOUT)
+
+
+def bump_version(namespace, pk):
+    transaction.on_commit(lambda: _bump(namespace, pk))
+
+
+# --- Doctor availability (free slots shown to patients) ---
+AVAILABILITY = 'availability'
+
+
+def availability_version(doctor_id):
+    return get_version(AVAILABILITY, doctor_id)
+
+
+async def aavailability_version(doctor_id):
+    return await aget_version(AVAILABILITY, doctor_id)
+
+
+def bump_availability_version(doctor_id):
+    bump_version(AVAILABILITY, doctor_id)
+    # Free slots are part of the doctor's calendar too
+    bump_calendar_version(doctor_id)
+
+
+# --- Doctor calendar (slots, appointments, unavailabilities) ---
+CALENDAR = 'calendar'
+
+
+def calendar_version(doctor_id):
+    return get_version(CALENDAR, doctor_id)
+
+
+def bump_calendar_version(doctor_id):
+    bump_version(CALENDAR, doctor_id)
+
+
+# --- Patient appointments (dashboard counts) ---
+PATIENT_APPOINTMENTS = 'patient_appointments'
+
+
+def patient_appointments_version(patient_id):
+    return get_version(PATIENT_APPOINTMENTS, patient_id)
+
+
+def bump_patient_appointments_version(patient_id):
+    bump_version(PATIENT_APPOINTMENTS, patient_id)
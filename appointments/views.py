@@ -1,10 +1,40 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import calendar
+import json
+from datetime import date
+
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
 from django.utils import timezone
-from .models import Planning, TimeSlot, Appointment, Beneficiary, DoctorUnavailability
-from .forms import GlobalPlanningForm, DoctorUnavailabilityForm, BeneficiaryForm
+from django.views.decorators.http import condition
+from .analytics import record_cancellations
+from .archive import appointment_history
+from .calendar import calendar_range, calendar_rows, columnar, parse_start
+from .models import Planning, TimeSlot, Appointment, Beneficiary, DoctorUnavailability, WaitlistEntry, WeeklyTemplate
+from .schedules import generate_slots
+from .events import broker, publish_slot_change
+from .holds import confirm_hold, place_hold
+from .notifications import notify_patient
+from .reminders import schedule_reminders
+from .reschedule import reschedule
+from .waitlist import offer_freed_slots, withdraw
+from .versions import (
+    aavailability_version, availability_version, bump_availability_version, bump_calendar_version,
+    bump_patient_appointments_version, calendar_version,
+)
+from .forms import GlobalPlanningForm, DoctorUnavailabilityForm, BeneficiaryForm, WaitlistForm
 from accounts.models import Doctor, Patient
+from core.conditional import conditional_page, page_etag
+from medbook.db_routers import read_from_replica
 
 # --- Manager: create planning for a doctor ---
 @login_required
@@ -22,8 +52,16 @@ def create_planning(request):
             end_hour = form.cleaned_data["end_hour"]
             slot_duration = form.cleaned_data["slot_duration"]
 
-            # Generate planning for all doctors
-            doctors = Doctor.objects.all()
+            # Doctors with a weekly template get their own hours
+            templated = set()
+            if form.cleaned_data["use_weekly_templates"]:
+                templated = set(WeeklyTemplate.objects.values_list("doctor_id", flat=True))
+                first_day = date(year, month, 1)
+                last_day = date(year, month, calendar.monthrange(year, month)[1])
+                generate_slots(first_day, last_day, doctor_ids=templated, replace=True)
+
+            # Generate planning for all other doctors
+            doctors = Doctor.objects.exclude(pk__in=templated)
             for doctor in doctors:
                 planning, _ = Planning.objects.get_or_create(doctor=doctor, month=month, year=year)
                 planning.generate_monthly_slots(
@@ -61,46 +99,194 @@ def mark_unavailability(request):
     return render(request, "appointment/mark_unavailability.html", {"form": form})
 
 # --- Patient: view doctor slots ---
+def free_slots(doctor_id):
+    """Upcoming free slots of a doctor, shared by the sync and async views."""
+    return TimeSlot.objects.filter(
+        planning__doctor_id=doctor_id, status="free", date__gte=timezone.now().date()
+    ).order_by("date", "start_time")
+
+
+def slot_table_cache_key(doctor_id, version, language_code):
+    """Fragment cache key of the slot table in appointments/view_slots.html."""
+    return make_template_fragment_key(
+        "slot_table", [doctor_id, version, language_code, timezone.localdate()]
+    )
+
+
+def doctor_slots_etag(request, doctor_id):
+    return page_etag(request, 'doctor_slots', doctor_id, availability_version(doctor_id), timezone.localdate())
+
+
+# No replica reads here: the fragment and the ETag are keyed on the version
+# bumped on the primary, so a lagging replica would cache stale slots under it.
 @login_required
+@conditional_page(doctor_slots_etag)
 def view_doctor_slots(request, doctor_id):
-    doctor = get_object_or_404(Doctor, id=doctor_id)
-    slots = TimeSlot.objects.filter(
-        planning__doctor=doctor, status="free", date__gte=timezone.now().date()
-    ).order_by("date", "start_time")
-    return render(request, "appointment/view_slots.html", {"doctor": doctor, "slots": slots})
+    doctor = get_object_or_404(Doctor.objects.select_related("user"), pk=doctor_id)
+    # Lazy: only evaluated when the slot table fragment is not cached.
+    slots = free_slots(doctor.pk)
+    return render(request, "appointments/view_slots.html", {
+        "doctor": doctor,
+        "slots": slots,
+        "availability_version": availability_version(doctor.pk),
+        "today": timezone.localdate(),
+        "slot_events_url": settings.SLOT_EVENTS_URL,
+    })
+
+
+# --- Async variants for ASGI (no worker is tied up while a patient polls) ---
+@login_required
+async def view_doctor_slots_async(request, doctor_id):
+    doctor = await aget_object_or_404(Doctor.objects.select_related("user"), pk=doctor_id)
+    version = await aavailability_version(doctor.pk)
+    # The template cannot query lazily from the event loop, so only fetch
+    # the slots when the cached fragment is missing.
+    if await cache.aget(slot_table_cache_key(doctor.pk, version, request.LANGUAGE_CODE)) is None:
+        slots = [slot async for slot in free_slots(doctor.pk)]
+    else:
+        slots = []
+    return render(request, "appointments/view_slots.html", {
+        "doctor": doctor,
+        "slots": slots,
+        "availability_version": version,
+        "today": timezone.localdate(),
+        "slot_events_url": settings.SLOT_EVENTS_URL,
+    })
+
+
+@login_required
+@read_from_replica
+async def doctor_slots_json(request, doctor_id):
+    slots = [
+        {
+            "id": slot["id"],
+            "date": slot["date"].isoformat(),
+            "start_time": slot["start_time"].strftime("%H:%M"),
+            "end_time": slot["end_time"].strftime("%H:%M"),
+        }
+        async for slot in free_slots(doctor_id).values("id", "date", "start_time", "end_time")
+    ]
+    return JsonResponse({"doctor": doctor_id, "slots": slots})
+
+
+def can_view_calendar(user, doctor_id):
+    return (user.pk == doctor_id and hasattr(user, "doctor")) or hasattr(user, "manager")
+
+
+def calendar_params(request):
+    view = "month" if request.GET.get("view") == "month" else "week"
+    start = parse_start(request.GET.get("start")) or timezone.localdate()
+    return (view, *calendar_range(view, start))
+
+
+def calendar_etag(request, doctor_id):
+    if not can_view_calendar(request.user, doctor_id):
+        return None
+    view, first, last = calendar_params(request)
+    return f"{calendar_version(doctor_id)}-{view}-{first.isoformat()}"
+
+
+# Primary reads, like view_doctor_slots: the ETag is the calendar version.
+@login_required
+@condition(etag_func=calendar_etag)
+def doctor_calendar_json(request, doctor_id):
+    """
+    A doctor's week (default) or month grid: ?view=week|month&start=YYYY-MM-DD.
+    Unchanged grids are answered with 304 before any calendar query runs.
+    """
+    if not can_view_calendar(request.user, doctor_id):
+        return JsonResponse({"error": "Access denied."}, status=403)
+    view, first, last = calendar_params(request)
+    return JsonResponse({
+        "doctor": doctor_id,
+        "view": view,
+        "start": first.isoformat(),
+        "end": last.isoformat(),
+        "columns": columnar(calendar_rows(doctor_id, first, last), first),
+    })
+
+
+@login_required
+async def doctor_slot_events(request, doctor_id):
+    """
+    Server-sent events stream of slot status changes for one doctor.
+    Served over ASGI: an idle client is only a queue and a keepalive timer.
+    A WSGI worker would block on the stream for good, so there it answers
+    204, which tells EventSource not to reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    async def stream():
+        queue = broker.subscribe(doctor_id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.SLOT_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: slots\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(doctor_id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 # --- Patient: book appointment ---
 @login_required
 def book_appointment(request, slot_id):
-    slot = get_object_or_404(TimeSlot, id=slot_id, status="free")
+    slot = get_object_or_404(TimeSlot.objects.select_related("planning__doctor__user"), id=slot_id)
     patient = request.user.patient
 
+    beneficiaries = patient.beneficiaries.order_by("first_name", "last_name")
+
     if request.method == "POST":
-        # Determine if booking for self or another person
-        if request.POST.get("for_self"):
-            beneficiary = None
-        else:
+        # Determine if booking for self, for a known beneficiary or another person
+        beneficiary = form = None
+        if request.POST.get("beneficiary_id", "").isdigit() and not request.POST.get("for_self"):
+            beneficiary = get_object_or_404(beneficiaries, pk=request.POST["beneficiary_id"])
+        elif not request.POST.get("for_self"):
             form = BeneficiaryForm(request.POST)
-            if form.is_valid():
-                beneficiary = form.save(commit=False)
-                beneficiary.patient = patient
-                beneficiary.save()
-            else:
-                return render(request, "appointment/book_appointment.html", {"slot": slot, "form": form})
-
-        Appointment.objects.create(
-            patient=patient,
-            doctor=slot.planning.doctor,
-            time_slot=slot,
-            beneficiary=beneficiary
-        )
-        slot.status = "reserved"
-        slot.save()
+            if not form.is_valid():
+                return render(request, "appointments/book_appointment.html", {"slot": slot, "form": form, "beneficiaries": beneficiaries})
+
+        with transaction.atomic():
+            if not confirm_hold(slot, patient):
+                messages.error(request, "This slot is no longer available.")
+                return redirect("appointment:view_doctor_slots", slot.planning.doctor_id)
+            if form:
+                beneficiary = form.save_for(patient)
+            appointment = Appointment.objects.create(
+                patient=patient,
+                doctor=slot.planning.doctor,
+                time_slot=slot,
+                beneficiary=beneficiary
+            )
+            notify_patient(appointment, "booked")
+            schedule_reminders(appointment, new=True)
+            bump_patient_appointments_version(patient.pk)
+            # The patient got what they were waiting for
+            WaitlistEntry.objects.filter(
+                patient=patient, doctor_id=slot.planning.doctor_id, start_date__lte=slot.date, end_date__gte=slot.date,
+            ).delete()
         messages.success(request, "Appointment booked successfully.")
         return redirect("core:patient_dashboard")
-    else:
-        form = BeneficiaryForm()
-    return render(request, "appointment/book_appointment.html", {"slot": slot, "form": form})
+
+    # Hold the slot while the form is filled in
+    try:
+        held = place_hold(slot, patient)
+    except ValidationError as error:
+        messages.error(request, error.messages[0])
+        return redirect("appointment:view_doctor_slots", slot.planning.doctor_id)
+    if not held:
+        messages.error(request, "This slot is being booked by someone else.")
+        return redirect("appointment:view_doctor_slots", slot.planning.doctor_id)
+    form = BeneficiaryForm()
+    return render(request, "appointments/book_appointment.html", {"slot": slot, "form": form, "beneficiaries": beneficiaries})
 
 # --- Doctor: manage appointments ---
 @login_required
@@ -111,17 +297,103 @@ def manage_appointments(request):
 
 @login_required
 def cancel_appointment(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id, doctor=request.user.doctor)
-    appointment.time_slot.status = "free"
-    appointment.time_slot.save()
-    appointment.delete()
+    appointment = get_object_or_404(
+        Appointment.objects.select_related("patient__user", "doctor__user", "time_slot"),
+        id=appointment_id, doctor=request.user.doctor,
+    )
+    with transaction.atomic():
+        appointment.time_slot.status = "free"
+        appointment.time_slot.save()
+        publish_slot_change(appointment.doctor_id, [appointment.time_slot], "free")
+        bump_availability_version(appointment.doctor_id)
+        bump_patient_appointments_version(appointment.patient_id)
+        notify_patient(appointment, "cancelled")
+        record_cancellations([appointment])
+        appointment.delete()
+        offer_freed_slots([appointment.time_slot_id])
     messages.success(request, "Appointment cancelled successfully.")
     return redirect("appointment:manage_appointments")
 
 @login_required
 def mark_done(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id, doctor=request.user.doctor)
-    appointment.status = "completed"
-    appointment.save()
+    appointment = get_object_or_404(
+        Appointment.objects.select_related("patient__user", "doctor__user", "time_slot"),
+        id=appointment_id, doctor=request.user.doctor,
+    )
+    with transaction.atomic():
+        appointment.status = "completed"
+        appointment.save()
+        notify_patient(appointment, "completed")
+        appointment.reminders.filter(sent_at__isnull=True).delete()
+        bump_calendar_version(appointment.doctor_id)
+        bump_patient_appointments_version(appointment.patient_id)
     messages.success(request, "Appointment marked as done.")
     return redirect("appointment:manage_appointments")
+
+# --- Patient: waitlist ---
+@login_required
+def join_waitlist(request, doctor_id):
+    doctor = get_object_or_404(Doctor, pk=doctor_id)
+    form = WaitlistForm(request.POST or None)
+    if request.method == "POST" and form.is_valid():
+        entry = form.save(commit=False)
+        entry.patient = request.user.patient
+        entry.doctor = doctor
+        entry.save()
+        messages.success(request, "You will be offered the first slot that frees up in these dates.")
+        return redirect("appointment:my_waitlist")
+    return render(request, "appointments/join_waitlist.html", {"doctor": doctor, "form": form})
+
+@login_required
+def my_waitlist(request):
+    entries = (
+        WaitlistEntry.objects.filter(patient=request.user.patient)
+        .select_related("doctor__user", "offered_slot")
+        .order_by("start_date")
+    )
+    return render(request, "appointments/waitlist.html", {"entries": entries})
+
+@login_required
+def leave_waitlist(request, entry_id):
+    entry = get_object_or_404(WaitlistEntry.objects.select_related("offered_slot"), id=entry_id, patient=request.user.patient)
+    if request.method == "POST":
+        withdraw(entry)
+        messages.success(request, "You left the waitlist.")
+    return redirect("appointment:my_waitlist")
+
+# --- Patient: reschedule appointment ---
+RESCHEDULE_SLOT_LIMIT = 50
+
+@login_required
+def reschedule_appointment(request, appointment_id):
+    appointment = get_object_or_404(
+        Appointment.objects.select_related("time_slot", "doctor__user"), id=appointment_id, patient=request.user.patient
+    )
+    if request.method == "POST":
+        slot_id = request.POST.get("slot_id", "")
+        try:
+            reschedule(appointment.pk, int(slot_id) if slot_id.isdigit() else 0)
+        except ValidationError as error:
+            messages.error(request, error.messages[0])
+        else:
+            messages.success(request, "Appointment rescheduled successfully.")
+            return redirect("core:patient_dashboard")
+    slots = free_slots(appointment.doctor_id)[:RESCHEDULE_SLOT_LIMIT]
+    return render(request, "appointments/reschedule.html", {"appointment": appointment, "slots": slots})
+
+# --- Patient/Doctor: appointment history (live and archived) ---
+HISTORY_PAGE_SIZE = 25
+
+@login_required
+@read_from_replica
+def view_history(request):
+    user = request.user
+    if hasattr(user, "doctor"):
+        rows = appointment_history(doctor_id=user.pk)
+    elif hasattr(user, "patient"):
+        rows = appointment_history(patient_id=user.pk)
+    else:
+        messages.error(request, "You are not authorized.")
+        return redirect("core:home")
+    page = Paginator(rows, HISTORY_PAGE_SIZE).get_page(request.GET.get("page"))
+    return render(request, "appointments/history.html", {"page": page, "is_doctor": hasattr(user, "doctor")})
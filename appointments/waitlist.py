@@ -0,0 +1,87 @@
+"""
+Waitlist offers.
+
+Every path that frees a slot (a cancellation, a reschedule, an expired
+hold, a lifted unavailability) calls ``offer_freed_slots`` in its
+transaction. Each freed slot goes on hold for the oldest waiting entry of
+that doctor whose date range covers it, found through the partial
+``waitlist_waiting_idx`` index, and the patient is emailed through the
+outbox in the same transaction, so waiting patients no longer need to
+poll the slot listing. An offer whose slot went to someone else (the
+hold expired and another patient booked it first) is dropped by
+``requeue_stale_offers`` and the entry waits again.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .events import publish_slot_change
+from .holds import place_hold
+from .models import TimeSlot, WaitlistEntry
+from .notifications import notify_waitlist_offer
+from .versions import bump_availability_version
+
+
+def best_entry(slot):
+    """Oldest waiting entry for ``slot``'s doctor whose range covers its date."""
+    return (
+        WaitlistEntry.objects.select_related('patient__user')
+        .filter(doctor_id=slot.planning.doctor_id, offered_slot__isnull=True,
+                start_date__lte=slot.date, end_date__gte=slot.date)
+        .order_by('created_at', 'pk')
+        .first()
+    )
+
+
+def requeue_stale_offers(doctor_ids=None):
+    """
+    Put entries whose offered slot is no longer held for them back in the
+    queue (their hold expired and another patient booked the slot before
+    the sweep freed it). Returns the number requeued.
+    """
+    stale = WaitlistEntry.objects.filter(offered_slot__isnull=False).exclude(
+        offered_slot__status='pending', offered_slot__held_by_id=F('patient_id'),
+    )
+    if doctor_ids is not None:
+        stale = stale.filter(doctor_id__in=doctor_ids)
+    return stale.update(offered_slot=None)
+
+
+def offer_freed_slots(slot_ids):
+    """
+    Hold each of the (free) slots for its best waiting patient and email
+    them. Call it inside the transaction that freed the slots. Returns the
+    number offered.
+    """
+    if not slot_ids:
+        return 0
+    # Entries whose offer lapsed gave up their turn
+    WaitlistEntry.objects.filter(offered_slot_id__in=slot_ids).delete()
+    requeue_stale_offers(TimeSlot.objects.filter(pk__in=slot_ids).values('planning__doctor_id'))
+    offered = 0
+    slots = TimeSlot.objects.select_related('planning__doctor__user').filter(
+        pk__in=slot_ids, status='free', date__gte=timezone.localdate(),
+    )
+    for slot in slots.order_by('date', 'start_time'):
+        entry = best_entry(slot)
+        # Offers are bounded by the patient's waitlist entries, not the hold limit
+        if entry and place_hold(slot, entry.patient, minutes=settings.WAITLIST_HOLD_MINUTES, limit=0):
+            entry.offered_slot = slot
+            entry.save(update_fields=['offered_slot'])
+            notify_waitlist_offer(entry, slot)
+            offered += 1
+    return offered
+
+
+def withdraw(entry):
+    """Remove ``entry``; a slot on hold for it goes to the next waiting patient."""
+    with transaction.atomic():
+        slot = entry.offered_slot
+        entry.delete()
+        if slot and TimeSlot.objects.filter(pk=slot.pk, status='pending', held_by_id=entry.patient_id).update(
+            status='free', held_by=None, hold_expires_at=None,
+        ):
+            publish_slot_change(entry.doctor_id, [slot], 'free')
+            bump_availability_version(entry.doctor_id)
+            offer_freed_slots([slot.pk])
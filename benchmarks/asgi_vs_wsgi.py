@@ -0,0 +1,159 @@
+"""
+Concurrent-connection throughput of the WSGI and ASGI servers.
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 1,16,64 --duration 10
+
+Seeds a scratch SQLite database (or the one in ``DATABASE_URL``), starts
+both Procfile servers (``gunicorn medbook.wsgi`` with sync workers and
+``gunicorn medbook.asgi`` with uvicorn workers) with the same number of
+workers, then keeps N client connections polling the slot JSON API
+(``--path`` to pick another URL) and reports requests/second and latency
+percentiles for each server and concurrency level.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.utils import latency_summary, setup_django
+
+SERVERS = {
+    'wsgi': ['gunicorn', 'medbook.wsgi:application'],
+    'asgi': ['gunicorn', 'medbook.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+def seed(slots_per_day, days):
+    from datetime import date, time as dtime, timedelta
+
+    from django.core.management import call_command
+    from django.test import Client
+
+    from accounts.models import Doctor, Patient, User
+    from appointments.models import Planning, TimeSlot
+
+    call_command('migrate', verbosity=0)
+    doctor_user, _ = User.objects.get_or_create(
+        email='bench-doctor@medbook.test',
+        defaults={'first_name': 'Bench', 'last_name': 'Doctor', 'role': User.Role.DOCTOR},
+    )
+    doctor, _ = Doctor.objects.get_or_create(user=doctor_user, defaults={'specialty': 'General'})
+    patient_user, _ = User.objects.get_or_create(
+        email='bench-patient@medbook.test',
+        defaults={'first_name': 'Bench', 'last_name': 'Patient', 'role': User.Role.PATIENT},
+    )
+    Patient.objects.get_or_create(user=patient_user)
+
+    today = date.today()
+    planning, _ = Planning.objects.get_or_create(doctor=doctor, month=today.month, year=today.year)
+    planning.slots.all().delete()
+    TimeSlot.objects.bulk_create(
+        TimeSlot(
+            planning=planning, date=today + timedelta(days=day),
+            start_time=dtime(8 + slot // 2, (slot % 2) * 30),
+            end_time=dtime(8 + slot // 2, (slot % 2) * 30 + 29),
+        )
+        for day in range(days) for slot in range(slots_per_day)
+    )
+
+    client = Client()
+    client.force_login(patient_user)
+    return doctor.pk, client.cookies['sessionid'].value
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def hammer(port, path, session_id, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        headers = {'Cookie': f'sessionid={session_id}', 'Host': 'localhost'}
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'latency': latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', default='1,16,64')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--path', default=None)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        scratch = os.path.join(tempfile.mkdtemp(prefix='medbook-bench-'), 'bench.sqlite3')
+        os.environ['DATABASE_URL'] = f'sqlite:///{scratch}'
+    setup_django()
+    doctor_id, session_id = seed(slots_per_day=18, days=60)
+    path = args.path or f'/appointments/api/doctor/{doctor_id}/slots/'
+
+    results = {'path': path, 'workers': args.workers, 'servers': {}}
+    for name, command in SERVERS.items():
+        server = subprocess.Popen(
+            command + ['--workers', str(args.workers), '--bind', f'127.0.0.1:{args.port}'],
+            env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(args.port)
+            results['servers'][name] = [
+                hammer(args.port, path, session_id, int(level), args.duration)
+                for level in args.concurrency.split(',')
+            ]
+        finally:
+            server.terminate()
+            server.wait()
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Load test for the booking path: connection churn and latency.
+
+    python -m benchmarks.booking_load --workers 16 --bookings 2000
+
+Runs against a throwaway test database. Each worker thread logs in as its
+own patient and books free slots through the Django test client, exactly
+like ``POST /appointments/slot/<id>/book/``. The report lists how many
+database connections were opened per request (churn) and the latency
+percentiles. Run it with ``DB_POOL=1`` and without to compare pooled and
+persistent connections.
+"""
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+
+from benchmarks.utils import latency_summary, scratch_database, setup_django
+
+
+def seed(bookings, workers):
+    from datetime import date, time as dtime, timedelta
+
+    from accounts.models import Doctor, Patient, User
+    from appointments.models import Planning, TimeSlot
+
+    doctor_user = User.objects.create(
+        email='load-doctor@medbook.test', first_name='Load', last_name='Doctor',
+        role=User.Role.DOCTOR,
+    )
+    doctor = Doctor.objects.create(user=doctor_user, specialty='General')
+
+    today = date.today()
+    planning = Planning.objects.create(doctor=doctor, month=today.month, year=today.year)
+    slots = []
+    for index in range(bookings):
+        day = today + timedelta(days=1 + index // 24)
+        hour, quarter = divmod(index % 24, 4)
+        start = dtime(8 + hour, quarter * 15)
+        slots.append(TimeSlot(
+            planning=planning, date=day, start_time=start,
+            end_time=dtime(8 + hour, quarter * 15 + 14), status='free',
+        ))
+    slot_ids = [slot.id for slot in TimeSlot.objects.bulk_create(slots)]
+
+    patients = []
+    for index in range(workers):
+        user = User.objects.create(
+            email=f'load-patient-{index}@medbook.test', first_name='Load',
+            last_name=f'Patient {index}', role=User.Role.PATIENT,
+        )
+        Patient.objects.create(user=user)
+        patients.append(user)
+    return patients, slot_ids
+
+
+def run(bookings, workers):
+    from django.db import close_old_connections
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+    from django.urls import reverse
+
+    # Failed bookings are counted in the report, not logged one by one.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    patients, slot_ids = seed(bookings, workers)
+    close_old_connections()
+
+    pending = queue.Queue()
+    for slot_id in slot_ids:
+        pending.put(slot_id)
+
+    lock = threading.Lock()
+    connections_opened = [0]
+    latencies = []
+    errors = [0]
+
+    def on_connection_created(sender, connection, **kwargs):
+        with lock:
+            connections_opened[0] += 1
+
+    connection_created.connect(on_connection_created)
+
+    def worker(user):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        while True:
+            try:
+                slot_id = pending.get_nowait()
+            except queue.Empty:
+                break
+            url = reverse('appointment:book_appointment', args=[slot_id])
+            started = time.perf_counter()
+            response = client.post(url, {'for_self': '1'})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 302:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(user,)) for user in patients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    connection_created.disconnect(on_connection_created)
+
+    requests = len(latencies)
+    return {
+        'workers': workers,
+        'requests': requests,
+        'errors': errors[0],
+        'throughput_rps': round(requests / wall, 1) if wall else 0.0,
+        'connections_opened': connections_opened[0],
+        'connections_per_request': round(connections_opened[0] / requests, 3) if requests else 0.0,
+        'latency': latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    with scratch_database():
+        result = run(args.bookings, args.workers)
+    result['database'] = settings.DATABASES['default']['ENGINE']
+    result['pool'] = 'pool' in settings.DATABASES['default'].get('OPTIONS', {})
+    result['conn_max_age'] = settings.DATABASES['default'].get('CONN_MAX_AGE', 0)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
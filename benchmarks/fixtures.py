@@ -0,0 +1,109 @@
+"""
+Fast, deterministic dataset for the benchmark suite.
+
+Everything goes through ``bulk_create``: users share one precomputed
+password hash, slots come from weekly templates through
+``appointments.schedules.generate_slots``, and appointments are drawn
+from a seeded RNG so two runs with the same arguments produce the same
+rows.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import time, timedelta
+
+PASSWORD = 'medbook-bench'
+BATCH_SIZE = 2000
+
+
+@dataclass
+class Dataset:
+    doctor_ids: list = field(default_factory=list)
+    patient_ids: list = field(default_factory=list)
+    manager_id: int = None
+    slots: int = 0
+    appointments: int = 0
+
+
+def _users(role, prefix, count, password):
+    from accounts.models import User
+
+    return User.objects.bulk_create(
+        [
+            User(
+                email=f'{prefix}-{index}@medbook.test', first_name=prefix.title(), last_name=f'{index:05d}',
+                role=role, password=password,
+            )
+            for index in range(count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _weekly_templates(doctor_ids, rng):
+    from appointments.models import WeeklyTemplate, WeeklyTemplateInterval
+
+    templates = WeeklyTemplate.objects.bulk_create(
+        WeeklyTemplate(doctor_id=doctor_id, slot_duration=rng.choice((20, 30, 60))) for doctor_id in doctor_ids
+    )
+    intervals = []
+    for template in templates:
+        start_hour = rng.choice((7, 8, 9))
+        for weekday in range(5):
+            intervals += [
+                WeeklyTemplateInterval(template=template, weekday=weekday, start_time=time(start_hour),
+                                       end_time=time(start_hour + 9)),
+                WeeklyTemplateInterval(template=template, weekday=weekday, start_time=time(12),
+                                       end_time=time(13), kind='break'),
+            ]
+    WeeklyTemplateInterval.objects.bulk_create(intervals, batch_size=BATCH_SIZE)
+
+
+def seed_dataset(doctors=10, patients=200, days=365, appointments_per_patient=5, seed=42, today=None):
+    """Doctors with a year of template slots, patients with booked appointments and one manager."""
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from accounts.models import Doctor, Manager, Patient, User
+    from appointments.models import Appointment, TimeSlot
+    from appointments.schedules import generate_slots
+
+    rng = random.Random(seed)
+    today = today or timezone.localdate()
+    password = make_password(PASSWORD)
+    dataset = Dataset()
+
+    doctor_users = _users(User.Role.DOCTOR, 'doctor', doctors, password)
+    Doctor.objects.bulk_create(
+        Doctor(user=user, specialty=rng.choice(('General', 'Pediatrics', 'Cardiology', 'Dermatology')))
+        for user in doctor_users
+    )
+    dataset.doctor_ids = [user.pk for user in doctor_users]
+
+    patient_users = _users(User.Role.PATIENT, 'patient', patients, password)
+    Patient.objects.bulk_create((Patient(user=user) for user in patient_users), batch_size=BATCH_SIZE)
+    dataset.patient_ids = [user.pk for user in patient_users]
+
+    manager_user = _users(User.Role.MANAGER, 'manager', 1, password)[0]
+    Manager.objects.create(user=manager_user)
+    dataset.manager_id = manager_user.pk
+
+    _weekly_templates(dataset.doctor_ids, rng)
+    dataset.slots = generate_slots(today, today + timedelta(days=days - 1))
+
+    # Book a random sample of the slots, spread over all doctors.
+    slots = list(
+        TimeSlot.objects.filter(status='free').order_by('pk').values_list('pk', 'planning__doctor_id')
+    )
+    booked = rng.sample(slots, min(len(slots), patients * appointments_per_patient))
+    Appointment.objects.bulk_create(
+        [
+            Appointment(patient_id=rng.choice(dataset.patient_ids), doctor_id=doctor_id, time_slot_id=slot_id)
+            for slot_id, doctor_id in booked
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    booked_ids = [slot_id for slot_id, _doctor_id in booked]
+    for start in range(0, len(booked_ids), BATCH_SIZE):
+        TimeSlot.objects.filter(pk__in=booked_ids[start:start + BATCH_SIZE]).update(status='reserved')
+    dataset.appointments = len(booked)
+    return dataset
@@ -0,0 +1,91 @@
+"""
+Translation lookups per page render.
+
+    python -m benchmarks.gettext_lookups --slots 200 --renders 20
+
+Runs against a throwaway test database. Renders the doctor slot page for
+a logged-in patient in each language and counts the catalog lookups
+(``DjangoTranslation.gettext``/``ngettext``) made per render: the first
+(cold) render fills the slot table fragment cache, later (warm) renders
+reuse it.
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from benchmarks.utils import scratch_database, setup_django
+
+
+@contextmanager
+def count_lookups():
+    from django.utils.translation.trans_real import DjangoTranslation
+
+    counts = Counter()
+    originals = {name: getattr(DjangoTranslation, name) for name in ('gettext', 'ngettext')}
+
+    def counting(name, original):
+        def wrapper(self, *args):
+            counts[name] += 1
+            return original(self, *args)
+        return wrapper
+
+    for name, original in originals.items():
+        setattr(DjangoTranslation, name, counting(name, original))
+    try:
+        yield counts
+    finally:
+        for name, original in originals.items():
+            setattr(DjangoTranslation, name, original)
+
+
+def run(slots, renders):
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    from appointments.models import TimeSlot
+    from benchmarks.booking_load import seed
+
+    patients, slot_ids = seed(slots, workers=1)
+    doctor_id = TimeSlot.objects.get(pk=slot_ids[0]).planning.doctor_id
+    url = reverse('appointment:view_doctor_slots', args=[doctor_id])
+
+    client = Client()
+    client.force_login(patients[0])
+    results = {}
+    for language_code, _name in settings.LANGUAGES:
+        client.cookies[settings.LANGUAGE_COOKIE_NAME] = language_code
+        type(patients[0]).objects.filter(pk=patients[0].pk).update(preferred_language=language_code)
+        cache.clear()
+        per_render = []
+        for _ in range(renders):
+            with count_lookups() as counts:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}")
+            per_render.append(sum(counts.values()))
+        results[language_code] = {
+            'cold': per_render[0],
+            'warm': max(per_render[1:], default=per_render[0]),
+        }
+    return {'slots': slots, 'renders': renders, 'lookups_per_render': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--slots', type=int, default=200)
+    parser.add_argument('--renders', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    with scratch_database():
+        results = run(args.slots, args.renders)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
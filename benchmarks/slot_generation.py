@@ -0,0 +1,76 @@
+"""
+Time to expand weekly templates into a year of slots.
+
+    python -m benchmarks.slot_generation --doctors 50 --days 365
+
+Runs against a throwaway test database. Gives every doctor a Monday-Friday
+template (08:00-17:00 with a lunch break, Saturday mornings) and reports
+how long ``generate_slots`` takes for the whole range, then how long a
+second, idempotent run over the same range takes.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.utils import scratch_database, setup_django
+
+
+def seed(doctors, slot_duration):
+    from datetime import time as dtime
+
+    from accounts.models import Doctor, User
+    from appointments.models import WeeklyTemplate, WeeklyTemplateInterval
+
+    users = User.objects.bulk_create(
+        User(email=f'gen-doctor-{index}@medbook.test', first_name='Gen', last_name=f'Doctor {index}',
+             role=User.Role.DOCTOR)
+        for index in range(doctors)
+    )
+    Doctor.objects.bulk_create(Doctor(user=user, specialty='General') for user in users)
+    templates = WeeklyTemplate.objects.bulk_create(
+        WeeklyTemplate(doctor_id=user.pk, slot_duration=slot_duration) for user in users
+    )
+    intervals = []
+    for template in templates:
+        for weekday in range(5):
+            intervals += [
+                WeeklyTemplateInterval(template=template, weekday=weekday, start_time=dtime(8), end_time=dtime(17)),
+                WeeklyTemplateInterval(template=template, weekday=weekday, start_time=dtime(12), end_time=dtime(13),
+                                       kind='break'),
+            ]
+        intervals.append(WeeklyTemplateInterval(template=template, weekday=5, start_time=dtime(8), end_time=dtime(12)))
+    WeeklyTemplateInterval.objects.bulk_create(intervals)
+
+
+def run(doctors, days, slot_duration):
+    from appointments.schedules import generate_slots
+
+    seed(doctors, slot_duration)
+    start = date.today()
+    end = start + timedelta(days=days - 1)
+    results = {'doctors': doctors, 'days': days, 'slot_duration': slot_duration}
+    for label in ('first_run', 'second_run'):
+        started = time.perf_counter()
+        created = generate_slots(start, end)
+        results[label] = {'slots_created': created, 'seconds': round(time.perf_counter() - started, 2)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--slot-duration', type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    with scratch_database():
+        results = run(args.doctors, args.days, args.slot_duration)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Benchmark suite for the key paths, with a regression gate.
+
+    python -m benchmarks.suite                                # print results
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+
+Runs against a throwaway test database seeded by ``benchmarks.fixtures``
+(N doctors with a year of slots, M patients with appointments). Each path
+reports latency percentiles, throughput and the number of queries per
+request:
+
+- planning generation (one month of template slots for every doctor)
+- slot listing (full render, fragment-cached render, 304 revalidation,
+  JSON API)
+- booking under contention (several patients racing for the same slots;
+  on SQLite, which takes one writer at a time and reports "table is
+  locked" instead of waiting, the threads take turns per request)
+- dashboards (stats API for each role, doctor calendar)
+- exports (appointment history pages)
+
+With ``--baseline`` the run fails (exit status 1) when a path issues more
+queries than the baseline, or its p95 latency exceeds the baseline by
+more than ``--tolerance`` (a fraction) plus ``--slack-ms``. The booking
+benchmark also fails on any request error, or when the bookings it saw
+succeed differ from the appointments actually stored.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from benchmarks.utils import latency_summary, scratch_database, setup_django
+
+PLAIN_STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def measure(request, repeat, expected_status=200, before=None):
+    """Call ``request()`` ``repeat`` times; latency, throughput and max queries per call."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies = []
+    queries = 0
+    for _ in range(repeat):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request()
+            latencies.append(time.perf_counter() - started)
+        status = getattr(response, 'status_code', expected_status)
+        if status != expected_status:
+            raise RuntimeError(f"expected {expected_status}, got {status}")
+        queries = max(queries, len(captured))
+    return {
+        'latency': latency_summary(latencies),
+        'throughput_rps': round(len(latencies) / sum(latencies), 1),
+        'queries': queries,
+    }
+
+
+def client_for(user_id):
+    from django.test import Client
+
+    from accounts.models import User
+
+    client = Client()
+    client.force_login(User.objects.get(pk=user_id))
+    return client
+
+
+def bench_planning_generation(dataset, repeat):
+    from django.utils import timezone
+
+    from appointments.schedules import generate_slots
+
+    # A month beyond the seeded year, regenerated from scratch each time.
+    start = timezone.localdate() + timedelta(days=400)
+    end = start + timedelta(days=29)
+    return {
+        'planning_generation': measure(
+            lambda: generate_slots(start, end, replace=True), repeat,
+        ),
+    }
+
+
+def bench_slot_listing(dataset, repeat):
+    from django.core.cache import cache
+    from django.urls import reverse
+
+    client = client_for(dataset.patient_ids[0])
+    doctor_id = dataset.doctor_ids[0]
+    page = reverse('appointment:view_doctor_slots', args=[doctor_id])
+    api = reverse('appointment:doctor_slots_json', args=[doctor_id])
+    results = {
+        # Clearing the cache also resets the version counters behind the ETag.
+        'slot_listing_page': measure(lambda: client.get(page), repeat, before=cache.clear),
+        'slot_listing_page_cached': measure(lambda: client.get(page, HTTP_IF_NONE_MATCH='"other"'), repeat),
+    }
+    etag = client.get(page)['ETag']
+    results['slot_listing_page_304'] = measure(lambda: client.get(page, HTTP_IF_NONE_MATCH=etag), repeat, 304)
+    results['slot_listing_api'] = measure(lambda: client.get(api), repeat)
+    return results
+
+
+def bench_booking_contention(dataset, workers, hot_slots):
+    from django.db import close_old_connections, connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from appointments.models import Appointment, TimeSlot
+
+    slot_ids = list(
+        TimeSlot.objects.filter(planning__doctor_id=dataset.doctor_ids[0], status='free')
+        .order_by('date', 'start_time').values_list('pk', flat=True)[:hot_slots]
+    )
+    close_old_connections()
+    lock = threading.Lock()
+    # Requests still run on their own threads and connections, one at a time.
+    serialize = threading.Lock() if connection.vendor == 'sqlite' else contextlib.nullcontext()
+    latencies, queries, outcomes = [], [0], {'booked': 0, 'conflicts': 0, 'errors': 0}
+    # Booked redirects to the dashboard, a lost race back to the slot list.
+    dashboard = reverse('core:patient_dashboard')
+
+    def worker(client, seed):
+        order = slot_ids[:]
+        random.Random(seed).shuffle(order)
+        for slot_id in order:
+            url = reverse('appointment:book_appointment', args=[slot_id])
+            with serialize, CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.post(url, {'for_self': '1'})
+                elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                queries[0] = max(queries[0], len(captured))
+                if response.status_code != 302:
+                    outcomes['errors'] += 1
+                else:
+                    outcomes['booked' if response.url == dashboard else 'conflicts'] += 1
+        close_old_connections()
+
+    # Log everyone in first: concurrent logins would contend on the session table.
+    clients = [client_for(patient_id) for patient_id in dataset.patient_ids[:workers]]
+    for client in clients:
+        client.raise_request_exception = False
+    threads = [threading.Thread(target=worker, args=(client, index)) for index, client in enumerate(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    return {
+        'booking_contention': {
+            'latency': latency_summary(latencies),
+            'throughput_rps': round(len(latencies) / wall, 1),
+            'queries': queries[0],
+            'workers': workers,
+            'slots': len(slot_ids),
+            **outcomes,
+            'appointments': Appointment.objects.filter(time_slot_id__in=slot_ids).count(),
+        },
+    }
+
+
+def bench_dashboards(dataset, repeat):
+    from django.urls import reverse
+
+    stats = reverse('core:dashboard_stats')
+    calendar = reverse('appointment:doctor_calendar_json', args=[dataset.doctor_ids[0]])
+    patient, doctor, manager = (
+        client_for(dataset.patient_ids[0]), client_for(dataset.doctor_ids[0]), client_for(dataset.manager_id),
+    )
+    return {
+        'dashboard_stats_patient': measure(lambda: patient.get(stats), repeat),
+        'dashboard_stats_doctor': measure(lambda: doctor.get(stats), repeat),
+        'dashboard_stats_manager': measure(lambda: manager.get(stats), repeat),
+        'doctor_calendar_month': measure(lambda: doctor.get(calendar, {'view': 'month'}), repeat),
+    }
+
+
+def bench_exports(dataset, repeat):
+    from django.urls import reverse
+
+    history = reverse('appointment:appointment_history')
+    patient, doctor = client_for(dataset.patient_ids[0]), client_for(dataset.doctor_ids[0])
+    return {
+        'history_patient': measure(lambda: patient.get(history), repeat),
+        'history_doctor': measure(lambda: doctor.get(history), repeat),
+        'history_doctor_last_page': measure(lambda: doctor.get(history, {'page': 'last'}), repeat),
+    }
+
+
+def run(args):
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    from benchmarks.fixtures import seed_dataset
+
+    # Conflicting bookings and slow renders are counted, not logged one by one.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    logging.getLogger('core.timing').setLevel(logging.ERROR)
+    started = time.perf_counter()
+    dataset = seed_dataset(args.doctors, args.patients, args.days, seed=args.seed)
+    results = {
+        'database': settings.DATABASES['default']['ENGINE'],
+        'dataset': {
+            'doctors': args.doctors, 'patients': args.patients, 'days': args.days,
+            'slots': dataset.slots, 'appointments': dataset.appointments,
+            'seed_seconds': round(time.perf_counter() - started, 2),
+        },
+        'paths': {},
+    }
+    with override_settings(STORAGES=PLAIN_STATIC_STORAGES):
+        for bench in (bench_planning_generation, bench_slot_listing, bench_dashboards, bench_exports):
+            results['paths'].update(bench(dataset, args.repeat))
+        results['paths'].update(bench_booking_contention(dataset, args.workers, args.hot_slots))
+    return results
+
+
+def compare(results, baseline, tolerance, slack_ms):
+    """Regression messages for ``results`` against ``baseline`` (empty when none)."""
+    failures = []
+    for key in ('database', 'dataset'):
+        current, expected = results[key], baseline[key]
+        if key == 'dataset':
+            current, expected = ({k: v for k, v in d.items() if k != 'seed_seconds'} for d in (current, expected))
+        if current != expected:
+            failures.append(f"{key} differs from the baseline ({current} != {expected}), rerun with its arguments")
+    for name, expected in baseline['paths'].items():
+        current = results['paths'].get(name)
+        if current is None:
+            failures.append(f"{name}: missing from results")
+            continue
+        if current['queries'] > expected['queries']:
+            failures.append(f"{name}: {current['queries']} queries, baseline {expected['queries']}")
+        if current.get('errors'):
+            failures.append(f"{name}: {current['errors']} request(s) failed")
+        if 'appointments' in current and current['booked'] != current['appointments']:
+            failures.append(f"{name}: {current['booked']} booking(s) succeeded, {current['appointments']} stored")
+        limit = expected['latency']['p95_ms'] * (1 + tolerance) + slack_ms
+        if current['latency']['p95_ms'] > limit:
+            failures.append(
+                f"{name}: p95 {current['latency']['p95_ms']}ms, baseline {expected['latency']['p95_ms']}ms "
+                f"(limit {limit:.2f}ms)"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--doctors', type=int, default=10)
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=30, help="Requests per measured path.")
+    parser.add_argument('--workers', type=int, default=8, help="Patients racing in the booking benchmark.")
+    parser.add_argument('--hot-slots', type=int, default=40, help="Slots they race for.")
+    parser.add_argument('--output', help="Also write the results to this file.")
+    parser.add_argument('--baseline', help="Fail when results regress past this stored run.")
+    parser.add_argument('--save-baseline', help="Store the results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed p95 increase (fraction).")
+    parser.add_argument('--slack-ms', type=float, default=5.0, help="Allowed absolute p95 increase.")
+    args = parser.parse_args()
+
+    setup_django()
+    with scratch_database():
+        results = run(args)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as handle:
+            handle.write(output + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            failures = compare(results, json.load(handle), args.tolerance, args.slack_ms)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,23 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import AccountErasure, OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'dedup_key')
+    readonly_fields = ('dedup_key', 'created_at', 'sent_at', 'last_error')
+
+
+@admin.register(AccountErasure)
+class AccountErasureAdmin(admin.ModelAdmin):
+    list_display = ('account_id', 'mode', 'requested_by', 'requested_at', 'finished_at')
+    list_filter = ('mode', ('finished_at', admin.EmptyFieldListFilter))
+    list_select_related = ('requested_by',)
+    readonly_fields = ('account_id', 'mode', 'requested_by', 'requested_at', 'finished_at', 'counts')
+
+    def has_add_permission(self, request):
+        # Queued from the user changelist actions
+        return False
@@ -0,0 +1,76 @@
+"""
+Frontend asset bundles.
+
+Every page loads one CSS and one JS bundle instead of separate Bootstrap,
+Bootstrap Icons and app files. ``manage.py bundle_assets`` downloads the
+vendor files once into ``static/vendor/``, minifies everything and writes
+``static/dist/``; ``collectstatic`` then fingerprints and Brotli/gzip
+compresses the bundles through WhiteNoise. Until the bundles are built
+the ``{% bundle_css %}``/``{% bundle_js %}`` tags emit the original
+per-file links.
+
+The same command writes the JavaScript translation catalog of every
+language (from ``locale/*/LC_MESSAGES/djangojs.mo``) to
+``static/dist/jsi18n/``, so the catalog is fingerprinted and cached like
+the bundles; ``{% js_catalog %}`` falls back to the cached
+``JavaScriptCatalog`` view.
+"""
+import posixpath
+import re
+from urllib.parse import urljoin, urlsplit
+
+BUNDLES = {
+    'css': {
+        'output': 'dist/medbook.css',
+        'sources': [
+            'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+            'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.css',
+            'css/style.css',
+        ],
+    },
+    'js': {
+        'output': 'dist/medbook.js',
+        'sources': [
+            'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+            'js/script.js',
+        ],
+    },
+}
+
+VENDOR_DIR = 'vendor'
+FONT_DIR = 'dist/fonts'
+JS_CATALOG_DIR = 'dist/jsi18n'
+# Project catalogs (LOCALE_PATHS) are always included; this leaves out the admin's.
+JS_CATALOG_PACKAGES = ['accounts', 'appointments', 'core']
+
+CSS_URL_RE = re.compile(r'url\(\s*["\']?(?!data:)([^"\')]+)["\']?\s*\)')
+
+
+def is_remote(source):
+    return source.startswith(('http://', 'https://'))
+
+
+def js_catalog_path(language_code):
+    return f'{JS_CATALOG_DIR}/{language_code}.js'
+
+
+def vendor_path(url):
+    """Local path under ``static/`` of a vendored remote file."""
+    parts = urlsplit(url)
+    return posixpath.join(VENDOR_DIR, parts.netloc, parts.path.lstrip('/'))
+
+
+def css_font_urls(css, base_url):
+    """Absolute URLs of the fonts referenced by a remote stylesheet."""
+    return {
+        reference: urljoin(base_url, reference.split('?')[0].split('#')[0])
+        for reference in CSS_URL_RE.findall(css)
+    }
+
+
+def rewrite_font_urls(css):
+    """Point a vendored stylesheet's font references at ``FONT_DIR``."""
+    def replace(match):
+        name = posixpath.basename(urlsplit(match.group(1)).path)
+        return f'url("fonts/{name}")'
+    return CSS_URL_RE.sub(replace, css)
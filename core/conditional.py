@@ -0,0 +1,53 @@
+"""
+Conditional GET for per-user HTML pages.
+
+``conditional_page`` wraps a view in ``condition()``: the ETag function
+returns the resource versions the page depends on (see
+``appointments.versions``) and ``page_etag`` mixes in everything else that
+changes the HTML: the user, their displayed profile, the language, the
+release and the CSRF secret, since pages with forms embed a token derived
+from it (login rotates it). A repeat visit with a matching ``If-None-Match`` gets a 304
+before the view runs its queries. Responses are ``private, no-cache`` so
+browsers revalidate every time and shared proxies never store them.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+_started = str(time.time())
+
+
+def page_etag(request, *parts):
+    """ETag of a page built from ``parts``, or None when it must be rendered."""
+    if len(messages.get_messages(request)):
+        # Pending messages are only consumed by a full render.
+        return None
+    user = request.user
+    identity = (
+        (user.pk, user.get_full_name(), user.profile_image.name, repr(user.profile_image_renditions))
+        if user.is_authenticated else ('anonymous',)
+    )
+    # Set by CsrfViewMiddleware from the cookie (or session); a 304 must not
+    # leave the browser a form whose token no longer matches it.
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    key = repr((*parts, *identity, csrf_secret, request.LANGUAGE_CODE, settings.RELEASE_VERSION or _started))
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_page(etag_func):
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
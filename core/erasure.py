@@ -0,0 +1,307 @@
+"""
+Deleting and anonymizing accounts without Django's delete collector.
+
+``User.delete()`` walks every relation in Python first: for a doctor with
+years of slots that is hundreds of thousands of objects in memory and one
+endless transaction. Here each table is emptied on its own, children
+before parents, ``batch_size`` primary keys per DELETE in short
+transactions, so by the time a parent row goes its cascades find nothing
+left to load. Accounts are handled ``batch_size`` at a time too.
+
+Before anything is removed, what the accounts hold of other people's
+time is given back: future slots a patient booked or holds go back to
+'free' and are offered to the waitlist, and a doctor's future
+appointments are cancelled with an email to each patient.
+
+Anonymizing keeps the rows statistics need (appointments, archives,
+specialty) and blanks everything personal: names, contact details,
+profile image, free-text reasons, beneficiaries. The account can no
+longer log in.
+
+The admin never runs this in a request: ``request_erasure`` deactivates
+the accounts and queues an ``AccountErasure`` row per account, carried
+out by ``manage.py erase_accounts``. Every step is idempotent, so a run
+that was interrupted is simply repeated.
+"""
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from accounts.models import Administrator, Doctor, Manager, Patient, User
+from appointments.analytics import record_cancellations
+from appointments.events import publish_slot_change
+from appointments.models import (
+    Appointment, ArchivedAppointment, ArchivedTimeSlot, Beneficiary, Cancellation, DoctorUnavailability, Planning,
+    Reminder, SlotUsage, TimeSlot, WaitlistEntry, WeeklyTemplate, WeeklyTemplateInterval,
+)
+from appointments.notifications import notify_patient
+from appointments.versions import bump_availability_version, bump_patient_appointments_version
+from appointments.waitlist import offer_freed_slots
+
+from .models import AccountErasure, OutboxEmail
+
+BATCH_SIZE = 1000
+UPCOMING_STATUSES = ('confirmed', 'modified')
+ANONYMOUS_EMAIL_DOMAIN = 'anonymized.invalid'
+DEFAULT_PROFILE_IMAGE = User._meta.get_field('profile_image').default
+
+
+def _chunks(ids, size):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _add(counts, deleted):
+    """Merge the per-model counts of a ``QuerySet.delete()`` into ``counts``."""
+    for label, number in deleted[1].items():
+        if number:
+            counts[label] = counts.get(label, 0) + number
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE, counts=None):
+    """Delete ``queryset`` ``batch_size`` rows per transaction. Returns the counts by model."""
+    counts = {} if counts is None else counts
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return counts
+        with transaction.atomic():
+            _add(counts, model.objects.filter(pk__in=ids).delete())
+
+
+def update_in_batches(queryset, batch_size=BATCH_SIZE, **values):
+    """
+    Apply ``values`` to ``queryset`` ``batch_size`` rows per UPDATE. The
+    update must take the rows out of ``queryset``. Returns the rows updated.
+    """
+    model, updated = queryset.model, 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return updated
+        updated += model.objects.filter(pk__in=ids).update(**values)
+
+
+# --- Giving back future bookings ---
+def release_future_bookings(patient_ids, batch_size=BATCH_SIZE, counts=None):
+    """
+    Free the future slots ``patient_ids`` booked, and every slot they hold,
+    deleting the appointments; the slots are offered to the waitlist.
+    Returns the number of slots freed.
+    """
+    counts = {} if counts is None else counts
+    slots = TimeSlot.objects.filter(
+        Q(appointment__patient_id__in=patient_ids, date__gte=timezone.localdate()) | Q(held_by_id__in=patient_ids)
+    )
+    freed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                slots.order_by('pk').values('id', 'date', 'start_time', 'end_time', 'planning__doctor_id')[:batch_size]
+            )
+            if not batch:
+                return freed
+            ids = [slot['id'] for slot in batch]
+            _add(counts, Reminder.objects.filter(appointment__time_slot_id__in=ids).delete())
+            _add(counts, Appointment.objects.filter(time_slot_id__in=ids).delete())
+            freed += TimeSlot.objects.filter(pk__in=ids).update(status='free', held_by=None, hold_expires_at=None)
+            by_doctor = {}
+            for slot in batch:
+                by_doctor.setdefault(slot['planning__doctor_id'], []).append(slot)
+            for doctor_id, doctor_slots in by_doctor.items():
+                publish_slot_change(doctor_id, doctor_slots, 'free')
+                bump_availability_version(doctor_id)
+            offer_freed_slots(ids)
+
+
+def cancel_future_appointments(doctor_ids, batch_size=BATCH_SIZE, counts=None):
+    """
+    Cancel the upcoming appointments with ``doctor_ids``, queueing the
+    'cancelled' email for each patient. Returns the number cancelled.
+    """
+    counts = {} if counts is None else counts
+    upcoming = Appointment.objects.filter(
+        doctor_id__in=doctor_ids, status__in=UPCOMING_STATUSES, time_slot__date__gte=timezone.localdate(),
+    )
+    cancelled = 0
+    while True:
+        with transaction.atomic():
+            batch = list(upcoming.select_related('patient__user', 'doctor__user', 'time_slot').order_by('pk')[:batch_size])
+            if not batch:
+                return cancelled
+            for appointment in batch:
+                notify_patient(appointment, 'cancelled')
+            record_cancellations(batch)
+            ids = [appointment.pk for appointment in batch]
+            _add(counts, Reminder.objects.filter(appointment_id__in=ids).delete())
+            _add(counts, Appointment.objects.filter(pk__in=ids).delete())
+            for patient_id in {appointment.patient_id for appointment in batch}:
+                bump_patient_appointments_version(patient_id)
+            cancelled += len(batch)
+
+
+# --- Deletion ---
+def _delete_doctors(doctor_ids, batch_size, counts):
+    cancel_future_appointments(doctor_ids, batch_size, counts)
+    for queryset in (
+        Reminder.objects.filter(appointment__doctor_id__in=doctor_ids),
+        Appointment.objects.filter(doctor_id__in=doctor_ids),
+        WaitlistEntry.objects.filter(doctor_id__in=doctor_ids),
+        TimeSlot.objects.filter(planning__doctor_id__in=doctor_ids),
+        Planning.objects.filter(doctor_id__in=doctor_ids),
+        # A queryset delete skips DoctorUnavailability.delete(): the slots it would free are gone
+        DoctorUnavailability.objects.filter(doctor_id__in=doctor_ids),
+        WeeklyTemplateInterval.objects.filter(template__doctor_id__in=doctor_ids),
+        WeeklyTemplate.objects.filter(doctor_id__in=doctor_ids),
+        ArchivedAppointment.objects.filter(doctor_id__in=doctor_ids),
+        ArchivedTimeSlot.objects.filter(doctor_id__in=doctor_ids),
+        SlotUsage.objects.filter(doctor_id__in=doctor_ids),
+        Cancellation.objects.filter(doctor_id__in=doctor_ids),
+        Doctor.objects.filter(pk__in=doctor_ids),
+    ):
+        delete_in_batches(queryset, batch_size, counts)
+
+
+def _delete_patients(patient_ids, batch_size, counts):
+    release_future_bookings(patient_ids, batch_size, counts)
+    for queryset in (
+        Reminder.objects.filter(appointment__patient_id__in=patient_ids),
+        Appointment.objects.filter(patient_id__in=patient_ids),
+        WaitlistEntry.objects.filter(patient_id__in=patient_ids),
+        ArchivedAppointment.objects.filter(patient_id__in=patient_ids),
+        Beneficiary.objects.filter(patient_id__in=patient_ids),
+        Patient.objects.filter(pk__in=patient_ids),
+    ):
+        delete_in_batches(queryset, batch_size, counts)
+
+
+def _profile_images(users):
+    """Uploaded image and rendition paths of ``users`` (``(profile_image, renditions)`` pairs)."""
+    paths = set()
+    for image, renditions in users:
+        if image and image != DEFAULT_PROFILE_IMAGE:
+            paths.add(image)
+        for formats in renditions.values():
+            if isinstance(formats, dict):
+                paths.update(formats.values())
+    return paths
+
+
+def _remove_files(paths):
+    for path in paths:
+        default_storage.delete(path)
+
+
+def _forget_users(user_ids, counts):
+    """Drop what every account leaves outside its own tables: queued emails and profile images."""
+    users = list(User.objects.filter(pk__in=user_ids).values_list('email', 'profile_image', 'profile_image_renditions'))
+    _add(counts, OutboxEmail.objects.filter(to_email__in=[email for email, _, _ in users]).delete())
+    paths = _profile_images((image, renditions) for _, image, renditions in users)
+    transaction.on_commit(lambda: _remove_files(paths))
+
+
+def delete_accounts(user_ids, batch_size=BATCH_SIZE):
+    """Delete the accounts ``user_ids`` and everything that hangs off them. Returns the counts by model."""
+    counts = {}
+    for chunk in _chunks(user_ids, batch_size):
+        _delete_doctors(list(Doctor.objects.filter(pk__in=chunk).values_list('pk', flat=True)), batch_size, counts)
+        _delete_patients(list(Patient.objects.filter(pk__in=chunk).values_list('pk', flat=True)), batch_size, counts)
+        delete_in_batches(Manager.objects.filter(pk__in=chunk), batch_size, counts)
+        delete_in_batches(Administrator.objects.filter(pk__in=chunk), batch_size, counts)
+        with transaction.atomic():
+            _forget_users(chunk, counts)
+            # Only group and permission links and admin log entries are left to cascade
+            _add(counts, User.objects.filter(pk__in=chunk).delete())
+    return counts
+
+
+# --- Anonymization ---
+def _anonymize_doctors(doctor_ids, batch_size, counts):
+    cancel_future_appointments(doctor_ids, batch_size, counts)
+    for queryset in (
+        WaitlistEntry.objects.filter(doctor_id__in=doctor_ids),
+        # Past slots stay with the appointment history; no template, so none are generated again
+        TimeSlot.objects.filter(planning__doctor_id__in=doctor_ids, date__gte=timezone.localdate()),
+        WeeklyTemplateInterval.objects.filter(template__doctor_id__in=doctor_ids),
+        WeeklyTemplate.objects.filter(doctor_id__in=doctor_ids),
+    ):
+        delete_in_batches(queryset, batch_size, counts)
+    Doctor.objects.filter(pk__in=doctor_ids).update(biography='')
+
+
+def _anonymize_patients(patient_ids, batch_size, counts):
+    release_future_bookings(patient_ids, batch_size, counts)
+    delete_in_batches(WaitlistEntry.objects.filter(patient_id__in=patient_ids), batch_size, counts)
+    for model in (Appointment, ArchivedAppointment):
+        update_in_batches(model.objects.filter(patient_id__in=patient_ids, reason__isnull=False), batch_size, reason=None)
+    # The primary key keeps the names unique per patient (unique_beneficiary_name)
+    update_in_batches(
+        Beneficiary.objects.filter(patient_id__in=patient_ids).exclude(first_name='Anonymized'), batch_size,
+        first_name='Anonymized', last_name=Cast('pk', CharField()), gender='Other',
+    )
+    Patient.objects.filter(pk__in=patient_ids).update(date_of_birth=None)
+
+
+def anonymize_accounts(user_ids, batch_size=BATCH_SIZE):
+    """
+    Blank the personal data of the accounts ``user_ids``, keeping their
+    appointment history anonymously, and disable them. Returns the counts.
+    """
+    counts = {}
+    password = make_password(None)
+    for chunk in _chunks(user_ids, batch_size):
+        _anonymize_doctors(list(Doctor.objects.filter(pk__in=chunk).values_list('pk', flat=True)), batch_size, counts)
+        _anonymize_patients(list(Patient.objects.filter(pk__in=chunk).values_list('pk', flat=True)), batch_size, counts)
+        with transaction.atomic():
+            _forget_users(chunk, counts)
+            _add(counts, User.groups.through.objects.filter(user_id__in=chunk).delete())
+            _add(counts, User.user_permissions.through.objects.filter(user_id__in=chunk).delete())
+            anonymized = User.objects.filter(pk__in=chunk).update(
+                email=Concat(Value('deleted-'), Cast('pk', CharField()), Value(f'@{ANONYMOUS_EMAIL_DOMAIN}')),
+                first_name='Anonymized', last_name='', phone='', address='', gender='',
+                password=password, is_active=False, is_staff=False, is_superuser=False,
+                profile_image=DEFAULT_PROFILE_IMAGE, profile_image_renditions={},
+            )
+        counts['accounts.User (anonymized)'] = counts.get('accounts.User (anonymized)', 0) + anonymized
+    return counts
+
+
+# --- Queue (admin actions, erase_accounts command) ---
+ERASERS = {'delete': delete_accounts, 'anonymize': anonymize_accounts}
+
+
+def request_erasure(user_ids, mode, requested_by=None):
+    """
+    Disable the accounts ``user_ids`` right away and queue their ``mode``
+    erasure ('delete' or 'anonymize'). Returns the number queued.
+    """
+    if mode not in ERASERS:
+        raise ValueError(f"Unknown erasure mode {mode!r}, expected one of {', '.join(ERASERS)}.")
+    user_ids = set(user_ids)
+    with transaction.atomic():
+        queued = set(
+            AccountErasure.objects.filter(account_id__in=user_ids, mode=mode, finished_at__isnull=True)
+            .values_list('account_id', flat=True)
+        )
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        created = AccountErasure.objects.bulk_create([
+            AccountErasure(account_id=pk, mode=mode, requested_by=requested_by)
+            for pk in sorted(user_ids - queued)
+        ])
+    return len(created)
+
+
+def erase_pending(limit=None, batch_size=BATCH_SIZE):
+    """Carry out queued erasures, oldest first (at most ``limit``). Returns the number done."""
+    pending = AccountErasure.objects.filter(finished_at__isnull=True).order_by('requested_at', 'pk')
+    done = 0
+    for erasure in pending[:limit] if limit else pending:
+        counts = ERASERS[erasure.mode]([erasure.account_id], batch_size)
+        AccountErasure.objects.filter(pk=erasure.pk).update(finished_at=timezone.now(), counts=counts)
+        done += 1
+    return done
@@ -0,0 +1,104 @@
+import gzip
+import shutil
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import translation
+from django.views.i18n import JavaScriptCatalog
+
+from core.assets import (
+    BUNDLES, FONT_DIR, JS_CATALOG_PACKAGES, css_font_urls, is_remote, js_catalog_path,
+    rewrite_font_urls, vendor_path,
+)
+
+try:
+    import brotli
+except ImportError:  # size report only
+    brotli = None
+
+
+def minify(kind, text):
+    import rcssmin
+    import rjsmin
+
+    if kind == 'css':
+        return rcssmin.cssmin(text)
+    return rjsmin.jsmin(text)
+
+
+class Command(BaseCommand):
+    help = "Vendor, minify and concatenate the frontend assets into one CSS and one JS bundle."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true', help="Download vendor files again.")
+        parser.add_argument('--offline', action='store_true', help="Fail instead of downloading missing vendor files.")
+
+    def handle(self, *args, **options):
+        self.static_dir = Path(settings.STATICFILES_DIRS[0])
+        self.refresh = options['refresh']
+        self.offline = options['offline']
+
+        for kind, bundle in BUNDLES.items():
+            parts = []
+            for source in bundle['sources']:
+                if is_remote(source):
+                    text = self.vendor(source)
+                    if kind == 'css':
+                        text = self.vendor_fonts(source, text)
+                else:
+                    text = (self.static_dir / source).read_text(encoding='utf-8')
+                parts.append(minify(kind, text))
+
+            output = self.static_dir / bundle['output']
+            output.parent.mkdir(parents=True, exist_ok=True)
+            # ";" keeps concatenated scripts from running into each other
+            content = ('\n' if kind == 'css' else ';\n').join(parts).encode('utf-8')
+            output.write_bytes(content)
+            self.stdout.write(self.style.SUCCESS(f"{bundle['output']}: {self.sizes(content)}"))
+
+        self.write_js_catalogs()
+        self.stdout.write("Run collectstatic to fingerprint and compress the bundles.")
+
+    def write_js_catalogs(self):
+        view = JavaScriptCatalog.as_view(domain='djangojs', packages=JS_CATALOG_PACKAGES)
+        for language_code, _name in settings.LANGUAGES:
+            with translation.override(language_code):
+                content = view(RequestFactory().get('/jsi18n/')).content
+            output = self.static_dir / js_catalog_path(language_code)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_bytes(minify('js', content.decode('utf-8')).encode('utf-8'))
+            self.stdout.write(self.style.SUCCESS(
+                f"{js_catalog_path(language_code)}: {self.sizes(output.read_bytes())}"
+            ))
+
+    def fetch(self, url):
+        path = self.static_dir / vendor_path(url)
+        if self.refresh or not path.exists():
+            if self.offline:
+                raise CommandError(f"{url} is not vendored yet (run without --offline).")
+            self.stdout.write(f"Downloading {url}")
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        return path
+
+    def vendor(self, url):
+        return self.fetch(url).read_text(encoding='utf-8')
+
+    def vendor_fonts(self, url, css):
+        font_dir = self.static_dir / FONT_DIR
+        font_dir.mkdir(parents=True, exist_ok=True)
+        for font_url in set(css_font_urls(css, url).values()):
+            font = self.fetch(font_url)
+            shutil.copyfile(font, font_dir / font.name)
+        return rewrite_font_urls(css)
+
+    def sizes(self, content):
+        report = f"{len(content) / 1024:.1f} KiB, gzip {len(gzip.compress(content, 9)) / 1024:.1f} KiB"
+        if brotli is not None:
+            report += f", brotli {len(brotli.compress(content)) / 1024:.1f} KiB"
+        return report
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.erasure import BATCH_SIZE, erase_pending
+
+
+class Command(BaseCommand):
+    help = "Delete or anonymize the accounts queued from the admin, in batches (cron or worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows deleted per transaction.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            done = erase_pending(batch_size=options['batch_size'])
+            if done or not options['loop']:
+                self.stdout.write(f"Erased {done} account(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,55 @@
+import gzip
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from core.assets import BUNDLES, is_remote
+from core.templatetags.assets import bundle_built
+
+STATIC_RE = re.compile(r"""(?:href|src)=["']\{%\s*static\s+['"]([^'"]+\.(?:css|js))['"]\s*%\}""")
+REMOTE_RE = re.compile(r"""(?:href|src)=["'](https?://[^"']+\.(?:css|js))["']""")
+EXTENDS_RE = re.compile(r"""\{%\s*extends\s+['"]([^'"]+)['"]\s*%\}""")
+
+
+class Command(BaseCommand):
+    help = "Report the CSS/JS requests and bytes each page template loads."
+
+    def handle(self, *args, **options):
+        template_dir = Path(settings.TEMPLATES[0]['DIRS'][0])
+        rows = []
+        for path in sorted(template_dir.rglob('*.html')):
+            name = path.relative_to(template_dir).as_posix()
+            if name == 'base.html':
+                continue
+            assets = self.assets(template_dir, name)
+            local = [self.size(asset) for asset in assets if not is_remote(asset)]
+            remote = [asset for asset in assets if is_remote(asset)]
+            rows.append((name, len(assets), len(remote), sum(raw for raw, _ in local), sum(gz for _, gz in local)))
+
+        self.stdout.write(f"{'template':45} {'requests':>8} {'remote':>6} {'local KiB':>9} {'gzip KiB':>8}")
+        for name, requests, remote, raw, gz in rows:
+            self.stdout.write(f"{name:45} {requests:8} {remote:6} {raw / 1024:9.1f} {gz / 1024:8.1f}")
+        if not all(bundle_built(kind) for kind in BUNDLES):
+            self.stdout.write(self.style.WARNING("Bundles not built yet: run bundle_assets for the bundled numbers."))
+
+    def assets(self, template_dir, name):
+        """Stylesheets and scripts of a template and the templates it extends."""
+        text = (template_dir / name).read_text(encoding='utf-8')
+        assets = STATIC_RE.findall(text) + REMOTE_RE.findall(text)
+        for kind in BUNDLES:
+            if f'{{% bundle_{kind} %}}' in text:
+                assets += [BUNDLES[kind]['output']] if bundle_built(kind) else BUNDLES[kind]['sources']
+        parent = EXTENDS_RE.search(text)
+        if parent:
+            assets += self.assets(template_dir, parent.group(1))
+        return assets
+
+    def size(self, asset):
+        found = finders.find(asset)
+        if not found:
+            return 0, 0
+        content = Path(found).read_bytes()
+        return len(content), len(gzip.compress(content, 9))
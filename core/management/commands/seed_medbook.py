@@ -0,0 +1,53 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import User
+from core.seeding import BATCH_SIZE, EMAIL_DOMAIN, Seeder, flush_seeded_data
+
+
+class Command(BaseCommand):
+    help = "Generate a large deterministic synthetic dataset (users, beneficiaries, plannings, slots, appointments)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100)
+        parser.add_argument('--patients', type=int, default=10000)
+        parser.add_argument('--managers', type=int, default=2)
+        parser.add_argument('--beneficiaries', type=int, default=3, help="Maximum beneficiaries per patient.")
+        parser.add_argument('--start', type=date.fromisoformat, default=None,
+                            help="First slot day (YYYY-MM-DD), default 180 days ago.")
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--booking-rate', type=float, default=0.4, help="Share of slots that get an appointment.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-copy', action='store_true', help="Use INSERT even on PostgreSQL.")
+        parser.add_argument('--flush', action='store_true', help="Delete the data of a previous run first.")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.stdout.write(f"Deleted {flush_seeded_data()} row(s) from a previous run.")
+        elif User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists():
+            raise CommandError("Seeded data already exists; pass --flush to replace it.")
+
+        start = options['start'] or timezone.localdate() - timedelta(days=180)
+        seeder = Seeder(
+            seed=options['seed'], batch_size=options['batch_size'],
+            use_copy=False if options['no_copy'] else None,
+        )
+        started = time.perf_counter()
+        counts = seeder.run(
+            doctors=options['doctors'], patients=options['patients'], managers=options['managers'],
+            max_beneficiaries=options['beneficiaries'], start=start, days=options['days'],
+            booking_rate=options['booking_rate'],
+        )
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        method = 'COPY' if seeder.use_copy else 'bulk INSERT'
+        for name, count in counts.items():
+            self.stdout.write(f"{name:>14}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s, {method}, {connection.vendor})."
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import BATCH_SIZE, deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox in batches over one SMTP connection (cron or worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Emails sent per connection.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=10)
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_pending(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
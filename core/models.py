@@ -1,3 +1,62 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class OutboxEmail(models.Model):
+    """
+    An email written in the same transaction as the change it reports and
+    delivered later by ``manage.py send_outbox`` (see core.outbox).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    # One email per event: enqueueing the same key twice is a no-op
+    dedup_key = models.CharField(max_length=200, unique=True)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class AccountErasure(models.Model):
+    """
+    An account queued for deletion or anonymization from the admin, carried
+    out by ``manage.py erase_accounts`` (see core.erasure).
+    """
+    MODE_CHOICES = [
+        ('delete', 'Delete'),
+        ('anonymize', 'Anonymize'),
+    ]
+
+    # Not a foreign key: the user row is what goes away
+    account_id = models.BigIntegerField()
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True, related_name='+',
+    )
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Rows deleted or updated, by model
+    counts = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['requested_at'], condition=models.Q(finished_at__isnull=True), name='erasure_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_mode_display()} account {self.account_id} ({'done' if self.finished_at else 'pending'})"
@@ -0,0 +1,94 @@
+"""
+Transactional email outbox.
+
+Views never talk to SMTP. ``enqueue`` inserts an ``OutboxEmail`` row in
+the caller's transaction, so the email exists if and only if the booking
+(or cancellation...) committed, and a repeated ``dedup_key`` is ignored.
+``deliver_pending`` (the ``send_outbox`` command) claims due rows with
+``select_for_update(skip_locked=True)``, so several workers never send
+the same row, and sends a whole batch over one SMTP connection. A failed
+email is retried with exponential backoff until ``OUTBOX_MAX_ATTEMPTS``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+
+from .models import OutboxEmail
+
+BATCH_SIZE = 100
+
+
+def enqueue(dedup_key, to_email, subject, template_name, context=None, language=None):
+    """Queue an email rendered from ``template_name``; a known ``dedup_key`` is skipped."""
+    with translation.override(language or settings.LANGUAGE_CODE):
+        body = render_to_string(template_name, context or {})
+        subject = str(subject)
+    OutboxEmail.objects.bulk_create(
+        [OutboxEmail(dedup_key=dedup_key, to_email=to_email, subject=subject, body=body, next_attempt_at=timezone.now())],
+        ignore_conflicts=True,
+    )
+
+
+def retry_delay(attempts):
+    """Backoff after the ``attempts``-th failure: base, 2x base, 4x base... capped at a day."""
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1), 86400))
+
+
+def deliver_batch(batch_size=BATCH_SIZE):
+    """Send one batch of due emails over one connection. Returns (sent, failed)."""
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if not emails:
+            return 0, 0
+
+        sent, failed = [], []
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as error:
+            failed = [(email, error) for email in emails]
+        else:
+            try:
+                for email in emails:
+                    message = EmailMessage(email.subject, email.body, to=[email.to_email], connection=connection)
+                    try:
+                        message.send()
+                    except Exception as error:
+                        failed.append((email, error))
+                    else:
+                        sent.append(email)
+            finally:
+                connection.close()
+
+        now = timezone.now()
+        for email in sent:
+            email.status, email.sent_at, email.last_error = 'sent', now, ''
+        for email, error in failed:
+            email.attempts += 1
+            email.last_error = f"{type(error).__name__}: {error}"
+            if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                email.status = 'failed'
+            else:
+                email.next_attempt_at = now + retry_delay(email.attempts)
+        OutboxEmail.objects.bulk_update(
+            emails, ['status', 'sent_at', 'attempts', 'next_attempt_at', 'last_error'],
+        )
+    return len(sent), len(failed)
+
+
+def deliver_pending(batch_size=BATCH_SIZE):
+    """Send due emails batch after batch until none is left. Returns (sent, failed)."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_batch(batch_size)
+        total_sent, total_failed = total_sent + sent, total_failed + failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
@@ -0,0 +1,188 @@
+"""
+Synthetic data at production scale for ``manage.py seed_medbook``.
+
+Users, profiles, beneficiaries, weekly templates and plannings are
+inserted with ``bulk_create`` and share one password hash computed up
+front. Slots and appointments (the large tables) are streamed per doctor
+in batches with ids assigned here, so appointments can reference their
+slot without reading anything back; on PostgreSQL the batches go through
+``COPY`` instead of ``INSERT``. One seeded RNG drives every choice, so the
+same arguments always produce the same rows.
+"""
+import random
+from datetime import time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import Doctor, Manager, Patient, User
+from appointments.models import (
+    Appointment, Beneficiary, TimeSlot, WeeklyTemplate, WeeklyTemplateInterval,
+)
+from appointments.schedules import compile_template, ensure_plannings, expand
+
+PASSWORD = 'medbook-seed'
+EMAIL_DOMAIN = 'seed.medbook.test'
+BATCH_SIZE = 5000
+
+SPECIALTIES = ('General', 'Pediatrics', 'Cardiology', 'Dermatology', 'Gynecology', 'Ophthalmology')
+FIRST_NAMES = ('Amina', 'Jean', 'Marie', 'Paul', 'Fatou', 'Eric', 'Aïcha', 'Luc', 'Grace', 'Samuel')
+LAST_NAMES = ('Ngono', 'Mballa', 'Tchoua', 'Fotso', 'Ndiaye', 'Kamga', 'Essomba', 'Diallo', 'Nkeng', 'Abena')
+
+
+class Seeder:
+    def __init__(self, seed=42, batch_size=BATCH_SIZE, use_copy=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        # A fixed salt keeps the hash, like everything else, deterministic.
+        self.password = make_password(PASSWORD, salt=f'medbookseed{seed}')
+        self.counts = {}
+
+    # --- Small tables (bulk_create) ---
+    def create_users(self, role, prefix, count):
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f'{prefix}-{index}@{EMAIL_DOMAIN}', password=self.password, role=role,
+                    first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                    preferred_language=self.rng.choice(('en', 'fr')),
+                )
+                for index in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        self.counts[prefix + 's'] = len(users)
+        return [user.pk for user in users]
+
+    def create_doctors(self, count):
+        ids = self.create_users(User.Role.DOCTOR, 'doctor', count)
+        Doctor.objects.bulk_create(
+            [
+                Doctor(user_id=pk, specialty=self.rng.choice(SPECIALTIES), years_of_experience=self.rng.randint(1, 35))
+                for pk in ids
+            ],
+            batch_size=self.batch_size,
+        )
+        templates = WeeklyTemplate.objects.bulk_create(
+            [WeeklyTemplate(doctor_id=pk, slot_duration=self.rng.choice((15, 20, 30, 60))) for pk in ids],
+            batch_size=self.batch_size,
+        )
+        intervals = []
+        for template in templates:
+            start_hour = self.rng.choice((7, 8, 9))
+            for weekday in range(self.rng.choice((5, 6))):
+                intervals += [
+                    WeeklyTemplateInterval(template=template, weekday=weekday, start_time=time(start_hour),
+                                           end_time=time(start_hour + 9)),
+                    WeeklyTemplateInterval(template=template, weekday=weekday, start_time=time(12),
+                                           end_time=time(13), kind='break'),
+                ]
+        WeeklyTemplateInterval.objects.bulk_create(intervals, batch_size=self.batch_size)
+        return ids
+
+    def create_patients(self, count, max_beneficiaries):
+        ids = self.create_users(User.Role.PATIENT, 'patient', count)
+        Patient.objects.bulk_create([Patient(user_id=pk) for pk in ids], batch_size=self.batch_size)
+        # Names are unique per patient (unique_beneficiary_name)
+        names = [(first, last) for first in FIRST_NAMES for last in LAST_NAMES]
+        beneficiaries = Beneficiary.objects.bulk_create(
+            [
+                Beneficiary(
+                    patient_id=pk, first_name=first, last_name=last,
+                    gender=self.rng.choice(('Male', 'Female', 'Other')), age=self.rng.randint(0, 90),
+                )
+                for pk in ids
+                for first, last in self.rng.sample(names, min(len(names), self.rng.randint(0, max_beneficiaries)))
+            ],
+            batch_size=self.batch_size,
+        )
+        self.counts['beneficiaries'] = len(beneficiaries)
+        by_patient = {}
+        for beneficiary in beneficiaries:
+            by_patient.setdefault(beneficiary.patient_id, []).append(beneficiary.pk)
+        return ids, by_patient
+
+    def create_managers(self, count):
+        ids = self.create_users(User.Role.MANAGER, 'manager', count)
+        Manager.objects.bulk_create([Manager(user_id=pk) for pk in ids])
+        return ids
+
+    # --- Large tables (streamed, COPY on PostgreSQL) ---
+    def insert(self, model, fields, rows):
+        if not rows:
+            return
+        if self.use_copy:
+            columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+            table = connection.ops.quote_name(model._meta.db_table)
+            with connection.cursor() as cursor:
+                with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            model.objects.bulk_create([model(**dict(zip(fields, row))) for row in rows], batch_size=self.batch_size)
+
+    def create_schedule(self, doctor_ids, patient_ids, beneficiaries, start, days, booking_rate):
+        """Slots for every doctor over ``days`` days from ``start``, a ``booking_rate`` share of them booked."""
+        end = start + timedelta(days=days - 1)
+        today = timezone.localdate()
+        now = timezone.now()
+        plannings = ensure_plannings(doctor_ids, start, end)
+        templates = WeeklyTemplate.objects.filter(doctor_id__in=doctor_ids).prefetch_related('intervals')
+        slot_id = (TimeSlot.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        appointment_id = (Appointment.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+        slot_fields = ('id', 'planning_id', 'date', 'start_time', 'end_time', 'status')
+        appointment_fields = ('id', 'patient_id', 'doctor_id', 'time_slot_id', 'beneficiary_id', 'status', 'created_at')
+        slots, appointments = [], []
+        for template in templates.order_by('doctor_id'):
+            doctor_id = template.doctor_id
+            for day, start_time, end_time in expand(compile_template(template), start, end):
+                booked = self.rng.random() < booking_rate
+                slots.append((
+                    slot_id, plannings[doctor_id, day.year, day.month], day, start_time, end_time,
+                    'reserved' if booked else 'free',
+                ))
+                if booked:
+                    patient_id = self.rng.choice(patient_ids)
+                    choices = beneficiaries.get(patient_id)
+                    beneficiary_id = self.rng.choice(choices) if choices and self.rng.random() < 0.3 else None
+                    appointments.append((
+                        appointment_id, patient_id, doctor_id, slot_id, beneficiary_id,
+                        'completed' if day < today else 'confirmed', now,
+                    ))
+                    appointment_id += 1
+                slot_id += 1
+                if len(slots) >= self.batch_size:
+                    self.flush(slot_fields, slots, appointment_fields, appointments)
+                    slots, appointments = [], []
+        self.flush(slot_fields, slots, appointment_fields, appointments)
+        # Ids were assigned here, so move the sequences past them (no-op on SQLite).
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), [TimeSlot, Appointment]):
+                cursor.execute(statement)
+
+    def flush(self, slot_fields, slots, appointment_fields, appointments):
+        with transaction.atomic():
+            self.insert(TimeSlot, slot_fields, slots)
+            self.insert(Appointment, appointment_fields, appointments)
+        self.counts['slots'] = self.counts.get('slots', 0) + len(slots)
+        self.counts['appointments'] = self.counts.get('appointments', 0) + len(appointments)
+
+    def run(self, doctors, patients, managers, max_beneficiaries, start, days, booking_rate):
+        doctor_ids = self.create_doctors(doctors)
+        patient_ids, beneficiaries = self.create_patients(patients, max_beneficiaries)
+        self.create_managers(managers)
+        self.create_schedule(doctor_ids, patient_ids, beneficiaries, start, days, booking_rate)
+        return self.counts
+
+
+def flush_seeded_data():
+    """Delete everything a previous run created, table by table (see core.erasure)."""
+    from .erasure import delete_accounts
+
+    ids = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').values_list('pk', flat=True)
+    return sum(delete_accounts(ids).values())
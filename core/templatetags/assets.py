@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.translation import get_language
+
+from core.assets import BUNDLES, is_remote, js_catalog_path
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def static_file_built(path):
+    if settings.DEBUG:
+        return finders.find(path) is not None
+    return staticfiles_storage.exists(path)
+
+
+def bundle_built(kind):
+    return static_file_built(BUNDLES[kind]['output'])
+
+
+def bundle_urls(kind):
+    """The bundle URL once built, otherwise every source URL."""
+    if bundle_built(kind):
+        return [static(BUNDLES[kind]['output'])]
+    return [source if is_remote(source) else static(source) for source in BUNDLES[kind]['sources']]
+
+
+@register.simple_tag
+def bundle_css():
+    return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in bundle_urls('css')))
+
+
+@register.simple_tag
+def bundle_js():
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in bundle_urls('js')))
+
+
+@register.simple_tag
+def js_catalog():
+    """JavaScript translation catalog (``gettext``) of the active language."""
+    path = js_catalog_path(get_language())
+    if static_file_built(path):
+        return format_html('<script src="{}"></script>', static(path))
+    return format_html('<script src="{}"></script>', reverse('javascript-catalog'))
@@ -0,0 +1,123 @@
+"""
+Per-request timing of SQL queries and template rendering.
+
+``RenderTimingMiddleware`` opens a timing scope for each request. Every
+database connection gets an execute wrapper that adds query durations to
+the scope, and the ``TimedDjangoTemplates`` backend adds render durations
+minus the queries run lazily while rendering, so the two numbers never
+overlap. The result is sent as a ``Server-Timing`` header (visible in the
+browser's network panel) and renders over ``TEMPLATE_RENDER_BUDGET_MS``
+are logged.
+"""
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+
+
+_timings = ContextVar('medbook_request_timings', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper, installed on every new connection."""
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        if timings is None:
+            return self.template.render(context, request)
+        db_before = timings.db
+        started = perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.render += perf_counter() - started - (timings.db - db_before)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The regular Django template backend with render timing."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class RenderTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.report(request, response, timings, perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.report(request, response, timings, perf_counter() - started)
+
+    def report(self, request, response, timings, total):
+        db_ms, render_ms, total_ms = timings.db * 1000, timings.render * 1000, total * 1000
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{timings.queries} queries", '
+                f'tpl;dur={render_ms:.1f}, total;dur={total_ms:.1f}'
+            )
+        if render_ms > settings.TEMPLATE_RENDER_BUDGET_MS:
+            logger.warning(
+                "Template render budget exceeded on %s: %.1fms render, %.1fms in %d queries, %.1fms total",
+                request.path, render_ms, db_ms, timings.queries, total_ms,
+            )
+        return response
@@ -8,4 +8,6 @@ urlpatterns = [
     path('patient/dashboard/', views.patient_dashboard, name='patient_dashboard'),
     path('doctor/dashboard/', views.doctor_dashboard, name='doctor_dashboard'),
     path('manager/dashboard/', views.manager_dashboard, name='manager_dashboard'),
+    path('manager/analytics/', views.manager_analytics, name='manager_analytics'),
+    path('api/dashboard/stats/', views.dashboard_stats, name='dashboard_stats'),
 ]
@@ -3,11 +3,20 @@ from django.contrib.auth.decorators import login_required
 from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
 from django.utils import timezone
+from django.db.models import Count, Q
+from django.http import JsonResponse
 
 from accounts.models import User, Doctor, Patient, Manager
+from appointments.analytics import period_bounds, period_report
+from appointments.archive import aarchived_status_counts, archived_status_counts
 from appointments.models import Appointment
+from appointments.versions import calendar_version, patient_appointments_version
+from medbook.db_routers import read_from_replica
 
+from .conditional import conditional_page, page_etag
 
+
+@conditional_page(lambda request: page_etag(request, 'home'))
 def home(request):
     """
     Public landing page for the platform.
@@ -16,7 +25,66 @@ def home(request):
     return render(request, 'core/home.html')
 
 
+# --- Dashboard statistics (one aggregate query each, shared with the async API) ---
+def patient_stats_query(patient_id):
+    return Appointment.objects.filter(patient_id=patient_id), {
+        'confirmed': Count('id', filter=Q(status='confirmed')),
+        'pending': Count('id', filter=Q(status='modified')),  # modify as needed
+        'cancelled': Count('id', filter=Q(status='cancelled')),
+        'completed': Count('id', filter=Q(status='completed')),
+    }
+
+
+def doctor_stats_query(doctor_id):
+    return Appointment.objects.filter(doctor_id=doctor_id), {
+        'appointments_today': Count('id', filter=Q(time_slot__date=timezone.localdate())),
+        'pending_approvals': Count('id', filter=Q(status='pending')),  # adjust if needed
+        'patients_seen': Count('id', filter=Q(status='completed')),
+    }
+
+
+def manager_stats_query():
+    return Appointment.objects.all(), {
+        'pending_requests_count': Count('id', filter=Q(status='pending')),
+        'completed_tasks_count': Count('id', filter=Q(status='completed')),
+    }
+
+
+# Stats that also count archived appointments: stat -> archived status.
+# Every past appointment gets archived, so every status-based stat is here
+# (only "today" is left out: nothing archived is today).
+ARCHIVED_STATS = {
+    User.Role.PATIENT: {
+        'confirmed': 'confirmed', 'pending': 'modified', 'cancelled': 'cancelled', 'completed': 'completed',
+    },
+    User.Role.DOCTOR: {'pending_approvals': 'pending', 'patients_seen': 'completed'},
+    User.Role.MANAGER: {'pending_requests_count': 'pending', 'completed_tasks_count': 'completed'},
+}
+
+
+def add_archived_counts(stats, role, counts):
+    for stat, status in ARCHIVED_STATS[role].items():
+        stats[stat] += counts.get(status, 0)
+    return stats
+
+
+# The dashboards read from the primary: their ETags are keyed on version
+# counters bumped there, and a lagging replica would answer 304 on stale counts.
+def patient_dashboard_etag(request):
+    if request.user.role != User.Role.PATIENT:
+        return None
+    return page_etag(request, 'patient_dashboard', patient_appointments_version(request.user.pk))
+
+
+def doctor_dashboard_etag(request):
+    if request.user.role != User.Role.DOCTOR:
+        return None
+    # "Today" counts change at midnight even without writes
+    return page_etag(request, 'doctor_dashboard', calendar_version(request.user.pk), timezone.localdate())
+
+
 @login_required
+@conditional_page(patient_dashboard_etag)
 def patient_dashboard(request):
     if request.user.role != User.Role.PATIENT:
         messages.error(request, _("Access denied: Patients only."))
@@ -25,13 +93,11 @@ def patient_dashboard(request):
     patient = Patient.objects.filter(user=request.user).first()
     
     # Real appointment stats
-    appointments = Appointment.objects.filter(patient=patient)
-    stats = {
-        'confirmed': appointments.filter(status='confirmed').count(),
-        'pending': appointments.filter(status='modified').count(),  # modify as needed
-        'cancelled': appointments.filter(status='cancelled').count(),
-        'completed': appointments.filter(status='completed').count(),
-    }
+    appointments, aggregates = patient_stats_query(patient.pk if patient else None)
+    stats = add_archived_counts(
+        appointments.aggregate(**aggregates), User.Role.PATIENT,
+        archived_status_counts(patient_id=patient.pk if patient else None),
+    )
 
     context = {
         'patient': patient,
@@ -42,20 +108,19 @@ def patient_dashboard(request):
 
 
 @login_required
+@conditional_page(doctor_dashboard_etag)
 def doctor_dashboard(request):
     if request.user.role != User.Role.DOCTOR:
         messages.error(request, _("Access denied: Doctors only."))
         return redirect('core:home')
 
     doctor = Doctor.objects.filter(user=request.user).first()
-    today = timezone.localdate()
 
-    appointments = Appointment.objects.filter(doctor=doctor)
-    stats = {
-        'appointments_today': appointments.filter(time_slot__date=today).count(),
-        'pending_approvals': appointments.filter(status='pending').count(),  # adjust if needed
-        'patients_seen': appointments.filter(status='completed').count(),
-    }
+    appointments, aggregates = doctor_stats_query(doctor.pk if doctor else None)
+    stats = add_archived_counts(
+        appointments.aggregate(**aggregates), User.Role.DOCTOR,
+        archived_status_counts(doctor_id=doctor.pk if doctor else None),
+    )
 
     context = {
         'doctor': doctor,
@@ -65,6 +130,7 @@ def doctor_dashboard(request):
     return render(request, 'core/doctor_dashboard.html', context)
 
 @login_required
+@read_from_replica
 def manager_dashboard(request):
     if request.user.role != User.Role.MANAGER:
         messages.error(request, _("Access denied: Managers only."))
@@ -73,10 +139,12 @@ def manager_dashboard(request):
     # Fetch counts
     active_patients_count = Patient.objects.count()
     active_doctors_count = Doctor.objects.count()
-    # Example: pending requests can be appointments with status 'pending'
-    pending_requests_count = Appointment.objects.filter(status='pending').count()
-    # Completed tasks could be completed appointments
-    completed_tasks_count = Appointment.objects.filter(status='completed').count()
+    # Pending requests are appointments with status 'pending', completed
+    # tasks are completed appointments
+    appointments, aggregates = manager_stats_query()
+    appointment_counts = add_archived_counts(
+        appointments.aggregate(**aggregates), User.Role.MANAGER, archived_status_counts(),
+    )
 
     # Managers list
     managers = Manager.objects.all()  # or filter active managers if needed
@@ -84,9 +152,63 @@ def manager_dashboard(request):
     context = {
         'active_patients_count': active_patients_count,
         'active_doctors_count': active_doctors_count,
-        'pending_requests_count': pending_requests_count,
-        'completed_tasks_count': completed_tasks_count,
+        'pending_requests_count': appointment_counts['pending_requests_count'],
+        'completed_tasks_count': appointment_counts['completed_tasks_count'],
         'managers': managers,
         'title': _("Manager Dashboard"),
     }
-    return render(request, 'core/manager_dashboard.html', context)
\ No newline at end of file
+    return render(request, 'core/manager_dashboard.html', context)
+
+
+# --- Manager analytics (appointments.analytics, cached per period) ---
+@login_required
+@read_from_replica
+def manager_analytics(request):
+    if request.user.role != User.Role.MANAGER:
+        messages.error(request, _("Access denied: Managers only."))
+        return redirect('core:home')
+
+    period = request.GET.get('period') or timezone.localdate().strftime('%Y-%m')
+    try:
+        start, end = period_bounds(period)
+    except ValueError:
+        messages.error(request, _("Pick a period as YYYY or YYYY-MM."))
+        period = timezone.localdate().strftime('%Y-%m')
+        start, end = period_bounds(period)
+    specialty = request.GET.get('specialty') or None
+    doctor = request.GET.get('doctor', '')
+    doctor_id = int(doctor) if doctor.isdigit() else None
+
+    context = {
+        'report': period_report(start, end, specialty, doctor_id),
+        'period': period,
+        'specialty': specialty,
+        'doctor_id': doctor_id,
+        'specialties': Doctor.objects.order_by('specialty').values_list('specialty', flat=True).distinct(),
+        'title': _("Analytics"),
+    }
+    return render(request, 'core/manager_analytics.html', context)
+
+
+# --- Async dashboard stats API for ASGI polling ---
+@login_required
+@read_from_replica
+async def dashboard_stats(request):
+    user = await request.auser()
+    if user.role == User.Role.PATIENT:
+        appointments, aggregates = patient_stats_query(user.pk)
+        stats = await appointments.aaggregate(**aggregates)
+        add_archived_counts(stats, user.role, await aarchived_status_counts(patient_id=user.pk))
+    elif user.role == User.Role.DOCTOR:
+        appointments, aggregates = doctor_stats_query(user.pk)
+        stats = await appointments.aaggregate(**aggregates)
+        add_archived_counts(stats, user.role, await aarchived_status_counts(doctor_id=user.pk))
+    elif user.role == User.Role.MANAGER:
+        appointments, aggregates = manager_stats_query()
+        stats = await appointments.aaggregate(**aggregates)
+        add_archived_counts(stats, user.role, await aarchived_status_counts())
+        stats['active_patients_count'] = await Patient.objects.acount()
+        stats['active_doctors_count'] = await Doctor.objects.acount()
+    else:
+        return JsonResponse({'error': str(_("Access denied."))}, status=403)
+    return JsonResponse({'role': user.role, 'stats': stats})
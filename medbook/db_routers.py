@@ -0,0 +1,154 @@
+"""
+Primary/replica database routing.
+
+Every query goes to ``default`` unless the current view (or a single
+queryset) explicitly opts into replica reads. Once a request writes to
+a routed app, the rest of the request and the following
+``REPLICA_PIN_SECONDS`` of that browser's requests read from the primary,
+so a patient always sees the appointment they just booked or cancelled.
+
+Local testing with two SQLite files:
+
+    DATABASE_REPLICA_URLS=sqlite:///db_replica.sqlite3
+
+(copy ``db.sqlite3`` to ``db_replica.sqlite3`` to give the replica data).
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE_NAME = 'medbook_primary'
+
+# Session, auth and contenttypes rows are always read from the primary: they
+# are written on nearly every request and must never be stale.
+ROUTED_APP_LABELS = {'accounts', 'appointments', 'core'}
+
+
+class _RoutingState:
+    def __init__(self, pinned=False):
+        self.replica_reads = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('medbook_db_routing', default=None)
+
+
+def _current_state():
+    state = _state.get()
+    if state is None:
+        state = _RoutingState()
+        _state.set(state)
+    return state
+
+
+def replica_alias():
+    """
+    Return the alias to use for a replica read of a single queryset,
+    e.g. ``TimeSlot.objects.using(replica_alias())``. Falls back to the
+    primary when no replica is configured or the request is pinned.
+    """
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    if not replicas or _current_state().pinned:
+        return 'default'
+    return random.choice(replicas)
+
+
+def read_from_replica(view_func):
+    """
+    Route every read made by this view to a replica (unless pinned).
+
+    Not for views that cache or ETag their output under a version counter
+    (appointments.versions): those are bumped on the primary, and a lagging
+    replica would store the old rows under the new version.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_view(request, *args, **kwargs):
+            state = _current_state()
+            previous, state.replica_reads = state.replica_reads, True
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                state.replica_reads = previous
+        return _async_view
+
+    @wraps(view_func)
+    def _view(request, *args, **kwargs):
+        state = _current_state()
+        previous, state.replica_reads = state.replica_reads, True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state.replica_reads = previous
+    return _view
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APP_LABELS:
+            return 'default'
+        state = _current_state()
+        if state.replica_reads:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in ROUTED_APP_LABELS:
+            state = _current_state()
+            state.wrote = True
+            state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects loaded from any of them
+        # may be related to each other.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Scope the routing state to the request and keep a browser on the
+    primary for a few seconds after it wrote something.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _state.set(_RoutingState(pinned=PIN_COOKIE_NAME in request.COOKIES))
+        try:
+            response = self.get_response(request)
+            return self._pin(response)
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        token = _state.set(_RoutingState(pinned=PIN_COOKIE_NAME in request.COOKIES))
+        try:
+            response = await self.get_response(request)
+            return self._pin(response)
+        finally:
+            _state.reset(token)
+
+    def _pin(self, response):
+        if _state.get().wrote:
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
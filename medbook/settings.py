@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from decouple import config
+from decouple import config, Csv
 import dj_database_url
 from django.utils.translation import gettext_lazy as _
 
@@ -37,25 +37,37 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.RenderTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'medbook.db_routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.PreferredLanguageMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
 ROOT_URLCONF = 'medbook.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR/'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory outside of development
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -67,6 +79,27 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'medbook.wsgi.application'
 
+# Template timing: Server-Timing header (db/tpl/total) and a warning for
+# renders slower than the budget
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=DEBUG, cast=bool)
+TEMPLATE_RENDER_BUDGET_MS = config('TEMPLATE_RENDER_BUDGET_MS', default=50, cast=int)
+
+# Cache (template fragments and version counters). Use Redis whenever more
+# than one worker runs, so every worker sees the same versions.
+if config('REDIS_URL', default='').strip():
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_USER_MODEL = 'accounts.User'
 
 SESSION_SAVE_EVERY_REQUEST = True
@@ -77,12 +110,30 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# PostgreSQL connection pooling (psycopg3 pool, Django 5.1+). Pooled
+# connections cannot also be persistent, so CONN_MAX_AGE drops to 0.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_OPTIONS = {
+    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+}
+
+
+def database_config(url):
+    db = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DB_POOL else config('CONN_MAX_AGE', default=600, cast=int),
+        conn_health_checks=True,
+    )
+    if DB_POOL and db['ENGINE'] == 'django.db.backends.postgresql':
+        db.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL_OPTIONS)
+    return db
+
+
 if config('DATABASE_URL', default='').strip():
     DATABASES = {
-        'default': dj_database_url.config(
-            default=config('DATABASE_URL'),
-            conn_max_age=600
-        )
+        'default': database_config(config('DATABASE_URL'))
     }
 else:
     DATABASES = {
@@ -92,6 +143,47 @@ else:
         }
     }
 
+# Read replicas: comma-separated URLs, e.g. "sqlite:///db_replica.sqlite3"
+# locally. Views opt in with medbook.db_routers.read_from_replica.
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = database_config(replica_url)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['medbook.db_routers.PrimaryReplicaRouter']
+
+# Seconds a browser keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Live slot updates (server-sent events). Enable NOTIFY fanout when several
+# ASGI workers run against PostgreSQL.
+SLOT_EVENTS_PG_NOTIFY = config('SLOT_EVENTS_PG_NOTIFY', default=False, cast=bool)
+SLOT_EVENTS_KEEPALIVE = config('SLOT_EVENTS_KEEPALIVE', default=15, cast=int)
+# Prefix of the slot event streams served by the ASGI process (Procfile
+# 'asgi'): '' when the proxy routes /appointments/api/doctor/*/slots/events/
+# to it. Unset, slot pages open no stream: under WSGI it would pin a worker.
+SLOT_EVENTS_URL = config('SLOT_EVENTS_URL', default=None)
+
+# Part of every page ETag so a deploy with new templates invalidates them
+# (Render sets RENDER_GIT_COMMIT); empty means per-process start time.
+RELEASE_VERSION = config('RELEASE_VERSION', default=config('RENDER_GIT_COMMIT', default=''))
+
+# Minutes a slot stays held ('pending') for the patient on the booking form
+SLOT_HOLD_MINUTES = config('SLOT_HOLD_MINUTES', default=10, cast=int)
+# Most slots one patient may hold at once (0 for no limit)
+SLOT_HOLD_LIMIT = config('SLOT_HOLD_LIMIT', default=3, cast=int)
+
+# Minutes a waitlisted patient has to book a slot offered to them
+WAITLIST_HOLD_MINUTES = config('WAITLIST_HOLD_MINUTES', default=60, cast=int)
+
+# Weeks of future slots materialize_slots keeps generated from weekly templates
+SLOT_HORIZON_WEEKS = config('SLOT_HORIZON_WEEKS', default=8, cast=int)
+
+# Seconds a manager analytics report of a period still in progress is cached
+ANALYTICS_CACHE_SECONDS = config('ANALYTICS_CACHE_SECONDS', default=300, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -111,7 +203,8 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 #Email settings for Gmail
-EMAIL_BACKEND= 'django.core.mail.backends.smtp.EmailBackend'
+# Set to django.core.mail.backends.console.EmailBackend (or locmem) to develop offline
+EMAIL_BACKEND= config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST= 'smtp.gmail.com'
 EMAIL_PORT= 587
 EMAIL_USE_TLS= True
@@ -119,6 +212,11 @@ EMAIL_HOST_USER= config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD= config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL= EMAIL_HOST_USER
 
+# Outbox delivery (manage.py send_outbox): retries back off from
+# OUTBOX_RETRY_SECONDS, doubling each time, until OUTBOX_MAX_ATTEMPTS.
+OUTBOX_RETRY_SECONDS = config('OUTBOX_RETRY_SECONDS', default=60, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+
 #language settings
 LANGUAGES = [
     ('en', _('English')),
@@ -141,17 +239,40 @@ LOCALE_PATHS = [
     BASE_DIR / 'locale',
 ]
 
+# One year: the language choice is remembered by cookie, not the session
+LANGUAGE_COOKIE_AGE = 60 * 60 * 24 * 365
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Fingerprinted, gzip + Brotli compressed files (see core/assets.py for the
+# bundles). STATICFILES_STORAGE is no longer read since Django 5.1.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
+# Served by the proxy in production, which must send a one-year Cache-Control
+# for profiles/renditions/ (see accounts.images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Profile images: upload limits and square renditions (name -> pixels)
+PROFILE_IMAGE_MAX_BYTES = 8 * 1024 * 1024
+PROFILE_IMAGE_MAX_PIXELS = 40_000_000
+PROFILE_IMAGE_RENDITIONS = {
+    'thumb': 64,
+    'small': 160,
+    'large': 480,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
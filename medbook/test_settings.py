@@ -0,0 +1,13 @@
+"""
+Settings for the test suite:
+
+    python manage.py test --settings=medbook.test_settings
+
+(or ``DJANGO_SETTINGS_MODULE=medbook.test_settings`` for other runners).
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# The router tests read through this mirror of the test database; it is only
+# routed to when a test lists it in DATABASE_REPLICAS.
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
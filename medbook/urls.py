@@ -2,12 +2,28 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from django.views.decorators.cache import cache_control, cache_page
+from django.views.i18n import JavaScriptCatalog
+from django.views.static import serve
+
+from accounts.images import RENDITION_DIR
+from core.assets import JS_CATALOG_PACKAGES
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls', namespace='core')),
     path('accounts/', include('accounts.urls', namespace='accounts')),
+    path('appointments/', include('appointments.urls', namespace='appointment')),
+    # Fallback for the prebuilt static catalogs; cache keys include the language
+    path('jsi18n/', cache_page(60 * 60 * 24)(JavaScriptCatalog.as_view(domain='djangojs', packages=JS_CATALOG_PACKAGES)), name='javascript-catalog'),
 ]
 
 if settings.DEBUG:
+    # Renditions have content-hashed names, so they never change (the proxy
+    # does the same in production, see accounts.images)
+    urlpatterns += static(
+        f'{settings.MEDIA_URL}{RENDITION_DIR}/',
+        view=cache_control(max_age=60 * 60 * 24 * 365, public=True, immutable=True)(serve),
+        document_root=settings.MEDIA_ROOT / RENDITION_DIR,
+    )
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
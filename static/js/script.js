@@ -1,21 +1,28 @@
-let currentLang = 'fr';
-
-function applyTranslation(lang) {
+// Strings come from the server-side catalogs (locale/<lang>/LC_MESSAGES/djangojs.po),
+// loaded for the active language before this file as the JS catalog (gettext).
+function applyTranslation() {
+    if (typeof gettext !== 'function') return;
     const elements = document.querySelectorAll('[data-translate]');
     elements.forEach(el => {
         const key = el.getAttribute('data-translate');
-        if (translations[lang] && translations[lang][key]) {
-            el.textContent = translations[lang][key];
+        const text = gettext(key);
+        if (text === key) return;
+        if (el.hasAttribute('placeholder')) {
+            el.setAttribute('placeholder', text);
+        } else {
+            el.textContent = text;
         }
     });
-    document.documentElement.setAttribute('data-lang', lang);
-    currentLang = lang;
+}
+
+function currentLanguage() {
+    return document.documentElement.getAttribute('data-lang') || 'en';
 }
 
 function toggleLanguage() {
-    const newLang = currentLang === 'fr' ? 'en' : 'fr';
-    applyTranslation(newLang);
-    document.getElementById('langBtn').textContent = newLang.toUpperCase();
+    // The server stores the choice (profile or cookie) and re-renders the page.
+    const newLang = currentLanguage() === 'fr' ? 'en' : 'fr';
+    window.location.href = `/accounts/switch-language/?lang=${newLang}`;
 }
 
 function toggleTheme() {
@@ -31,8 +38,12 @@ function loadTheme() {
 
 document.addEventListener('DOMContentLoaded', () => {
     loadTheme();
-    applyTranslation(currentLang);
+    applyTranslation();
 
+    const langBtn = document.getElementById('langBtn');
+    if (langBtn) {
+        langBtn.textContent = (currentLanguage() === 'fr' ? 'en' : 'fr').toUpperCase();
+    }
     document.getElementById('themeBtn')?.addEventListener('click', toggleTheme);
-    document.getElementById('langBtn')?.addEventListener('click', toggleLanguage);
+    langBtn?.addEventListener('click', toggleLanguage);
 });